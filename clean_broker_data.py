@@ -1,9 +1,14 @@
+import os
+import sys
 import json
 import re
 from pathlib import Path
 from typing import List, Dict, Any
 import logging
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scripts'))
+from broker_extraction_rules import BROKER_RULES
+
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -26,7 +31,7 @@ def clean_rating(rating: str) -> float:
     
     try:
         # Extract numeric value from string (e.g., "4.5/5" -> 4.5)
-        match = re.search(r'(\d+\.?\d*)', str(rating))
+        match = BROKER_RULES.first_match('rating_value', str(rating))
         if match:
             return float(match.group(1))
     except (ValueError, TypeError):
@@ -46,7 +51,7 @@ def clean_deposit(deposit: str) -> str:
         deposit = f"${deposit}"
     
     # Remove any extra text and keep only the amount with currency
-    match = re.search(r'([$€£¥]?\s*\d+[,\d]*(?:\.\d{1,2})?)', deposit)
+    match = BROKER_RULES.first_match('deposit_amount', deposit)
     if match:
         return match.group(1)
     
@@ -62,7 +67,7 @@ def clean_leverage(leverage: str) -> str:
     # Standardize to "1:X" format
     if leverage and not leverage.startswith('1:'):
         # Try to extract numeric value
-        match = re.search(r'(\d+)', leverage)
+        match = BROKER_RULES.first_match('integer', leverage)
         if match:
             return f"1:{match.group(1)}"
     
@@ -117,15 +122,7 @@ def clean_regulation(regulation: str) -> str:
     regulation = regulation.strip()
     
     # Extract regulator names if present
-    regulators = []
-    regulator_patterns = [
-        r'ASIC', r'CySEC', r'FCA', r'FSCS', r'FSC', r'EFSA', r'MiFID', 
-        r'SEC', r'FINRA', r'MAS', r'SFC', r'DFSA', r'ADGM', r'CBI'
-    ]
-    
-    for pattern in regulator_patterns:
-        if re.search(pattern, regulation, re.IGNORECASE):
-            regulators.append(pattern)
+    regulators = BROKER_RULES.tags('regulator_names', regulation)
     
     if regulators:
         return ", ".join(regulators)
@@ -231,6 +228,7 @@ def main():
         save_json_file(cleaned_data, output_file)
         logger.info(f"Successfully cleaned and saved {len(cleaned_data)} brokers to {output_file}")
     
+    logger.info(f"Broker rules: {BROKER_RULES.get_stats()}")
     logger.info("Broker data cleaning completed!")
 
 if __name__ == "__main__":
@@ -1,7 +1,12 @@
+import os
+import sys
 import json
 import re
 from collections import defaultdict
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scripts'))
+from broker_extraction_rules import BROKER_RULES
+
 def cleanup_broker_data():
     """
     Comprehensive broker data cleanup script
@@ -42,7 +47,7 @@ def cleanup_broker_data():
         if rating:
             if isinstance(rating, str):
                 # Extract numeric rating
-                match = re.search(r'(\d+\.?\d*)', rating)
+                match = BROKER_RULES.first_match('rating_value', rating)
                 if match:
                     numeric_rating = float(match.group(1))
                     if 0 <= numeric_rating <= 5:
@@ -64,7 +69,7 @@ def cleanup_broker_data():
         if deposit and str(deposit).strip():
             # Extract numeric value
             deposit_str = str(deposit).replace(',', '')
-            numeric_match = re.search(r'(\d+)', deposit_str)
+            numeric_match = BROKER_RULES.first_match('integer', deposit_str)
             if numeric_match:
                 amount = int(numeric_match.group(1))
                 broker['min_deposit_amount'] = amount
@@ -73,19 +78,6 @@ def cleanup_broker_data():
     
     # 4. Extract regulator information
     print("4. Extracting regulator information...")
-    regulator_patterns = {
-        'FCA': r'FCA|Financial Conduct Authority',
-        'CySEC': r'CySEC|Cyprus Securities|Cyprus.*Exchange',
-        'ASIC': r'ASIC|Australian Securities|Australian.*Investment',
-        'CFTC': r'CFTC|Commodity Futures Trading',
-        'NFA': r'NFA|National Futures Association',
-        'BaFin': r'BaFin|German.*Financial',
-        'CONSOB': r'CONSOB|Italian.*Securities',
-        'FINMA': r'FINMA|Swiss.*Financial',
-        'FSA': r'FSA|Financial Services Authority',
-        'MAS': r'MAS|Monetary Authority.*Singapore',
-        'JFSA': r'JFSA|Japan.*Financial'
-    }
     
     for broker in brokers:
         # Combine all text content for analysis
@@ -95,10 +87,7 @@ def cleanup_broker_data():
             ' '.join(broker.get('cons', []))
         ])
         
-        regulators = []
-        for reg_code, pattern in regulator_patterns.items():
-            if re.search(pattern, text_content, re.IGNORECASE):
-                regulators.append(reg_code)
+        regulators = BROKER_RULES.tags('regulators', text_content)
         
         if regulators:
             broker['extracted_regulators'] = list(set(regulators))
@@ -108,15 +97,6 @@ def cleanup_broker_data():
     
     # 5. Map trading platforms
     print("5. Mapping trading platforms...")
-    platform_patterns = {
-        'MetaTrader 4': r'MT4|MetaTrader 4',
-        'MetaTrader 5': r'MT5|MetaTrader 5',
-        'cTrader': r'cTrader',
-        'TradingView': r'TradingView',
-        'Proprietary': r'proprietary|own platform|custom platform',
-        'WebTrader': r'WebTrader|web.*platform',
-        'Mobile': r'mobile.*app|iPhone|Android'
-    }
     
     for broker in brokers:
         text_content = ' '.join([
@@ -125,10 +105,7 @@ def cleanup_broker_data():
             ' '.join(broker.get('cons', []))
         ])
         
-        platforms = []
-        for platform, pattern in platform_patterns.items():
-            if re.search(pattern, text_content, re.IGNORECASE):
-                platforms.append(platform)
+        platforms = BROKER_RULES.tags('platforms', text_content)
         
         if platforms:
             broker['supported_platforms'] = list(set(platforms))
@@ -188,7 +165,7 @@ def cleanup_broker_data():
         leverage = broker.get('leverage', '')
         if leverage and ':' in str(leverage):
             # Extract leverage ratio (e.g., "1:500" -> 500)
-            match = re.search(r'1:(\d+)', str(leverage))
+            match = BROKER_RULES.first_match('leverage_ratio', str(leverage))
             if match:
                 broker['max_leverage'] = int(match.group(1))
     
@@ -210,16 +187,6 @@ def cleanup_broker_data():
     # 8. Generate account type classifications
     print("8. Classifying account types...")
     
-    account_type_patterns = {
-        'ECN': r'ECN|Electronic Communication Network',
-        'STP': r'STP|Straight Through Processing',
-        'Market Maker': r'Market Maker|MM|dealing desk',
-        'Islamic': r'Islamic|Sharia|Swap.*free|Halal',
-        'Scalping Friendly': r'scalping.*allow|scalping.*friend',
-        'High Leverage': r'leverage.*up to|maximum leverage',
-        'Low Spread': r'spread.*from|tight spread|low spread'
-    }
-    
     for broker in brokers:
         text_content = ' '.join([
             str(broker.get('description', '')),
@@ -227,10 +194,7 @@ def cleanup_broker_data():
             ' '.join(broker.get('cons', []))
         ])
         
-        account_types = []
-        for acc_type, pattern in account_type_patterns.items():
-            if re.search(pattern, text_content, re.IGNORECASE):
-                account_types.append(acc_type)
+        account_types = BROKER_RULES.tags('account_types', text_content)
         
         broker['account_types'] = list(set(account_types))
     
@@ -255,6 +219,10 @@ def cleanup_broker_data():
     print(f"Platforms mapped: {platforms_found}/{len(brokers)} ({(platforms_found/len(brokers))*100:.1f}%)")
     print(f"Countries mapped: {countries_mapped}/{len(brokers)} ({(countries_mapped/len(brokers))*100:.1f}%)")
     
+    print(f"\n=== RULE HITS ===")
+    for rule_name, rule_stats in BROKER_RULES.get_stats().items():
+        print(f"{rule_name}: {rule_stats['hits']}/{rule_stats['calls']} ({rule_stats['seconds'] * 1000:.1f} ms)")
+
     print(f"\nCleaned data saved to: {output_file}")
     
     # Generate sample output for verification
@@ -0,0 +1,37 @@
+-- Batch Processor Chunk Storage and Incremental Re-indexing Support
+-- The batch processor (scripts/batch_processor.py) upserts one documents row per
+-- chunk keyed on (source_type, source_id, chunk_index). 001 does not create those
+-- columns, so this migration is required before any batch processor run. It also
+-- adds content hashes so --incremental runs can skip unchanged sources and
+-- re-embed only the chunks whose text actually changed
+
+-- Chunk columns written on every run (embedding sized for all-MiniLM-L6-v2)
+ALTER TABLE documents ADD COLUMN IF NOT EXISTS source_id TEXT;
+ALTER TABLE documents ADD COLUMN IF NOT EXISTS token_count INTEGER;
+ALTER TABLE documents ADD COLUMN IF NOT EXISTS content_embedding vector(384);
+
+-- Chunk rows carry no title, and broker reviews are stored as source_type 'broker'
+ALTER TABLE documents ALTER COLUMN title DROP NOT NULL;
+ALTER TABLE documents DROP CONSTRAINT IF EXISTS documents_source_type_check;
+ALTER TABLE documents ADD CONSTRAINT documents_source_type_check
+    CHECK (source_type IN ('article', 'broker', 'review', 'guide', 'news', 'analysis'));
+
+-- Per-chunk hash of (embedding model, chunk content), compared by --incremental runs
+ALTER TABLE documents ADD COLUMN IF NOT EXISTS content_hash TEXT;
+
+-- Per-source hash of the text and metadata that produced its chunks
+CREATE TABLE IF NOT EXISTS document_sources (
+    source_type TEXT NOT NULL,
+    source_id TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    chunk_count INTEGER NOT NULL DEFAULT 0,
+    indexed_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (source_type, source_id)
+);
+
+-- Conflict target of every chunk upsert (ON CONFLICT needs a unique index);
+-- chunk lookups and orphan deletes are scoped to one source through it as well.
+-- Rows from before this migration have a NULL source_id and never conflict
+DROP INDEX IF EXISTS documents_source_chunk_idx;
+CREATE UNIQUE INDEX IF NOT EXISTS documents_source_chunk_key
+    ON documents(source_type, source_id, chunk_index);
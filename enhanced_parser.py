@@ -1,153 +1,51 @@
 import os
+import sys
 import json
 import re
-from bs4 import BeautifulSoup
 from datetime import datetime
 import logging
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scripts'))
+from broker_extraction_rules import BROKER_RULES
+from html_extraction import page_record
+from parse_cache import open_parse_cache_from_env
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class EnhancedDataParser:
-    def __init__(self, base_path):
+    def __init__(self, base_path, parse_cache=None):
         self.base_path = base_path
         self.brokers_data = []
         self.articles_data = []
+        # Optional ParseCache of page records shared with the other dataset scripts
+        self.parse_cache = parse_cache
         
-    def extract_meta_content(self, soup, name):
-        """Extract content from meta tags"""
-        meta_tag = soup.find('meta', {'name': name}) or soup.find('meta', {'property': f'og:{name}'})
-        return meta_tag.get('content', '') if meta_tag else ''
-    
-    def extract_text_content(self, soup):
-        """Extract main text content from HTML"""
-        # Remove script and style elements
-        for script in soup(["script", "style"]):
-            script.decompose()
-        
-        # Try to find main content areas
-        content_selectors = [
-            'article', '.article-content', '.content', '.main-content',
-            '.post-content', '.entry-content', 'main', '.article-body'
-        ]
-        
-        for selector in content_selectors:
-            content = soup.select_one(selector)
-            if content:
-                return content.get_text(strip=True)
-        
-        # Fallback to body content
-        body = soup.find('body')
-        if body:
-            return body.get_text(strip=True)[:2000]  # Limit to first 2000 chars
-        
-        return ''
+    def extract_meta_content(self, record, field, og_name):
+        """Meta tag content from the page record, falling back to the og: property"""
+        return record['metadata'][field] or record['og'].get(og_name, '')
     
-    def extract_broker_details(self, soup, file_path):
-        """Extract detailed broker information"""
-        text_content = self.extract_text_content(soup)
-        
-        # Extract rating using regex
-        rating_patterns = [
-            r'rating[:\s]*([0-9](?:\.[0-9])?)[\s/]*(?:out of )?[0-9]?',
-            r'score[:\s]*([0-9](?:\.[0-9])?)',
-            r'([0-9](?:\.[0-9])?)[\s]*(?:out of|/)[\s]*[0-9]'
-        ]
-        
-        rating = ''
-        for pattern in rating_patterns:
-            match = re.search(pattern, text_content, re.IGNORECASE)
-            if match:
-                rating = match.group(1)
-                break
-        
-        # Extract minimum deposit
-        deposit_patterns = [
-            r'minimum deposit[:\s]*\$?([0-9,]+)',
-            r'min deposit[:\s]*\$?([0-9,]+)',
-            r'deposit[:\s]*\$?([0-9,]+)'
-        ]
-        
-        min_deposit = ''
-        for pattern in deposit_patterns:
-            match = re.search(pattern, text_content, re.IGNORECASE)
-            if match:
-                min_deposit = f"${match.group(1)}"
-                break
-        
-        # Extract leverage
-        leverage_patterns = [
-            r'leverage[:\s]*([0-9]+:[0-9]+)',
-            r'leverage[:\s]*([0-9]+x)',
-            r'([0-9]+:[0-9]+)[\s]*leverage'
-        ]
-        
-        leverage = ''
-        for pattern in leverage_patterns:
-            match = re.search(pattern, text_content, re.IGNORECASE)
-            if match:
-                leverage = match.group(1)
-                break
-        
-        # Extract regulation info
-        regulation_patterns = [
-            r'regulated by[:\s]*([A-Z]{2,10})',
-            r'regulation[:\s]*([A-Z]{2,10})',
-            r'([A-Z]{2,10})[\s]*regulated'
-        ]
-        
-        regulation = ''
-        for pattern in regulation_patterns:
-            match = re.search(pattern, text_content, re.IGNORECASE)
-            if match:
-                regulation = match.group(1)
-                break
-        
-        # Extract pros and cons
-        pros = []
-        cons = []
-        
-        # Look for pros/advantages
-        pros_section = re.search(r'pros?[:\s]*([^\n]*(?:\n[^\n]*){0,5})', text_content, re.IGNORECASE)
-        if pros_section:
-            pros_text = pros_section.group(1)
-            pros = [p.strip() for p in re.split(r'[•\-\*]', pros_text) if p.strip()]
-        
-        # Look for cons/disadvantages
-        cons_section = re.search(r'cons?[:\s]*([^\n]*(?:\n[^\n]*){0,5})', text_content, re.IGNORECASE)
-        if cons_section:
-            cons_text = cons_section.group(1)
-            cons = [c.strip() for c in re.split(r'[•\-\*]', cons_text) if c.strip()]
-        
-        return {
-            'rating': rating,
-            'minimum_deposit': min_deposit,
-            'leverage': leverage,
-            'regulation': regulation,
-            'pros': pros[:5],  # Limit to 5 items
-            'cons': cons[:5]   # Limit to 5 items
-        }
+    def extract_title(self, record):
+        """Meta/og title, else the <title> text"""
+        return self.extract_meta_content(record, 'meta_title', 'title') or record['metadata']['title']
     
     def parse_broker_file(self, file_path):
         """Parse individual broker HTML file"""
         try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
-            
-            soup = BeautifulSoup(content, 'html.parser')
+            record = page_record(file_path, self.parse_cache)
             
             # Extract basic info
-            title = self.extract_meta_content(soup, 'title') or soup.find('title').get_text() if soup.find('title') else ''
-            description = self.extract_meta_content(soup, 'description')
-            keywords = self.extract_meta_content(soup, 'keywords')
+            title = self.extract_title(record)
+            description = self.extract_meta_content(record, 'description', 'description')
+            keywords = self.extract_meta_content(record, 'keywords', 'keywords')
             
             # Extract broker name from filename
             filename = os.path.basename(file_path)
             broker_name = filename.replace('-review.html', '').replace('-', ' ').title()
             
-            # Extract detailed broker information
-            broker_details = self.extract_broker_details(soup, file_path)
+            # Detailed broker information
+            broker_details = record['broker_details']
             
             broker_data = {
                 'name': broker_name,
@@ -178,18 +76,15 @@ class EnhancedDataParser:
     def parse_article_file(self, file_path):
         """Parse individual article HTML file"""
         try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
-            
-            soup = BeautifulSoup(content, 'html.parser')
+            record = page_record(file_path, self.parse_cache)
             
             # Extract basic info
-            title = self.extract_meta_content(soup, 'title') or soup.find('title').get_text() if soup.find('title') else ''
-            description = self.extract_meta_content(soup, 'description')
-            keywords = self.extract_meta_content(soup, 'keywords')
+            title = self.extract_title(record)
+            description = self.extract_meta_content(record, 'description', 'description')
+            keywords = self.extract_meta_content(record, 'keywords', 'keywords')
             
-            # Extract article content
-            article_content = self.extract_text_content(soup)
+            # Article content
+            article_content = record['content_text']
             
             # Extract date from file path
             date_match = re.search(r'(\d{4})/(\d{2})/', file_path)
@@ -296,15 +191,22 @@ def main():
     base_path = r'C:\Users\LENOVO\Desktop\BrokeranalysisDaily'
     output_dir = os.path.join(base_path, 'extracted_data')
     
-    parser = EnhancedDataParser(base_path)
+    parse_cache = open_parse_cache_from_env()
+    parser = EnhancedDataParser(base_path, parse_cache)
     
     logger.info("Starting enhanced data extraction...")
     
-    # Parse brokers
-    parser.scan_brokers()
-    
-    # Parse articles
-    parser.scan_articles()
+    try:
+        # Parse brokers
+        parser.scan_brokers()
+        
+        # Parse articles
+        parser.scan_articles()
+    finally:
+        if parse_cache:
+            logger.info(f"Parse cache: {parse_cache.get_stats()}")
+            parse_cache.close()
+        logger.info(f"Broker rules: {BROKER_RULES.get_stats()}")
     
     # Save data
     parser.save_data(output_dir)
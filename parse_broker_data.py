@@ -1,27 +1,24 @@
 import os
 import re
+import sys
 import json
-from bs4 import BeautifulSoup
 from pathlib import Path
 
-def extract_broker_data(html_file_path):
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scripts'))
+from html_extraction import page_record
+from parse_cache import open_parse_cache_from_env
+
+def extract_broker_data(html_file_path, parse_cache=None):
     """Extract broker data from HTML files"""
     try:
-        with open(html_file_path, 'r', encoding='utf-8') as file:
-            content = file.read()
-        
-        soup = BeautifulSoup(content, 'html.parser')
-        
-        # Extract basic info from meta tags
-        title_tag = soup.find('meta', {'name': 'title'}) or soup.find('title')
-        description_tag = soup.find('meta', {'name': 'description'})
-        keywords_tag = soup.find('meta', {'name': 'keywords'})
+        # Basic info from meta tags, via the page record shared with the other dataset scripts
+        metadata = page_record(html_file_path, parse_cache)['metadata']
         
         broker_data = {
             'name': '',
-            'title': title_tag.get('content', '') if title_tag and title_tag.get('content') else (title_tag.text if title_tag else ''),
-            'description': description_tag.get('content', '') if description_tag else '',
-            'keywords': keywords_tag.get('content', '') if keywords_tag else '',
+            'title': metadata['meta_title'] or metadata['title'],
+            'description': metadata['description'],
+            'keywords': metadata['keywords'],
             'file_path': str(html_file_path),
             'regulation': '',
             'minimum_deposit': '',
@@ -49,23 +46,16 @@ def extract_broker_data(html_file_path):
         print(f"Error processing {html_file_path}: {e}")
         return None
 
-def extract_article_data(html_file_path):
+def extract_article_data(html_file_path, parse_cache=None):
     """Extract article data from HTML files"""
     try:
-        with open(html_file_path, 'r', encoding='utf-8') as file:
-            content = file.read()
-        
-        soup = BeautifulSoup(content, 'html.parser')
-        
-        # Extract basic info from meta tags
-        title_tag = soup.find('meta', {'name': 'title'}) or soup.find('title')
-        description_tag = soup.find('meta', {'name': 'description'})
-        keywords_tag = soup.find('meta', {'name': 'keywords'})
+        # Basic info from meta tags, via the page record shared with the other dataset scripts
+        metadata = page_record(html_file_path, parse_cache)['metadata']
         
         article_data = {
-            'title': title_tag.get('content', '') if title_tag and title_tag.get('content') else (title_tag.text if title_tag else ''),
-            'description': description_tag.get('content', '') if description_tag else '',
-            'keywords': keywords_tag.get('content', '') if keywords_tag else '',
+            'title': metadata['meta_title'] or metadata['title'],
+            'description': metadata['description'],
+            'keywords': metadata['keywords'],
             'file_path': str(html_file_path),
             'content': '',
             'author': '',
@@ -88,8 +78,11 @@ def extract_article_data(html_file_path):
         print(f"Error processing {html_file_path}: {e}")
         return None
 
-def scan_forex_data(base_path):
-    """Scan the daily forex directory and extract data"""
+def scan_forex_data(base_path, parse_cache=None):
+    """Scan the daily forex directory and extract data
+    
+    Files unchanged since the last run are served from ``parse_cache`` when one is given.
+    """
     base_path = Path(base_path)
     
     brokers_data = []
@@ -101,7 +94,7 @@ def scan_forex_data(base_path):
         print(f"Scanning brokers directory: {brokers_dir}")
         for html_file in brokers_dir.glob('**/*.html'):
             if 'review' in html_file.name:
-                broker_data = extract_broker_data(html_file)
+                broker_data = extract_broker_data(html_file, parse_cache)
                 if broker_data:
                     brokers_data.append(broker_data)
     
@@ -111,7 +104,7 @@ def scan_forex_data(base_path):
         print(f"Scanning news directory: {news_dir}")
         for html_file in news_dir.glob('**/*.html'):
             if html_file.name.isdigit() or 'article' in html_file.name.lower():
-                article_data = extract_article_data(html_file)
+                article_data = extract_article_data(html_file, parse_cache)
                 if article_data:
                     articles_data.append(article_data)
     
@@ -139,6 +132,12 @@ if __name__ == "__main__":
     output_path = "C:/Users/LENOVO/Desktop/BrokeranalysisDaily/extracted_data"
     
     print("Starting data extraction...")
-    brokers_data, articles_data = scan_forex_data(forex_data_path)
+    parse_cache = open_parse_cache_from_env()
+    try:
+        brokers_data, articles_data = scan_forex_data(forex_data_path, parse_cache)
+    finally:
+        if parse_cache:
+            print(f"Parse cache: {parse_cache.get_stats()}")
+            parse_cache.close()
     save_extracted_data(brokers_data, articles_data, output_path)
     print("Data extraction completed!")
\ No newline at end of file
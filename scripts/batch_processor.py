@@ -13,17 +13,29 @@ Usage:
     python batch_processor.py --articles-only
     python batch_processor.py --brokers-only
     python batch_processor.py --resume-from-checkpoint
+    python batch_processor.py --streaming --fetch-size 200 --queue-size 4
+    python batch_processor.py --incremental
+    python batch_processor.py --use-copy
+
+Every run upserts chunk rows keyed on (source_type, source_id, chunk_index),
+so database/migrations/003_incremental_indexing.sql (the chunk columns, their
+unique index and content hashes) must be applied first, incremental or not.
 """
 
 import os
 import sys
 import json
+import hashlib
 import logging
 import argparse
 import asyncio
+import struct
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional, Any, Tuple
+from typing import Dict, List, Optional, Any, Tuple, AsyncIterator, Callable
 from dataclasses import dataclass, asdict
 import traceback
 
@@ -33,11 +45,164 @@ import numpy as np
 from tqdm import tqdm
 
 # Local imports
-from content_chunker import ContentChunker, ContentChunk
+from content_chunker import (
+    ContentChunker, ContentChunk, CHUNKER_VERSION, init_chunk_worker, chunk_documents_in_worker
+)
 from embedding_generator import EmbeddingGenerator, EmbeddingResult
+from embedding_store import EmbeddingStore
+from onnx_encoder import EMBEDDING_BACKENDS
 from canonical_broker_mapper import CanonicalBrokerMapper, BrokerEntity, MatchResult
 
 
+ARTICLES_QUERY = """
+SELECT id, title, content, excerpt, author, published_at, 
+       category, tags, meta_description, slug
+FROM articles 
+WHERE content IS NOT NULL AND content != ''
+ORDER BY published_at DESC
+"""
+
+BROKERS_QUERY = """
+SELECT id, name, description, features, regulation_info, 
+       review_summary, trust_score, website_url, 
+       country, founded_year, min_deposit
+FROM brokers 
+WHERE (description IS NOT NULL AND description != '') 
+   OR (features IS NOT NULL AND features != '')
+   OR (review_summary IS NOT NULL AND review_summary != '')
+ORDER BY trust_score DESC NULLS LAST
+"""
+
+
+def article_document(article: Dict[str, Any]) -> Dict[str, Any]:
+    """Build ``ContentChunker.chunk_content`` arguments for an article row"""
+    # Combine article content
+    content_parts = []
+    if article.get('title'):
+        content_parts.append(f"Title: {article['title']}")
+    if article.get('excerpt'):
+        content_parts.append(f"Excerpt: {article['excerpt']}")
+    if article.get('content'):
+        content_parts.append(article['content'])
+    
+    return {
+        'content': "\n\n".join(content_parts),
+        'source_type': "article",
+        'source_id': str(article['id']),
+        'title': article.get('title') or '',
+        'metadata': {
+            'title': article.get('title'),
+            'author': article.get('author'),
+            'category': article.get('category'),
+            'tags': article.get('tags'),
+            'published_at': str(article.get('published_at')),
+            'slug': article.get('slug')
+        }
+    }
+
+
+def broker_document(broker: Dict[str, Any]) -> Dict[str, Any]:
+    """Build ``ContentChunker.chunk_content`` arguments for a broker row"""
+    # Combine broker content
+    content_parts = []
+    if broker.get('name'):
+        content_parts.append(f"Broker: {broker['name']}")
+    if broker.get('description'):
+        content_parts.append(f"Description: {broker['description']}")
+    if broker.get('features'):
+        content_parts.append(f"Features: {broker['features']}")
+    if broker.get('regulation_info'):
+        content_parts.append(f"Regulation: {broker['regulation_info']}")
+    if broker.get('review_summary'):
+        content_parts.append(f"Review: {broker['review_summary']}")
+    
+    return {
+        'content': "\n\n".join(content_parts),
+        'source_type': "broker",
+        'source_id': str(broker['id']),
+        'title': broker.get('name') or '',
+        'metadata': {
+            'name': broker.get('name'),
+            'country': broker.get('country'),
+            'trust_score': broker.get('trust_score'),
+            'website_url': broker.get('website_url'),
+            'founded_year': broker.get('founded_year'),
+            'min_deposit': broker.get('min_deposit')
+        }
+    }
+
+
+def chunk_content_hash(model_name: str, content: str) -> str:
+    """Hash of the exact text (and model) a chunk embedding was computed from"""
+    return hashlib.sha256(f"{model_name}\0{content}".encode('utf-8')).hexdigest()
+
+
+# Columns written for every chunk, in COPY / staging-table order. All of them
+# come from migration 003; content_hash is kept current on every run so a later
+# --incremental run never trusts a hash of text that has since been replaced
+DOCUMENT_COLUMNS = [
+    'content', 'content_embedding', 'source_type', 'source_id',
+    'chunk_index', 'token_count', 'metadata', 'created_at', 'content_hash'
+]
+
+STAGING_TABLE = "documents_staging"
+
+# Session-lifetime staging table: columns and types only (no constraints or
+# defaults), emptied by every commit so each COPY batch starts clean
+CREATE_STAGING_QUERY = f"""
+CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} ON COMMIT DELETE ROWS AS
+SELECT {', '.join(DOCUMENT_COLUMNS)} FROM documents WITH NO DATA
+"""
+
+MERGE_STAGING_QUERY = f"""
+INSERT INTO documents ({', '.join(DOCUMENT_COLUMNS)})
+SELECT DISTINCT ON (source_type, source_id, chunk_index) {', '.join(DOCUMENT_COLUMNS)}
+FROM {STAGING_TABLE}
+ORDER BY source_type, source_id, chunk_index
+ON CONFLICT (source_type, source_id, chunk_index) 
+DO UPDATE SET 
+    content = EXCLUDED.content,
+    content_embedding = EXCLUDED.content_embedding,
+    token_count = EXCLUDED.token_count,
+    metadata = EXCLUDED.metadata,
+    content_hash = EXCLUDED.content_hash,
+    updated_at = CURRENT_TIMESTAMP
+"""
+
+
+def encode_vector(value: Any) -> bytes:
+    """pgvector binary send format: int16 dim, int16 unused, big-endian float32 values"""
+    vector = np.asarray(value, dtype='>f4')
+    return struct.pack('>HH', vector.shape[0], 0) + vector.tobytes()
+
+
+def decode_vector(data: bytes) -> np.ndarray:
+    """pgvector binary receive format -> float32 array"""
+    dim, _ = struct.unpack_from('>HH', data)
+    return np.frombuffer(data, dtype='>f4', count=dim, offset=4).astype(np.float32)
+
+
+async def register_vector_codec(conn: asyncpg.Connection) -> None:
+    """Pool init hook: exchange pgvector values as binary NumPy buffers"""
+    try:
+        await conn.set_type_codec(
+            'vector', schema='public', encoder=encode_vector, 
+            decoder=decode_vector, format='binary'
+        )
+    except ValueError:
+        logging.warning("pgvector 'vector' type not found; embeddings will not be encodable")
+
+
+def source_content_hash(document: Dict[str, Any], model_name: str, chunking: List[Any]) -> str:
+    """Hash of everything that determines a source's chunks, metadata and embeddings"""
+    payload = json.dumps({
+        'document': document,
+        'model': model_name,
+        'chunking': chunking
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
 @dataclass
 class ProcessingConfig:
     """Configuration for batch processing"""
@@ -46,6 +211,8 @@ class ProcessingConfig:
     
     # Processing options
     chunk_size: int = 300
+    chunk_overlap: int = 50  # Overlap tokens between consecutive chunks
+    overlap_mode: str = "tokens"  # "tokens" (bounded by chunk_overlap) or legacy "sentences"
     batch_size: int = 100
     max_workers: int = 4
     
@@ -53,6 +220,10 @@ class ProcessingConfig:
     output_dir: str = "./output"
     checkpoint_dir: str = "./checkpoints"
     
+    # Commit progress is written every N committed insert batches or T seconds, whichever comes first
+    checkpoint_every_batches: int = 20
+    checkpoint_interval_seconds: float = 30.0
+    
     # Processing flags
     process_articles: bool = True
     process_brokers: bool = True
@@ -61,6 +232,23 @@ class ProcessingConfig:
     
     # Embedding model
     embedding_model: str = "all-MiniLM-L6-v2"
+    embedding_backend: str = "torch"  # "onnx" runs the int8 quantised graph on CPU
+    embedding_workers: int = 0  # Encode worker processes, each with its own model copy (0: in-process)
+    embedding_cache_path: Optional[str] = "./cache/embeddings.sqlite"  # None disables the cache
+    embedding_cache_max_entries: int = 200_000
+    
+    # Streaming pipeline (bounded memory, stages overlap)
+    streaming: bool = False
+    fetch_size: int = 200  # Rows prefetched per server-side cursor round trip
+    chunk_task_size: int = 16  # Documents per chunking task sent to the process pool
+    chunk_queue_size: int = 4  # Chunk batches buffered ahead of the embedding thread
+    insert_queue_size: int = 4  # Embedded batches buffered ahead of the inserters
+    insert_workers: int = 2  # Concurrent insert connections on the asyncpg pool
+    incremental: bool = False  # Skip unchanged sources and re-embed changed chunks only
+    
+    # Bulk loading
+    use_copy: bool = False  # COPY into a temp staging table, then one INSERT ... ON CONFLICT
+    copy_batch_size: int = 1000  # Rows per COPY when inserting a fully materialized run
     
     # Logging
     log_level: str = "INFO"
@@ -96,6 +284,15 @@ class ProcessingStats:
     canonical_mappings_created: int = 0
     canonical_mappings_updated: int = 0
     
+    # Incremental re-indexing
+    sources_unchanged: int = 0
+    chunks_unchanged: int = 0
+    chunks_deleted: int = 0
+    
+    # Checkpoint resume
+    sources_resumed: int = 0
+    chunks_resumed: int = 0
+    
     def to_dict(self) -> Dict[str, Any]:
         """Convert stats to dictionary"""
         return asdict(self)
@@ -127,26 +324,169 @@ Database Operations:
 Canonical Mapping:
 - Mappings created: {self.canonical_mappings_created}
 - Mappings updated: {self.canonical_mappings_updated}
+
+Incremental Re-indexing:
+- Sources unchanged: {self.sources_unchanged}
+- Chunks unchanged: {self.chunks_unchanged}
+- Orphaned chunks deleted: {self.chunks_deleted}
+
+Checkpoint Resume:
+- Completed sources skipped: {self.sources_resumed}
+- Committed chunks skipped: {self.chunks_resumed}
 """
 
 
 class CheckpointManager:
-    """Manages processing checkpoints for resumability"""
+    """Manages processing checkpoints for resumability
+    
+    Besides the failure snapshot, the manager tracks commit progress per
+    source: the sources whose chunks are all committed, and for partially
+    committed sources a watermark (highest chunk_index such that every chunk
+    up to it is committed). Progress is written every ``save_every_batches``
+    committed insert batches or ``save_interval_seconds``, off the event loop,
+    so a resumed run skips completed sources and continues mid-source. A crash
+    loses at most the batches since the last write; they are upserted again.
+    """
     
-    def __init__(self, checkpoint_dir: str):
+    def __init__(self, checkpoint_dir: str, save_every_batches: int = 20, 
+                 save_interval_seconds: float = 30.0):
         self.checkpoint_dir = Path(checkpoint_dir)
         self.checkpoint_dir.mkdir(exist_ok=True)
         self.checkpoint_file = self.checkpoint_dir / "processing_checkpoint.json"
+        
+        # Progress write throttling (see save_due / save_progress)
+        self.save_every_batches = save_every_batches
+        self.save_interval_seconds = save_interval_seconds
+        self.batches_since_save = 0
+        self.last_save_time = time.monotonic()
+        self.save_lock: Optional[asyncio.Lock] = None  # Created on the running loop
+        
+        # Commit progress (see start_progress)
+        self.fingerprint: Optional[str] = None
+        self.completed_sources: Dict[str, set] = {}
+        self.chunk_watermarks: Dict[str, Dict[str, int]] = {}
+        self.expected_chunks: Dict[Tuple[str, str], int] = {}
+        self.committed_ahead: Dict[Tuple[str, str], set] = {}
     
-    def save_checkpoint(self, data: Dict[str, Any]) -> None:
-        """Save checkpoint data"""
+    def save_checkpoint(self, data: Dict[str, Any], quiet: bool = False) -> None:
+        """Save checkpoint data atomically (a crash mid-write keeps the previous checkpoint)"""
+        tmp_file = self.checkpoint_file.with_suffix('.json.tmp')
         try:
-            with open(self.checkpoint_file, 'w') as f:
+            with open(tmp_file, 'w') as f:
                 json.dump(data, f, indent=2, default=str)
-            logging.info(f"Checkpoint saved to {self.checkpoint_file}")
+            os.replace(tmp_file, self.checkpoint_file)
+            if not quiet:
+                logging.info(f"Checkpoint saved to {self.checkpoint_file}")
         except Exception as e:
             logging.error(f"Failed to save checkpoint: {e}")
     
+    def save_due(self) -> bool:
+        """Count a committed batch; True once progress should be written"""
+        self.batches_since_save += 1
+        return (self.batches_since_save >= self.save_every_batches or 
+                time.monotonic() - self.last_save_time >= self.save_interval_seconds)
+    
+    async def save_progress(self, extra: Dict[str, Any]) -> None:
+        """Write commit progress (plus extra fields) in a worker thread
+        
+        The snapshot is taken on the event loop, so it is consistent. If a
+        write is already under way this one is skipped; the next due batch
+        writes newer progress anyway.
+        """
+        if self.save_lock is None:
+            self.save_lock = asyncio.Lock()
+        if self.save_lock.locked():
+            return
+        
+        async with self.save_lock:
+            data = {
+                'timestamp': datetime.now().isoformat(),
+                **self.progress_data(),
+                **extra
+            }
+            self.batches_since_save = 0
+            self.last_save_time = time.monotonic()
+            await asyncio.to_thread(self.save_checkpoint, data, True)
+    
+    async def wait_for_save(self) -> None:
+        """Wait for an in-flight progress write (before clearing or overwriting the checkpoint)"""
+        if self.save_lock is not None:
+            async with self.save_lock:
+                pass
+    
+    def start_progress(self, fingerprint: str, checkpoint_data: Optional[Dict[str, Any]] = None) -> None:
+        """Reset commit progress, restoring it from checkpoint_data when it was made with the same settings"""
+        self.fingerprint = fingerprint
+        self.completed_sources = {}
+        self.chunk_watermarks = {}
+        self.expected_chunks = {}
+        self.committed_ahead = {}
+        
+        if not checkpoint_data:
+            return
+        if checkpoint_data.get('fingerprint') != fingerprint:
+            logging.warning("Checkpoint was written with different model/chunking settings; starting from scratch")
+            return
+        
+        self.completed_sources = {
+            source_type: set(source_ids) 
+            for source_type, source_ids in checkpoint_data.get('completed_sources', {}).items()
+        }
+        self.chunk_watermarks = checkpoint_data.get('chunk_watermarks', {})
+        completed = sum(len(source_ids) for source_ids in self.completed_sources.values())
+        partial = sum(len(marks) for marks in self.chunk_watermarks.values())
+        logging.info(f"Resuming: {completed} completed sources, {partial} partially committed sources")
+    
+    def is_source_completed(self, source_type: str, source_id: str) -> bool:
+        """Whether every chunk of the source was committed by a previous run"""
+        return source_id in self.completed_sources.get(source_type, ())
+    
+    def expect_source(self, source_type: str, source_id: str, 
+                      chunks: List[ContentChunk]) -> List[ContentChunk]:
+        """Register a freshly chunked source and return the chunks still to be committed"""
+        watermark = self.chunk_watermarks.get(source_type, {}).get(source_id, -1)
+        remaining = [chunk for chunk in chunks if chunk.chunk_index > watermark]
+        if remaining:
+            self.expected_chunks[(source_type, source_id)] = len(chunks)
+        else:
+            self._complete_source(source_type, source_id)
+        return remaining
+    
+    def record_committed(self, chunks: List[ContentChunk]) -> None:
+        """Advance watermarks for committed chunks (batches may commit out of order)"""
+        for chunk in chunks:
+            key = (chunk.source_type, chunk.source_id)
+            if key not in self.expected_chunks:
+                continue
+            
+            marks = self.chunk_watermarks.setdefault(chunk.source_type, {})
+            ahead = self.committed_ahead.setdefault(key, set())
+            ahead.add(chunk.chunk_index)
+            watermark = marks.get(chunk.source_id, -1)
+            while watermark + 1 in ahead:
+                watermark += 1
+                ahead.discard(watermark)
+            marks[chunk.source_id] = watermark
+            
+            if watermark + 1 >= self.expected_chunks[key]:
+                self._complete_source(*key)
+    
+    def _complete_source(self, source_type: str, source_id: str) -> None:
+        self.completed_sources.setdefault(source_type, set()).add(source_id)
+        self.chunk_watermarks.get(source_type, {}).pop(source_id, None)
+        self.expected_chunks.pop((source_type, source_id), None)
+        self.committed_ahead.pop((source_type, source_id), None)
+    
+    def progress_data(self) -> Dict[str, Any]:
+        """Serializable commit progress"""
+        return {
+            'fingerprint': self.fingerprint,
+            'completed_sources': {
+                source_type: sorted(source_ids) for source_type, source_ids in self.completed_sources.items()
+            },
+            'chunk_watermarks': {source_type: dict(marks) for source_type, marks in self.chunk_watermarks.items()}
+        }
+    
     def load_checkpoint(self) -> Optional[Dict[str, Any]]:
         """Load checkpoint data"""
         try:
@@ -175,16 +515,37 @@ class BatchProcessor:
     def __init__(self, config: ProcessingConfig):
         self.config = config
         self.stats = ProcessingStats(start_time=datetime.now())
-        self.checkpoint_manager = CheckpointManager(config.checkpoint_dir)
+        self.checkpoint_manager = CheckpointManager(
+            config.checkpoint_dir,
+            save_every_batches=config.checkpoint_every_batches,
+            save_interval_seconds=config.checkpoint_interval_seconds
+        )
         
         # Initialize components
-        self.chunker = ContentChunker(chunk_size=config.chunk_size)
-        self.embedding_generator = EmbeddingGenerator(model_name=config.embedding_model)
+        self.chunker = ContentChunker(
+            target_tokens=config.chunk_size,
+            overlap_tokens=config.chunk_overlap,
+            overlap_mode=config.overlap_mode
+        )
+        self.embedding_generator = EmbeddingGenerator(
+            model_name=config.embedding_model,
+            cache_path=config.embedding_cache_path,
+            cache_max_entries=config.embedding_cache_max_entries,
+            backend=config.embedding_backend,
+            workers=config.embedding_workers
+        )
         self.broker_mapper = CanonicalBrokerMapper()
         
         # Database connection
         self.db_pool: Optional[asyncpg.Pool] = None
         
+        # Busy time per streaming stage, for comparing against wall-clock time
+        self.stage_seconds: Dict[str, float] = {}
+        
+        # Incremental state: stored source hashes, and sources still being written
+        self.known_source_hashes: Dict[Tuple[str, str], str] = {}
+        self.source_progress: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        
         # Setup logging
         self._setup_logging()
         
@@ -217,13 +578,28 @@ class BatchProcessor:
             self.db_pool = await asyncpg.create_pool(
                 self.config.database_url,
                 min_size=2,
-                max_size=self.config.max_workers + 2
+                max_size=max(self.config.max_workers, self.config.insert_workers) + 2,
+                init=register_vector_codec
             )
+            await self.check_document_schema()
             logging.info("Database connection pool initialized")
         except Exception as e:
             logging.error(f"Failed to initialize database: {e}")
             raise
     
+    async def check_document_schema(self) -> None:
+        """Fail before processing anything if the documents table predates migration 003"""
+        async with self.db_pool.acquire() as conn:
+            rows = await conn.fetch(
+                "SELECT column_name FROM information_schema.columns WHERE table_name = 'documents'"
+            )
+        missing = set(DOCUMENT_COLUMNS) - {row['column_name'] for row in rows}
+        if missing:
+            raise RuntimeError(
+                f"documents table is missing columns {sorted(missing)}; "
+                "apply database/migrations/003_incremental_indexing.sql"
+            )
+    
     async def close_database(self) -> None:
         """Close database connection pool"""
         if self.db_pool:
@@ -232,122 +608,95 @@ class BatchProcessor:
     
     async def fetch_articles(self) -> List[Dict[str, Any]]:
         """Fetch articles from database"""
-        query = """
-        SELECT id, title, content, excerpt, author, published_at, 
-               category, tags, meta_description, slug
-        FROM articles 
-        WHERE content IS NOT NULL AND content != ''
-        ORDER BY published_at DESC
-        """
-        
         async with self.db_pool.acquire() as conn:
-            rows = await conn.fetch(query)
+            rows = await conn.fetch(ARTICLES_QUERY)
             return [dict(row) for row in rows]
     
     async def fetch_brokers(self) -> List[Dict[str, Any]]:
         """Fetch brokers from database"""
-        query = """
-        SELECT id, name, description, features, regulation_info, 
-               review_summary, trust_score, website_url, 
-               country, founded_year, min_deposit
-        FROM brokers 
-        WHERE (description IS NOT NULL AND description != '') 
-           OR (features IS NOT NULL AND features != '')
-           OR (review_summary IS NOT NULL AND review_summary != '')
-        ORDER BY trust_score DESC NULLS LAST
-        """
-        
         async with self.db_pool.acquire() as conn:
-            rows = await conn.fetch(query)
+            rows = await conn.fetch(BROKERS_QUERY)
             return [dict(row) for row in rows]
     
-    async def process_articles(self, articles: List[Dict[str, Any]]) -> List[ContentChunk]:
-        """Process articles into chunks"""
-        all_chunks = []
+    async def iter_source_rows(self, query: str) -> AsyncIterator[Dict[str, Any]]:
+        """Yield rows through a server-side cursor instead of fetching the whole result set"""
+        async with self.db_pool.acquire() as conn:
+            # asyncpg cursors are only valid inside a transaction
+            async with conn.transaction():
+                async for row in conn.cursor(query, prefetch=self.config.fetch_size):
+                    yield dict(row)
+    
+    def record_chunked(self, source_type: str, source_id: Any, 
+                       chunks: List[ContentChunk], error: Optional[str] = None) -> bool:
+        """Update per-type stats for one chunked (or failed) source; returns success"""
+        if error is not None:
+            logging.error(f"Failed to process {source_type} {source_id}: {error}")
+            if source_type == 'article':
+                self.stats.articles_failed += 1
+            else:
+                self.stats.brokers_failed += 1
+            return False
         
-        for article in tqdm(articles, desc="Processing articles"):
+        if source_type == 'article':
+            self.stats.articles_processed += 1
+            self.stats.article_chunks_created += len(chunks)
+        else:
+            self.stats.brokers_processed += 1
+            self.stats.broker_chunks_created += len(chunks)
+        return True
+    
+    async def chunk_rows(self, source_type: str, rows: List[Dict[str, Any]],
+                         build_document: Callable[[Dict[str, Any]], Dict[str, Any]]) -> List[ContentChunk]:
+        """Chunk source rows across the chunker's process pool, keeping row order"""
+        documents = []
+        for row in rows:
             try:
-                # Combine article content
-                content_parts = []
-                if article.get('title'):
-                    content_parts.append(f"Title: {article['title']}")
-                if article.get('excerpt'):
-                    content_parts.append(f"Excerpt: {article['excerpt']}")
-                if article.get('content'):
-                    content_parts.append(article['content'])
-                
-                full_content = "\n\n".join(content_parts)
-                
-                # Create chunks
-                chunks = self.chunker.chunk_content(
-                    content=full_content,
-                    source_type="article",
-                    source_id=str(article['id']),
-                    metadata={
-                        'title': article.get('title'),
-                        'author': article.get('author'),
-                        'category': article.get('category'),
-                        'tags': article.get('tags'),
-                        'published_at': str(article.get('published_at')),
-                        'slug': article.get('slug')
-                    }
-                )
-                
-                all_chunks.extend(chunks)
-                self.stats.articles_processed += 1
-                self.stats.article_chunks_created += len(chunks)
-                
+                documents.append(build_document(row))
             except Exception as e:
-                logging.error(f"Failed to process article {article.get('id')}: {e}")
-                self.stats.articles_failed += 1
+                self.record_chunked(source_type, row.get('id'), [], str(e))
         
+        # Off the event loop; chunk_documents fans out to max_workers processes
+        loop = asyncio.get_running_loop()
+        results = await loop.run_in_executor(None, lambda: self.chunker.chunk_documents(
+            documents, max_workers=self.config.max_workers, task_size=self.config.chunk_task_size
+        ))
+        
+        all_chunks = []
+        for document, (chunks, error) in zip(documents, results):
+            if self.record_chunked(source_type, document['source_id'], chunks, error):
+                all_chunks.extend(chunks)
         return all_chunks
     
+    def skip_completed_sources(self, source_type: str, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Drop rows whose chunks were all committed before a resume"""
+        pending = [row for row in rows if not self.checkpoint_manager.is_source_completed(source_type, str(row['id']))]
+        self.stats.sources_resumed += len(rows) - len(pending)
+        return pending
+    
+    async def process_articles(self, articles: List[Dict[str, Any]]) -> List[ContentChunk]:
+        """Process articles into chunks"""
+        return await self.chunk_rows('article', articles, article_document)
+    
     async def process_brokers(self, brokers: List[Dict[str, Any]]) -> List[ContentChunk]:
         """Process brokers into chunks"""
-        all_chunks = []
-        
-        for broker in tqdm(brokers, desc="Processing brokers"):
-            try:
-                # Combine broker content
-                content_parts = []
-                if broker.get('name'):
-                    content_parts.append(f"Broker: {broker['name']}")
-                if broker.get('description'):
-                    content_parts.append(f"Description: {broker['description']}")
-                if broker.get('features'):
-                    content_parts.append(f"Features: {broker['features']}")
-                if broker.get('regulation_info'):
-                    content_parts.append(f"Regulation: {broker['regulation_info']}")
-                if broker.get('review_summary'):
-                    content_parts.append(f"Review: {broker['review_summary']}")
-                
-                full_content = "\n\n".join(content_parts)
-                
-                # Create chunks
-                chunks = self.chunker.chunk_content(
-                    content=full_content,
-                    source_type="broker",
-                    source_id=str(broker['id']),
-                    metadata={
-                        'name': broker.get('name'),
-                        'country': broker.get('country'),
-                        'trust_score': broker.get('trust_score'),
-                        'website_url': broker.get('website_url'),
-                        'founded_year': broker.get('founded_year'),
-                        'min_deposit': broker.get('min_deposit')
-                    }
-                )
-                
-                all_chunks.extend(chunks)
-                self.stats.brokers_processed += 1
-                self.stats.broker_chunks_created += len(chunks)
-                
-            except Exception as e:
-                logging.error(f"Failed to process broker {broker.get('id')}: {e}")
-                self.stats.brokers_failed += 1
-        
-        return all_chunks
+        return await self.chunk_rows('broker', brokers, broker_document)
+    
+    def embed_chunk_batch(self, batch: List[ContentChunk]) -> List[Tuple[ContentChunk, np.ndarray]]:
+        """Generate embeddings for a single batch of chunks"""
+        try:
+            # Extract texts for batch processing
+            texts = [chunk.content for chunk in batch]
+            
+            # Generate embeddings
+            embeddings = self.embedding_generator.generate_embeddings_batch(texts)
+            
+            self.stats.embeddings_generated += len(batch)
+            return list(zip(batch, embeddings))
+            
+        except Exception as e:
+            logging.error(f"Failed to generate embeddings for batch: {e}")
+            self.stats.embeddings_failed += len(batch)
+            return []
     
     async def generate_embeddings_batch(self, chunks: List[ContentChunk]) -> List[Tuple[ContentChunk, np.ndarray]]:
         """Generate embeddings for chunks in batches"""
@@ -356,67 +705,394 @@ class BatchProcessor:
         # Process in batches
         for i in tqdm(range(0, len(chunks), self.config.batch_size), desc="Generating embeddings"):
             batch = chunks[i:i + self.config.batch_size]
-            
-            try:
-                # Extract texts for batch processing
-                texts = [chunk.content for chunk in batch]
-                
-                # Generate embeddings
-                embeddings = self.embedding_generator.generate_embeddings_batch(texts)
-                
-                # Pair chunks with embeddings
-                for chunk, embedding in zip(batch, embeddings):
-                    results.append((chunk, embedding))
-                    self.stats.embeddings_generated += 1
-                
-            except Exception as e:
-                logging.error(f"Failed to generate embeddings for batch: {e}")
-                self.stats.embeddings_failed += len(batch)
+            results.extend(self.embed_chunk_batch(batch))
         
         return results
     
-    async def insert_documents_batch(self, chunk_embedding_pairs: List[Tuple[ContentChunk, np.ndarray]]) -> None:
-        """Insert documents into database in batches"""
+    def document_records(self, batch: List[Tuple[ContentChunk, np.ndarray]]) -> List[Tuple]:
+        """Build documents rows (DOCUMENT_COLUMNS order) for chunk/embedding pairs"""
+        created_at = datetime.now()
+        return [
+            (
+                chunk.content,
+                embedding,  # Encoded straight from the NumPy buffer by the vector codec
+                chunk.source_type,
+                chunk.source_id,
+                chunk.chunk_index,
+                chunk.token_count,
+                json.dumps(chunk.metadata),
+                created_at,
+                chunk_content_hash(self.embedding_generator.model_key, chunk.content)
+            )
+            for chunk, embedding in batch
+        ]
+    
+    async def copy_pairs(self, conn: asyncpg.Connection, 
+                         batch: List[Tuple[ContentChunk, np.ndarray]]) -> bool:
+        """Bulk upsert via COPY into the staging table and a single merge statement"""
+        try:
+            async with conn.transaction():
+                await conn.execute(CREATE_STAGING_QUERY)
+                await conn.copy_records_to_table(
+                    STAGING_TABLE, records=self.document_records(batch), columns=DOCUMENT_COLUMNS
+                )
+                await conn.execute(MERGE_STAGING_QUERY)
+            self.stats.documents_inserted += len(batch)
+            return True
+            
+        except Exception as e:
+            logging.error(f"Failed to copy document batch: {e}")
+            self.stats.database_errors += len(batch)
+            return False
+    
+    async def insert_pairs(self, conn: asyncpg.Connection, 
+                           batch: List[Tuple[ContentChunk, np.ndarray]]) -> bool:
+        """Upsert one batch of chunk/embedding pairs on an open connection"""
+        if self.config.use_copy:
+            return await self.copy_pairs(conn, batch)
+        
         insert_query = """
         INSERT INTO documents (
             content, content_embedding, source_type, source_id, 
-            chunk_index, token_count, metadata, created_at
-        ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
+            chunk_index, token_count, metadata, created_at, content_hash
+        ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
         ON CONFLICT (source_type, source_id, chunk_index) 
         DO UPDATE SET 
             content = EXCLUDED.content,
             content_embedding = EXCLUDED.content_embedding,
             token_count = EXCLUDED.token_count,
             metadata = EXCLUDED.metadata,
+            content_hash = EXCLUDED.content_hash,
             updated_at = CURRENT_TIMESTAMP
         """
         
+        try:
+            # Execute batch insert
+            await conn.executemany(insert_query, self.document_records(batch))
+            self.stats.documents_inserted += len(batch)
+            return True
+            
+        except Exception as e:
+            logging.error(f"Failed to insert document batch: {e}")
+            self.stats.database_errors += len(batch)
+            return False
+    
+    async def insert_documents_batch(self, chunk_embedding_pairs: List[Tuple[ContentChunk, np.ndarray]]) -> None:
+        """Insert documents into database in batches"""
+        batch_size = self.config.copy_batch_size if self.config.use_copy else self.config.batch_size
+        async with self.db_pool.acquire() as conn:
+            for i in tqdm(range(0, len(chunk_embedding_pairs), batch_size), desc="Inserting documents"):
+                batch = chunk_embedding_pairs[i:i + batch_size]
+                if await self.insert_pairs(conn, batch):
+                    await self.checkpoint_committed(batch)
+    
+    def checkpoint_fingerprint(self) -> str:
+        """Settings a checkpoint's chunk indices are only valid for"""
+        payload = json.dumps({
+            'model': self.embedding_generator.model_key,
+            'chunking': [CHUNKER_VERSION, *self.chunker.settings()],
+            'sources': [self.config.process_articles, self.config.process_brokers]
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def resume_chunks(self, source_type: str, source_id: str, 
+                      chunks: List[ContentChunk]) -> List[ContentChunk]:
+        """Register a chunked source for checkpointing and drop chunks a previous run committed"""
+        remaining = self.checkpoint_manager.expect_source(source_type, source_id, chunks)
+        self.stats.chunks_resumed += len(chunks) - len(remaining)
+        return remaining
+    
+    async def checkpoint_committed(self, batch: List[Tuple[ContentChunk, np.ndarray]]) -> None:
+        """Record a committed insert batch; progress is persisted every few batches"""
+        self.checkpoint_manager.record_committed([chunk for chunk, _ in batch])
+        if self.checkpoint_manager.save_due():
+            await self.checkpoint_manager.save_progress({'stats': self.stats.to_dict()})
+    
+    async def load_source_hashes(self) -> None:
+        """Load the stored per-source content hashes (one small row per source)"""
+        async with self.db_pool.acquire() as conn:
+            rows = await conn.fetch("SELECT source_type, source_id, content_hash FROM document_sources")
+        self.known_source_hashes = {
+            (row['source_type'], row['source_id']): row['content_hash'] for row in rows
+        }
+        logging.info(f"Loaded content hashes for {len(self.known_source_hashes)} indexed sources")
+    
+    async def finalize_source(self, conn: asyncpg.Connection, source_type: str, source_id: str) -> None:
+        """Drop orphaned trailing chunks and record the source hash once all its chunks are committed"""
+        progress = self.source_progress.pop((source_type, source_id))
+        async with conn.transaction():
+            status = await conn.execute(
+                "DELETE FROM documents WHERE source_type = $1 AND source_id = $2 AND chunk_index >= $3",
+                source_type, source_id, progress['chunk_count']
+            )
+            await conn.execute(
+                """
+                INSERT INTO document_sources (source_type, source_id, content_hash, chunk_count, indexed_at)
+                VALUES ($1, $2, $3, $4, CURRENT_TIMESTAMP)
+                ON CONFLICT (source_type, source_id)
+                DO UPDATE SET
+                    content_hash = EXCLUDED.content_hash,
+                    chunk_count = EXCLUDED.chunk_count,
+                    indexed_at = EXCLUDED.indexed_at
+                """,
+                source_type, source_id, progress['hash'], progress['chunk_count']
+            )
+        # asyncpg returns the command tag, e.g. "DELETE 3"
+        self.stats.chunks_deleted += int(status.split()[-1])
+    
+    async def select_changed_chunks(self, source_type: str, 
+                                    chunked: List[Tuple[str, List[ContentChunk]]]) -> List[ContentChunk]:
+        """Return only the chunks whose stored hash differs; refresh the rest in place
+        
+        Unchanged chunks of a changed source only get their metadata and token
+        count updated. Sources with nothing left to embed are finalized here,
+        the others when their last chunk is committed by an inserter.
+        """
+        model_name = self.embedding_generator.model_key
+        source_ids = [source_id for source_id, _ in chunked]
+        
         async with self.db_pool.acquire() as conn:
-            for i in tqdm(range(0, len(chunk_embedding_pairs), self.config.batch_size), desc="Inserting documents"):
-                batch = chunk_embedding_pairs[i:i + self.config.batch_size]
+            rows = await conn.fetch(
+                "SELECT source_id, chunk_index, content_hash FROM documents "
+                "WHERE source_type = $1 AND source_id = ANY($2::text[])",
+                source_type, source_ids
+            )
+            stored = {(row['source_id'], row['chunk_index']): row['content_hash'] for row in rows}
+            
+            changed: List[ContentChunk] = []
+            refreshed = []
+            finished = []
+            for source_id, chunks in chunked:
+                pending = 0
+                for chunk in chunks:
+                    if stored.get((source_id, chunk.chunk_index)) == chunk_content_hash(model_name, chunk.content):
+                        refreshed.append((json.dumps(chunk.metadata), chunk.token_count, 
+                                          source_type, source_id, chunk.chunk_index))
+                    else:
+                        changed.append(chunk)
+                        pending += 1
+                
+                progress = self.source_progress[(source_type, source_id)]
+                progress['chunk_count'] = len(chunks)
+                progress['pending'] = pending
+                if pending == 0:
+                    finished.append(source_id)
+            
+            if refreshed:
+                await conn.executemany(
+                    """
+                    UPDATE documents SET metadata = $1, token_count = $2, updated_at = CURRENT_TIMESTAMP
+                    WHERE source_type = $3 AND source_id = $4 AND chunk_index = $5
+                    """,
+                    refreshed
+                )
+                self.stats.chunks_unchanged += len(refreshed)
+            
+            for source_id in finished:
+                await self.finalize_source(conn, source_type, source_id)
+        
+        return changed
+    
+    async def mark_chunks_committed(self, conn: asyncpg.Connection, 
+                                    batch: List[Tuple[ContentChunk, np.ndarray]]) -> None:
+        """Count committed chunks down per source and finalize sources that are complete"""
+        for chunk, _ in batch:
+            key = (chunk.source_type, chunk.source_id)
+            progress = self.source_progress.get(key)
+            if progress is None:
+                continue
+            progress['pending'] -= 1
+            if progress['pending'] == 0:
+                await self.finalize_source(conn, chunk.source_type, chunk.source_id)
+    
+    async def _stream_chunks(self, chunk_queue: asyncio.Queue, broker_names: List[Dict[str, Any]],
+                             chunk_executor: Optional[ProcessPoolExecutor]) -> None:
+        """Pipeline stage: cursor rows -> chunk batches
+        
+        Rows are grouped into ``chunk_task_size`` documents and chunked in the
+        process pool, with up to two tasks per worker in flight. Results are
+        consumed in submission order so chunk batches stay deterministic.
+        """
+        loop = asyncio.get_running_loop()
+        sources: List[Tuple[str, str, Callable[[Dict[str, Any]], Dict[str, Any]]]] = []
+        if self.config.process_articles:
+            sources.append(('article', ARTICLES_QUERY, article_document))
+        if self.config.process_brokers:
+            sources.append(('broker', BROKERS_QUERY, broker_document))
+        
+        max_in_flight = max(1, self.config.max_workers) * 2
+        in_flight: deque = deque()
+        pending: List[ContentChunk] = []
+        
+        def submit(source_type: str, documents: List[Dict[str, Any]]) -> None:
+            if chunk_executor is not None:
+                future = loop.run_in_executor(chunk_executor, chunk_documents_in_worker, documents)
+            else:
+                future = loop.create_future()
+                future.set_result(self.chunker.chunk_documents(documents, max_workers=1))
+            in_flight.append((source_type, documents, future))
+        
+        async def collect_oldest() -> None:
+            nonlocal pending
+            source_type, documents, future = in_flight.popleft()
+            chunked: List[Tuple[str, List[ContentChunk]]] = []
+            for document, (chunks, error) in zip(documents, await future):
+                if self.record_chunked(source_type, document['source_id'], chunks, error):
+                    chunked.append((document['source_id'], chunks))
+            
+            if self.config.incremental:
+                # document_sources is the durable per-source checkpoint in this mode
+                pending.extend(await self.select_changed_chunks(source_type, chunked))
+            else:
+                for source_id, chunks in chunked:
+                    pending.extend(self.resume_chunks(source_type, source_id, chunks))
+            
+            while len(pending) >= self.config.batch_size:
+                await chunk_queue.put(pending[:self.config.batch_size])
+                pending = pending[self.config.batch_size:]
+        
+        for source_type, query, build_document in sources:
+            logging.info(f"Streaming {source_type} rows from database...")
+            documents: List[Dict[str, Any]] = []
+            async for row in self.iter_source_rows(query):
+                if source_type == 'broker' and row.get('name'):
+                    # Only the name is needed for canonical mapping
+                    broker_names.append({'name': row['name']})
                 
                 try:
-                    # Prepare batch data
-                    batch_data = []
-                    for chunk, embedding in batch:
-                        batch_data.append((
-                            chunk.content,
-                            embedding.tolist(),  # Convert numpy array to list for JSON
-                            chunk.source_type,
-                            chunk.source_id,
-                            chunk.chunk_index,
-                            chunk.token_count,
-                            json.dumps(chunk.metadata),
-                            datetime.now()
-                        ))
-                    
-                    # Execute batch insert
-                    await conn.executemany(insert_query, batch_data)
-                    self.stats.documents_inserted += len(batch)
-                    
+                    document = build_document(row)
                 except Exception as e:
-                    logging.error(f"Failed to insert document batch: {e}")
-                    self.stats.database_errors += len(batch)
+                    self.record_chunked(source_type, row.get('id'), [], str(e))
+                    continue
+                
+                if self.checkpoint_manager.is_source_completed(source_type, document['source_id']):
+                    self.stats.sources_resumed += 1
+                    continue
+                
+                if self.config.incremental:
+                    key = (source_type, document['source_id'])
+                    content_hash = source_content_hash(
+                        document, self.embedding_generator.model_key,
+                        [CHUNKER_VERSION, *self.chunker.settings()]
+                    )
+                    if self.known_source_hashes.get(key) == content_hash:
+                        self.stats.sources_unchanged += 1
+                        continue
+                    self.source_progress[key] = {'hash': content_hash}
+                
+                documents.append(document)
+                if len(documents) >= self.config.chunk_task_size:
+                    submit(source_type, documents)
+                    documents = []
+                    while len(in_flight) >= max_in_flight:
+                        await collect_oldest()
+            
+            if documents:
+                submit(source_type, documents)
+        
+        while in_flight:
+            await collect_oldest()
+        
+        if pending:
+            await chunk_queue.put(pending)
+        await chunk_queue.put(None)
+    
+    async def _stream_embeddings(self, chunk_queue: asyncio.Queue, insert_queue: asyncio.Queue,
+                                 embedding_executor: ThreadPoolExecutor) -> None:
+        """Pipeline stage: chunk batches -> chunk/embedding pairs on the embedding thread"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await chunk_queue.get()
+            if batch is None:
+                break
+            started = time.perf_counter()
+            pairs = await loop.run_in_executor(embedding_executor, self.embed_chunk_batch, batch)
+            self.stage_seconds['embedding'] += time.perf_counter() - started
+            if pairs:
+                await insert_queue.put(pairs)
+        
+        # One sentinel per inserter
+        for _ in range(self.config.insert_workers):
+            await insert_queue.put(None)
+    
+    async def _stream_inserts(self, insert_queue: asyncio.Queue) -> None:
+        """Pipeline stage: chunk/embedding pairs -> documents table (one per insert worker)"""
+        async with self.db_pool.acquire() as conn:
+            while True:
+                batch = await insert_queue.get()
+                if batch is None:
+                    break
+                started = time.perf_counter()
+                committed = await self.insert_pairs(conn, batch)
+                if committed and self.config.incremental:
+                    await self.mark_chunks_committed(conn, batch)
+                elif committed:
+                    await self.checkpoint_committed(batch)
+                self.stage_seconds['insert'] += time.perf_counter() - started
+    
+    async def _drain_chunks(self, chunk_queue: asyncio.Queue) -> None:
+        """Pipeline stage used when embeddings are disabled: discard chunk batches"""
+        while await chunk_queue.get() is not None:
+            pass
+    
+    async def run_streaming(self) -> List[Dict[str, Any]]:
+        """Stream rows through chunking -> embedding -> insert with bounded queues
+        
+        Chunking runs in a process pool (``max_workers``), embedding on a
+        dedicated worker thread and inserts on ``insert_workers`` concurrent
+        pool connections, so the stages overlap and wall-clock time tends
+        towards the slowest stage. Peak memory is bounded by the queue depths
+        rather than by corpus size, and documents are committed as each batch
+        completes. In incremental mode unchanged sources are skipped before
+        chunking and only chunks with a new content hash are re-embedded.
+        Returns the (name-only) broker rows needed for canonical mapping.
+        """
+        chunk_queue: asyncio.Queue = asyncio.Queue(maxsize=self.config.chunk_queue_size)
+        insert_queue: asyncio.Queue = asyncio.Queue(maxsize=self.config.insert_queue_size)
+        broker_names: List[Dict[str, Any]] = []
+        self.stage_seconds = {'embedding': 0.0, 'insert': 0.0}
+        
+        if self.config.incremental:
+            await self.load_source_hashes()
+        
+        chunk_executor = None
+        if self.config.max_workers > 1:
+            chunk_executor = ProcessPoolExecutor(
+                max_workers=self.config.max_workers,
+                initializer=init_chunk_worker,
+                initargs=self.chunker.settings()
+            )
+        embedding_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='embedding')
+        
+        stages = [self._stream_chunks(chunk_queue, broker_names, chunk_executor)]
+        if self.config.generate_embeddings:
+            stages.append(self._stream_embeddings(chunk_queue, insert_queue, embedding_executor))
+            stages.extend(self._stream_inserts(insert_queue) for _ in range(self.config.insert_workers))
+        else:
+            stages.append(self._drain_chunks(chunk_queue))
+        
+        started = time.perf_counter()
+        tasks = [asyncio.create_task(stage) for stage in stages]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            # A failed stage would leave its neighbours blocked on a queue
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        finally:
+            if chunk_executor is not None:
+                chunk_executor.shutdown(wait=True, cancel_futures=True)
+            embedding_executor.shutdown(wait=True)
+        
+        logging.info(
+            f"Streamed {self.stats.article_chunks_created + self.stats.broker_chunks_created} chunks, "
+            f"inserted {self.stats.documents_inserted} documents in {time.perf_counter() - started:.2f}s "
+            f"(embedding busy {self.stage_seconds['embedding']:.2f}s, "
+            f"insert busy {self.stage_seconds['insert']:.2f}s across {self.config.insert_workers} workers)"
+        )
+        return broker_names
     
     async def update_canonical_mappings(self, brokers: List[Dict[str, Any]]) -> None:
         """Update canonical broker mappings"""
@@ -462,18 +1138,24 @@ class BatchProcessor:
             with open(chunks_file, 'w') as f:
                 json.dump([asdict(chunk) for chunk in chunks], f, indent=2, default=str)
             
-            # Save embeddings metadata
-            embeddings_meta_file = self.output_dir / f"embeddings_meta_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-            embeddings_meta = [
-                {
-                    'chunk': asdict(chunk),
-                    'embedding_shape': embedding.shape,
-                    'embedding_norm': float(np.linalg.norm(embedding))
-                }
-                for chunk, embedding in embeddings
-            ]
-            with open(embeddings_meta_file, 'w') as f:
-                json.dump(embeddings_meta, f, indent=2, default=str)
+            # Save embeddings to a memory-mapped store; chunk text stays in the chunks file
+            if embeddings:
+                store = EmbeddingStore(self.output_dir / f"embeddings_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+                store.append(
+                    [f"{chunk.source_type}_{chunk.source_id}_{chunk.chunk_index}" for chunk, _ in embeddings],
+                    np.stack([embedding for _, embedding in embeddings]),
+                    [
+                        {
+                            'source_type': chunk.source_type,
+                            'source_id': chunk.source_id,
+                            'chunk_index': chunk.chunk_index,
+                            'category': chunk.metadata.get('category'),
+                            'token_count': chunk.token_count,
+                            'model_name': self.embedding_generator.model_key
+                        }
+                        for chunk, _ in embeddings
+                    ]
+                )
             
             logging.info(f"Results saved to {self.output_dir}")
             
@@ -487,10 +1169,26 @@ class BatchProcessor:
             checkpoint_data = None
             if resume_from_checkpoint:
                 checkpoint_data = self.checkpoint_manager.load_checkpoint()
+            self.checkpoint_manager.start_progress(self.checkpoint_fingerprint(), checkpoint_data)
             
             # Initialize database
             await self.initialize_database()
             
+            if self.config.streaming or self.config.incremental:
+                brokers = await self.run_streaming()
+                
+                # Update canonical mappings
+                if self.config.update_canonical_mapping and brokers:
+                    logging.info("Updating canonical broker mappings...")
+                    await self.update_canonical_mappings(brokers)
+                    logging.info(f"Updated {self.stats.canonical_mappings_created} canonical mappings")
+                
+                # Per-chunk result files would hold the whole corpus again
+                logging.info("Streaming mode: skipping chunk/embedding result files")
+                await self.checkpoint_manager.wait_for_save()
+                self.checkpoint_manager.clear_checkpoint()
+                return self.stats
+            
             all_chunks = []
             
             # Process articles
@@ -498,6 +1196,7 @@ class BatchProcessor:
                 logging.info("Fetching articles from database...")
                 articles = await self.fetch_articles()
                 logging.info(f"Found {len(articles)} articles to process")
+                articles = self.skip_completed_sources('article', articles)
                 
                 if articles:
                     article_chunks = await self.process_articles(articles)
@@ -511,11 +1210,22 @@ class BatchProcessor:
                 brokers = await self.fetch_brokers()
                 logging.info(f"Found {len(brokers)} brokers to process")
                 
-                if brokers:
-                    broker_chunks = await self.process_brokers(brokers)
+                # Completed brokers still take part in canonical mapping
+                pending_brokers = self.skip_completed_sources('broker', brokers)
+                if pending_brokers:
+                    broker_chunks = await self.process_brokers(pending_brokers)
                     all_chunks.extend(broker_chunks)
                     logging.info(f"Created {len(broker_chunks)} broker chunks")
             
+            # Drop chunks committed before a resume
+            by_source: Dict[Tuple[str, str], List[ContentChunk]] = {}
+            for chunk in all_chunks:
+                by_source.setdefault((chunk.source_type, chunk.source_id), []).append(chunk)
+            all_chunks = [
+                chunk for (source_type, source_id), chunks in by_source.items()
+                for chunk in self.resume_chunks(source_type, source_id, chunks)
+            ]
+            
             # Generate embeddings
             embeddings = []
             if self.config.generate_embeddings and all_chunks:
@@ -540,6 +1250,7 @@ class BatchProcessor:
                 await self.save_processing_results(all_chunks, embeddings)
             
             # Clear checkpoint on successful completion
+            await self.checkpoint_manager.wait_for_save()
             self.checkpoint_manager.clear_checkpoint()
             
         except Exception as e:
@@ -547,8 +1258,10 @@ class BatchProcessor:
             logging.error(traceback.format_exc())
             
             # Save checkpoint for resuming
+            await self.checkpoint_manager.wait_for_save()
             checkpoint_data = {
                 'timestamp': datetime.now().isoformat(),
+                **self.checkpoint_manager.progress_data(),
                 'stats': self.stats.to_dict(),
                 'error': str(e)
             }
@@ -559,6 +1272,14 @@ class BatchProcessor:
             # Finalize stats
             self.stats.end_time = datetime.now()
             
+            if self.embedding_generator.cache is not None:
+                cache_stats = self.embedding_generator.cache.get_stats()
+                logging.info(f"Embedding cache: {cache_stats['cache_hits']} hits, "
+                             f"{cache_stats['cache_misses']} misses "
+                             f"({cache_stats['cache_hit_rate']:.1f}% hit rate)")
+            
+            self.embedding_generator.close()
+            
             # Close database
             await self.close_database()
         
@@ -607,6 +1328,18 @@ async def main():
     parser.add_argument('--batch-size', type=int, default=50, help='Batch size for processing')
     parser.add_argument('--output-dir', type=str, default='./output', help='Output directory')
     parser.add_argument('--log-level', type=str, default='INFO', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'])
+    parser.add_argument('--streaming', action='store_true', help='Stream rows through a bounded-memory pipeline')
+    parser.add_argument('--incremental', action='store_true', help='Only re-embed sources and chunks whose content changed')
+    parser.add_argument('--fetch-size', type=int, help='Rows prefetched per cursor round trip (streaming)')
+    parser.add_argument('--queue-size', type=int, help='Batches buffered between pipeline stages (streaming)')
+    parser.add_argument('--max-workers', type=int, help='Chunking processes (streaming)')
+    parser.add_argument('--insert-workers', type=int, help='Concurrent insert connections (streaming)')
+    parser.add_argument('--use-copy', action='store_true', help='Bulk load documents with COPY and one merge per batch')
+    parser.add_argument('--embedding-cache', type=str, help='SQLite embedding cache file')
+    parser.add_argument('--no-embedding-cache', action='store_true', help='Disable the embedding cache')
+    parser.add_argument('--embedding-backend', choices=EMBEDDING_BACKENDS, help='torch, or onnx for the int8 quantised CPU graph')
+    parser.add_argument('--embedding-workers', type=int, help='Encode worker processes, each with its own model copy')
+    parser.add_argument('--checkpoint-every', type=int, help='Write commit progress every N insert batches')
     
     args = parser.parse_args()
     
@@ -639,6 +1372,43 @@ async def main():
     if args.log_level:
         config.log_level = args.log_level
     
+    if args.streaming:
+        config.streaming = True
+    
+    if args.incremental:
+        config.incremental = True
+    
+    if args.fetch_size:
+        config.fetch_size = args.fetch_size
+    
+    if args.queue_size:
+        config.chunk_queue_size = args.queue_size
+        config.insert_queue_size = args.queue_size
+    
+    if args.max_workers:
+        config.max_workers = args.max_workers
+    
+    if args.insert_workers:
+        config.insert_workers = args.insert_workers
+    
+    if args.use_copy:
+        config.use_copy = True
+    
+    if args.embedding_cache:
+        config.embedding_cache_path = args.embedding_cache
+    
+    if args.no_embedding_cache:
+        config.embedding_cache_path = None
+    
+    if args.embedding_backend:
+        config.embedding_backend = args.embedding_backend
+    
+    if args.embedding_workers is not None:
+        config.embedding_workers = args.embedding_workers
+    
+    if args.checkpoint_every:
+        config.checkpoint_every_batches = args.checkpoint_every
+    
     # Create processor and run
     processor = BatchProcessor(config)
     
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Broker Extraction Rulebook for Brokeranalysis Platform
+Compiled patterns for the broker fields pulled out of review text (rating,
+minimum deposit, leverage, regulation, pros/cons) and the rules the cleaning
+scripts (clean_broker_data, cleanup_broker_data) apply to the extracted values.
+html_extraction and both cleaning scripts read the same BROKER_RULES.
+
+Every rule lists keywords, literals that any match has to contain. A text is
+case-folded once and a rule only runs its regex when one of its keywords is in
+it, so a page without "leverage" never runs the leverage patterns. Results are
+the same as searching every pattern. Each rule counts its calls, skips, hits and
+search time for get_stats().
+"""
+
+import re
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Characters re.IGNORECASE matches to an ASCII letter that str.lower() maps elsewhere
+KEYWORD_FOLD = str.maketrans({'İ': 'i', 'ı': 'i', 'ſ': 's'})
+
+def fold_text(text: str) -> str:
+    """Lower-cased text for keyword checks"""
+    return text.translate(KEYWORD_FOLD).lower()
+
+@dataclass
+class Rule:
+    """A compiled pattern and the keywords (lower case) one of which every match contains"""
+    field: str
+    name: str
+    pattern: re.Pattern
+    keywords: Tuple[str, ...] = ()
+    calls: int = 0
+    skipped: int = 0
+    hits: int = 0
+    seconds: float = 0.0
+
+    def search(self, text: str, folded: Optional[str] = None) -> Optional[re.Match]:
+        """pattern.search(text), skipped when folded text has none of the keywords"""
+        self.calls += 1
+        if self.keywords and not any(keyword in folded for keyword in self.keywords):
+            self.skipped += 1
+            return None
+
+        start_time = time.perf_counter()
+        match = self.pattern.search(text)
+        self.seconds += time.perf_counter() - start_time
+        if match:
+            self.hits += 1
+        return match
+
+def rule(field: str, name: str, pattern: str, keywords: Sequence[str] = (), flags: int = re.IGNORECASE) -> Rule:
+    """Compile a rule; keywords must be literals that appear in every match"""
+    return Rule(field, name, re.compile(pattern, flags), tuple(keyword.lower() for keyword in keywords))
+
+class TextScan:
+    """Rules of a RuleBook run over one text, which is case-folded at most once"""
+
+    def __init__(self, rulebook: 'RuleBook', text: str):
+        self.rulebook = rulebook
+        self.text = text
+        self._folded = None
+
+    @property
+    def folded(self) -> str:
+        if self._folded is None:
+            self._folded = fold_text(self.text)
+        return self._folded
+
+    def search(self, field_rule: Rule) -> Optional[re.Match]:
+        return field_rule.search(self.text, self.folded if field_rule.keywords else None)
+
+    def first_match(self, field: str) -> Optional[re.Match]:
+        """Match of the first rule of field that matches the text"""
+        for field_rule in self.rulebook.rules[field]:
+            match = self.search(field_rule)
+            if match:
+                return match
+        return None
+
+    def first(self, field: str, group: int = 1) -> str:
+        """Capture group of first_match(field), else ''"""
+        match = self.first_match(field)
+        return match.group(group) if match else ''
+
+    def tags(self, field: str) -> List[str]:
+        """Names of every rule of field that matches the text, in rule order"""
+        return [field_rule.name for field_rule in self.rulebook.rules[field] if self.search(field_rule)]
+
+class RuleBook:
+    """Ordered rules per field; the first matching rule of a field wins"""
+
+    def __init__(self, rules: Sequence[Rule]):
+        self.rules: Dict[str, List[Rule]] = {}
+        for field_rule in rules:
+            self.rules.setdefault(field_rule.field, []).append(field_rule)
+
+    def scan(self, text: str) -> TextScan:
+        """Run several fields over the same text"""
+        return TextScan(self, text)
+
+    def first_match(self, field: str, text: str) -> Optional[re.Match]:
+        return self.scan(text).first_match(field)
+
+    def first(self, field: str, text: str, group: int = 1) -> str:
+        return self.scan(text).first(field, group)
+
+    def tags(self, field: str, text: str) -> List[str]:
+        return self.scan(text).tags(field)
+
+    def get_stats(self) -> Dict[str, Dict]:
+        """Calls, keyword skips, hits and search time per rule that has run"""
+        return {
+            f"{field_rule.field}.{field_rule.name}": {
+                'calls': field_rule.calls,
+                'skipped': field_rule.skipped,
+                'hits': field_rule.hits,
+                'seconds': field_rule.seconds
+            }
+            for field_rules in self.rules.values() for field_rule in field_rules if field_rule.calls
+        }
+
+    def reset_stats(self) -> None:
+        for field_rules in self.rules.values():
+            for field_rule in field_rules:
+                field_rule.calls = field_rule.skipped = field_rule.hits = 0
+                field_rule.seconds = 0.0
+
+BROKER_RULES = RuleBook([
+    # Review text, first matching rule per field (html_extraction.broker_details_from_text)
+    rule('rating', 'rating', r'rating[:\s]*([0-9](?:\.[0-9])?)[\s/]*(?:out of )?[0-9]?', ['rating']),
+    rule('rating', 'score', r'score[:\s]*([0-9](?:\.[0-9])?)', ['score']),
+    rule('rating', 'out_of', r'([0-9](?:\.[0-9])?)[\s]*(?:out of|/)[\s]*[0-9]', ['out of', '/']),
+    rule('minimum_deposit', 'minimum_deposit', r'minimum deposit[:\s]*\$?([0-9,]+)', ['minimum deposit']),
+    rule('minimum_deposit', 'min_deposit', r'min deposit[:\s]*\$?([0-9,]+)', ['min deposit']),
+    rule('minimum_deposit', 'deposit', r'deposit[:\s]*\$?([0-9,]+)', ['deposit']),
+    rule('leverage', 'ratio', r'leverage[:\s]*([0-9]+:[0-9]+)', ['leverage']),
+    rule('leverage', 'multiplier', r'leverage[:\s]*([0-9]+x)', ['leverage']),
+    rule('leverage', 'ratio_before', r'([0-9]+:[0-9]+)[\s]*leverage', ['leverage']),
+    rule('regulation', 'regulated_by', r'regulated by[:\s]*([A-Z]{2,10})', ['regulated by']),
+    rule('regulation', 'regulation', r'regulation[:\s]*([A-Z]{2,10})', ['regulation']),
+    rule('regulation', 'regulated_after', r'([A-Z]{2,10})[\s]*regulated', ['regulated']),
+    rule('pros', 'pros', r'pros?[:\s]*([^\n]*(?:\n[^\n]*){0,5})', ['pro']),
+    rule('cons', 'cons', r'cons?[:\s]*([^\n]*(?:\n[^\n]*){0,5})', ['con']),
+
+    # Extracted values (clean_broker_data, cleanup_broker_data)
+    rule('rating_value', 'decimal', r'(\d+\.?\d*)', flags=0),
+    rule('deposit_amount', 'amount', r'([$€£¥]?\s*\d+[,\d]*(?:\.\d{1,2})?)', flags=0),
+    rule('integer', 'integer', r'(\d+)', flags=0),
+    rule('leverage_ratio', 'one_to', r'1:(\d+)', ['1:'], flags=0),
+
+    # Regulator abbreviations named in a regulation field (clean_broker_data)
+    *[rule('regulator_names', name, name, [name]) for name in (
+        'ASIC', 'CySEC', 'FCA', 'FSCS', 'FSC', 'EFSA', 'MiFID',
+        'SEC', 'FINRA', 'MAS', 'SFC', 'DFSA', 'ADGM', 'CBI'
+    )],
+
+    # Regulators, platforms and account types mentioned in description/pros/cons (cleanup_broker_data)
+    rule('regulators', 'FCA', r'FCA|Financial Conduct Authority', ['fca', 'financial conduct authority']),
+    rule('regulators', 'CySEC', r'CySEC|Cyprus Securities|Cyprus.*Exchange', ['cysec', 'cyprus']),
+    rule('regulators', 'ASIC', r'ASIC|Australian Securities|Australian.*Investment', ['asic', 'australian']),
+    rule('regulators', 'CFTC', r'CFTC|Commodity Futures Trading', ['cftc', 'commodity futures trading']),
+    rule('regulators', 'NFA', r'NFA|National Futures Association', ['nfa', 'national futures association']),
+    rule('regulators', 'BaFin', r'BaFin|German.*Financial', ['bafin', 'german']),
+    rule('regulators', 'CONSOB', r'CONSOB|Italian.*Securities', ['consob', 'italian']),
+    rule('regulators', 'FINMA', r'FINMA|Swiss.*Financial', ['finma', 'swiss']),
+    rule('regulators', 'FSA', r'FSA|Financial Services Authority', ['fsa', 'financial services authority']),
+    rule('regulators', 'MAS', r'MAS|Monetary Authority.*Singapore', ['mas', 'monetary authority']),
+    rule('regulators', 'JFSA', r'JFSA|Japan.*Financial', ['jfsa', 'japan']),
+
+    rule('platforms', 'MetaTrader 4', r'MT4|MetaTrader 4', ['mt4', 'metatrader 4']),
+    rule('platforms', 'MetaTrader 5', r'MT5|MetaTrader 5', ['mt5', 'metatrader 5']),
+    rule('platforms', 'cTrader', r'cTrader', ['ctrader']),
+    rule('platforms', 'TradingView', r'TradingView', ['tradingview']),
+    rule('platforms', 'Proprietary', r'proprietary|own platform|custom platform',
+         ['proprietary', 'own platform', 'custom platform']),
+    rule('platforms', 'WebTrader', r'WebTrader|web.*platform', ['web']),
+    rule('platforms', 'Mobile', r'mobile.*app|iPhone|Android', ['mobile', 'iphone', 'android']),
+
+    rule('account_types', 'ECN', r'ECN|Electronic Communication Network', ['ecn', 'electronic communication network']),
+    rule('account_types', 'STP', r'STP|Straight Through Processing', ['stp', 'straight through processing']),
+    rule('account_types', 'Market Maker', r'Market Maker|MM|dealing desk', ['market maker', 'mm', 'dealing desk']),
+    rule('account_types', 'Islamic', r'Islamic|Sharia|Swap.*free|Halal', ['islamic', 'sharia', 'swap', 'halal']),
+    rule('account_types', 'Scalping Friendly', r'scalping.*allow|scalping.*friend', ['scalping']),
+    rule('account_types', 'High Leverage', r'leverage.*up to|maximum leverage', ['leverage']),
+    rule('account_types', 'Low Spread', r'spread.*from|tight spread|low spread', ['spread']),
+])
@@ -9,6 +9,7 @@ Date: 2024
 
 import os
 import json
+import hashlib
 import logging
 import re
 from typing import List, Dict, Optional, Tuple, Set
@@ -17,7 +18,8 @@ from pathlib import Path
 import argparse
 from datetime import datetime
 import time
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
+from functools import lru_cache
 
 try:
     from rapidfuzz import fuzz, process
@@ -25,6 +27,12 @@ except ImportError:
     print("Please install rapidfuzz: pip install rapidfuzz")
     exit(1)
 
+try:
+    import numpy as np
+except ImportError:
+    print("Please install numpy: pip install numpy")
+    exit(1)
+
 try:
     import pandas as pd
 except ImportError:
@@ -42,6 +50,109 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Corporate suffixes, generic industry words and articles dropped by normalization
+NAME_STOP_WORDS = frozenset({
+    'ltd', 'limited', 'inc', 'incorporated', 'llc', 'corp', 'corporation',
+    'group', 'holdings', 'international', 'global', 'worldwide',
+    'fx', 'forex', 'trading', 'capital', 'markets', 'securities',
+    'investment', 'financial', 'services', 'brokerage',
+    'the', 'a', 'an'
+})
+
+# Common abbreviations added as name variations
+NAME_ABBREVIATIONS = (
+    ('international', 'intl'),
+    ('corporation', 'corp'),
+    ('limited', 'ltd'),
+    ('incorporated', 'inc'),
+    ('financial', 'fin'),
+    ('securities', 'sec'),
+    ('investment', 'inv')
+)
+
+PUNCTUATION_PATTERN = re.compile(r'[^\w\s]')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+@lru_cache(maxsize=65536)
+def normalize_name(name: str) -> str:
+    """Lowercase, rebrand, strip punctuation and stop words (memoised)"""
+    if not name:
+        return ""
+    
+    lowered = name.lower().strip()
+    
+    # Replace brand references, then remove punctuation and extra spaces
+    normalized = lowered.replace('dailyforex', 'brokeranalysis')
+    normalized = PUNCTUATION_PATTERN.sub(' ', normalized)
+    
+    filtered_words = [word for word in normalized.split() if word not in NAME_STOP_WORDS]
+    
+    # If we removed all words, keep the original
+    if not filtered_words:
+        return lowered
+    
+    return ' '.join(filtered_words)
+
+@lru_cache(maxsize=65536)
+def name_variations(name: str) -> Tuple[str, ...]:
+    """Original, normalized, acronym, unspaced and abbreviated forms of a name (memoised)"""
+    lowered = name.lower()
+    variations = [name]
+    
+    # Add normalized version
+    normalized = normalize_name(name)
+    if normalized != lowered:
+        variations.append(normalized)
+    
+    # Add acronym if applicable
+    words = name.split()
+    if len(words) > 1:
+        acronym = ''.join(word[0].upper() for word in words)
+        if len(acronym) >= 2:
+            variations.append(acronym.lower())
+    
+    # Add version without spaces
+    no_spaces = WHITESPACE_PATTERN.sub('', lowered)
+    if no_spaces != lowered:
+        variations.append(no_spaces)
+    
+    # Add version with common abbreviations
+    for full, abbrev in NAME_ABBREVIATIONS:
+        if full in lowered:
+            variations.append(lowered.replace(full, abbrev))
+    
+    return tuple(dict.fromkeys(variations))  # Remove duplicates, keep order
+
+def benchmark_normalization(names: List[str], rounds: int = 5) -> Dict:
+    """Names per second for normalization and variation generation, uncached and memoised"""
+    def rate(func, use_cache: bool) -> float:
+        if not use_cache:
+            func = func.__wrapped__
+        else:
+            for name in names:  # Warm the cache
+                func(name)
+        start_time = time.perf_counter()
+        for _ in range(rounds):
+            for name in names:
+                func(name)
+        return rounds * len(names) / max(time.perf_counter() - start_time, 1e-9)
+    
+    return {
+        'names': len(names),
+        'rounds': rounds,
+        'normalize_names_per_sec': rate(normalize_name, use_cache=False),
+        'normalize_cached_names_per_sec': rate(normalize_name, use_cache=True),
+        'variations_names_per_sec': rate(name_variations, use_cache=False),
+        'variations_cached_names_per_sec': rate(name_variations, use_cache=True)
+    }
+
+def char_ngrams(text: str, n: int = 3) -> Set[str]:
+    """Character n-grams of a space-padded name (short names still get grams)"""
+    padded = f" {text} "
+    if len(padded) <= n:
+        return {padded}
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
 @dataclass
 class BrokerEntity:
     """Represents a broker entity with various name variations"""
@@ -70,16 +181,87 @@ class MatchResult:
     similarity_score: float
     matched_field: str  # 'canonical_name', 'alternative_names', etc.
 
+# Distinguishes "not cached" from a cached negative (None) result
+CACHE_MISS = object()
+
+class FuzzyMatchCache:
+    """Size-bounded LRU cache of fuzzy match results, including misses (None)"""
+    
+    def __init__(self, max_size: int = 100_000):
+        self.max_size = max_size
+        self.entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+    
+    def __len__(self) -> int:
+        return len(self.entries)
+    
+    def get(self, key: str, default=CACHE_MISS):
+        """Cached result for key (None for a cached non-match), or default"""
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+        self.misses += 1
+        return default
+    
+    def put(self, key: str, result: Optional[MatchResult]):
+        """Cache a result (None records a non-match), evicting the least recently used entry"""
+        self.entries[key] = result
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+    
+    def clear(self):
+        self.entries.clear()
+    
+    def save(self, output_file: str, fingerprint: str):
+        """Save entries (least recently used first) with the mapping fingerprint"""
+        cache_data = {
+            'fingerprint': fingerprint,
+            'entries': [[key, asdict(result) if result else None] for key, result in self.entries.items()],
+            'created_at': datetime.now().isoformat()
+        }
+        
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(cache_data, f, ensure_ascii=False)
+    
+    def load(self, input_file: str, fingerprint: str) -> bool:
+        """Load entries saved for the same fingerprint; stale caches are ignored"""
+        with open(input_file, 'r', encoding='utf-8') as f:
+            cache_data = json.load(f)
+        
+        if cache_data.get('fingerprint') != fingerprint:
+            return False
+        
+        self.clear()
+        for key, result in cache_data.get('entries', [])[-self.max_size:]:
+            self.entries[key] = MatchResult(**result) if result else None
+        return True
+
 class CanonicalBrokerMapper:
     """Handles canonical broker name mapping and fuzzy matching"""
     
-    def __init__(self, similarity_threshold: float = 85.0):
+    def __init__(self, similarity_threshold: float = 85.0, max_candidates: int = 64, 
+                 cache_size: int = 100_000):
         self.similarity_threshold = similarity_threshold
+        self.max_candidates = max_candidates  # 0 disables blocking (brute-force scoring)
         self.broker_entities: Dict[str, BrokerEntity] = {}
         self.name_to_canonical: Dict[str, str] = {}  # All names -> canonical_id
-        self.fuzzy_cache: Dict[str, MatchResult] = {}  # Cache for fuzzy matches
+        self.fuzzy_cache = FuzzyMatchCache(cache_size)  # Fuzzy hits and misses, keyed by lowercased input
+        
+        # Bumped by add_entity/add_name; fuzzy match choices (and cached matches)
+        # are rebuilt whenever it differs from the version they were built at
+        self.mapping_version = 0
+        self.choices_version = -1
+        self.choice_names: List[str] = []
+        
+        # Blocking index: character trigram -> choice indices containing it
+        self.ngram_index: Dict[str, np.ndarray] = {}
+        self.ngram_posting_limit = 0
         
         # Statistics
+        self.batch_cdist_calls = 0  # process.cdist calls made by find_fuzzy_matches_batch
         self.total_matches = 0
         self.exact_matches = 0
         self.fuzzy_matches = 0
@@ -89,83 +271,11 @@ class CanonicalBrokerMapper:
     
     def normalize_broker_name(self, name: str) -> str:
         """Normalize broker name for better matching"""
-        if not name:
-            return ""
-        
-        # Convert to lowercase
-        normalized = name.lower().strip()
-        
-        # Replace brand references
-        normalized = normalized.replace('dailyforex', 'brokeranalysis')
-        
-        # Remove common suffixes and prefixes
-        suffixes_to_remove = [
-            'ltd', 'limited', 'inc', 'incorporated', 'llc', 'corp', 'corporation',
-            'group', 'holdings', 'international', 'global', 'worldwide',
-            'fx', 'forex', 'trading', 'capital', 'markets', 'securities',
-            'investment', 'financial', 'services', 'brokerage'
-        ]
-        
-        prefixes_to_remove = [
-            'the', 'a', 'an'
-        ]
-        
-        # Remove punctuation and extra spaces
-        normalized = re.sub(r'[^\w\s]', ' ', normalized)
-        normalized = re.sub(r'\s+', ' ', normalized).strip()
-        
-        # Remove suffixes
-        words = normalized.split()
-        filtered_words = []
-        
-        for word in words:
-            if word not in suffixes_to_remove and word not in prefixes_to_remove:
-                filtered_words.append(word)
-        
-        # If we removed all words, keep the original
-        if not filtered_words:
-            return name.lower().strip()
-        
-        return ' '.join(filtered_words)
+        return normalize_name(name)
     
     def extract_broker_variations(self, name: str) -> List[str]:
         """Extract common variations of a broker name"""
-        variations = [name]
-        
-        # Add normalized version
-        normalized = self.normalize_broker_name(name)
-        if normalized != name.lower():
-            variations.append(normalized)
-        
-        # Add acronym if applicable
-        words = name.split()
-        if len(words) > 1:
-            acronym = ''.join([word[0].upper() for word in words if word])
-            if len(acronym) >= 2:
-                variations.append(acronym.lower())
-        
-        # Add version without spaces
-        no_spaces = re.sub(r'\s+', '', name.lower())
-        if no_spaces != name.lower():
-            variations.append(no_spaces)
-        
-        # Add version with common abbreviations
-        abbrev_map = {
-            'international': 'intl',
-            'corporation': 'corp',
-            'limited': 'ltd',
-            'incorporated': 'inc',
-            'financial': 'fin',
-            'securities': 'sec',
-            'investment': 'inv'
-        }
-        
-        for full, abbrev in abbrev_map.items():
-            if full in name.lower():
-                abbreviated = name.lower().replace(full, abbrev)
-                variations.append(abbreviated)
-        
-        return list(set(variations))  # Remove duplicates
+        return list(name_variations(name))
     
     def load_broker_entities(self, entities_file: str):
         """Load broker entities from JSON file"""
@@ -175,33 +285,42 @@ class CanonicalBrokerMapper:
             entities_data = json.load(f)
         
         for entity_data in entities_data:
-            entity = BrokerEntity(**entity_data)
-            self.broker_entities[entity.canonical_id] = entity
-            
-            # Build name mapping
-            all_names = [entity.canonical_name, entity.display_name]
-            all_names.extend(entity.alternative_names)
-            all_names.extend(entity.regulatory_names)
-            
-            for name in all_names:
-                if name and name.strip():
-                    # Store original name
-                    self.name_to_canonical[name.lower().strip()] = entity.canonical_id
-                    
-                    # Store normalized name
-                    normalized = self.normalize_broker_name(name)
-                    if normalized:
-                        self.name_to_canonical[normalized] = entity.canonical_id
-                    
-                    # Store variations
-                    variations = self.extract_broker_variations(name)
-                    for variation in variations:
-                        if variation:
-                            self.name_to_canonical[variation] = entity.canonical_id
+            self.add_entity(BrokerEntity(**entity_data))
         
         logger.info(f"Loaded {len(self.broker_entities)} broker entities")
         logger.info(f"Built name mapping with {len(self.name_to_canonical)} entries")
     
+    def add_name(self, name: str, canonical_id: str):
+        """Map a (lowercased or normalized) name to an entity, replacing any earlier mapping"""
+        self.name_to_canonical[name] = canonical_id
+        self.mapping_version += 1
+    
+    def add_entity(self, entity: BrokerEntity, include_variations: bool = True):
+        """Register (or replace) an entity and map all of its names to it"""
+        self.broker_entities[entity.canonical_id] = entity
+        self.mapping_version += 1
+        
+        # Build name mapping
+        all_names = [entity.canonical_name, entity.display_name]
+        all_names.extend(entity.alternative_names)
+        all_names.extend(entity.regulatory_names)
+        
+        for name in all_names:
+            if name and name.strip():
+                # Store original name
+                self.add_name(name.lower().strip(), entity.canonical_id)
+                
+                # Store normalized name
+                normalized = self.normalize_broker_name(name)
+                if normalized:
+                    self.add_name(normalized, entity.canonical_id)
+                
+                # Store variations
+                if include_variations:
+                    for variation in self.extract_broker_variations(name):
+                        if variation:
+                            self.add_name(variation, entity.canonical_id)
+    
     def create_default_entities(self) -> List[BrokerEntity]:
         """Create default broker entities for common brokers"""
         default_brokers = [
@@ -308,46 +427,202 @@ class CanonicalBrokerMapper:
         
         return None
     
+    def get_choice_names(self) -> List[str]:
+        """All known names to fuzzy match against, in mapping order"""
+        # The size check also catches names written to name_to_canonical directly
+        if (self.choices_version != self.mapping_version or 
+                len(self.choice_names) != len(self.name_to_canonical)):
+            self.choice_names = list(self.name_to_canonical.keys())
+            self.build_ngram_index()
+            # Added or re-pointed names change results, including cached misses
+            self.fuzzy_cache.clear()
+            self.choices_version = self.mapping_version
+        return self.choice_names
+    
+    def build_ngram_index(self):
+        """Build the trigram inverted index used to prune fuzzy match candidates"""
+        postings: Dict[str, List[int]] = defaultdict(list)
+        for i, name in enumerate(self.choice_names):
+            for gram in char_ngrams(name):
+                postings[gram].append(i)
+        
+        self.ngram_index = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()}
+        # Grams shared by a large share of names ("mar", "ets", ...) barely discriminate
+        self.ngram_posting_limit = max(50, len(self.choice_names) // 10)
+    
+    def blocking_enabled(self) -> bool:
+        """Blocking only pays off once there are more names than candidates"""
+        return 0 < self.max_candidates < len(self.get_choice_names())
+    
+    def candidate_indices(self, normalized_input: str) -> np.ndarray:
+        """Choice indices sharing the most trigrams with the input, in choice order"""
+        postings = [self.ngram_index[gram] for gram in char_ngrams(normalized_input) 
+                    if gram in self.ngram_index]
+        if not postings:
+            return np.empty(0, dtype=np.int32)
+        
+        selective = [ids for ids in postings if len(ids) <= self.ngram_posting_limit]
+        if selective:
+            postings = selective
+        
+        ids, overlaps = np.unique(np.concatenate(postings), return_counts=True)
+        if len(ids) > self.max_candidates:
+            ids = np.sort(ids[np.argpartition(-overlaps, self.max_candidates - 1)[:self.max_candidates]])
+        return ids
+    
+    def score_best_match(self, normalized_input: str, 
+                         use_blocking: Optional[bool] = None) -> Optional[Tuple[str, float]]:
+        """Best (name, WRatio) at or above the threshold, over blocked candidates or all names"""
+        choices = self.get_choice_names()
+        if use_blocking is None:
+            use_blocking = self.blocking_enabled()
+        if use_blocking:
+            choices = [choices[i] for i in self.candidate_indices(normalized_input)]
+        
+        best_match = process.extractOne(
+            normalized_input,
+            choices,
+            scorer=fuzz.WRatio,
+            score_cutoff=self.similarity_threshold
+        )
+        if best_match:
+            return best_match[0], best_match[1]
+        return None
+    
+    def build_fuzzy_result(self, broker_name: str, matched_name: str, 
+                           similarity_score: float) -> MatchResult:
+        """Create a fuzzy MatchResult for a matched alias"""
+        canonical_id = self.name_to_canonical[matched_name]
+        entity = self.broker_entities[canonical_id]
+        
+        return MatchResult(
+            input_name=broker_name,
+            matched_canonical_id=canonical_id,
+            matched_canonical_name=entity.canonical_name,
+            confidence_score=similarity_score,
+            match_type='fuzzy',
+            similarity_score=similarity_score,
+            matched_field='fuzzy_search'
+        )
+    
     def find_fuzzy_match(self, broker_name: str) -> Optional[MatchResult]:
         """Find fuzzy match for broker name"""
         # Check cache first
         cache_key = broker_name.lower().strip()
-        if cache_key in self.fuzzy_cache:
-            return self.fuzzy_cache[cache_key]
+        self.get_choice_names()  # Build choices first; a rebuild clears the cache
+        cached = self.fuzzy_cache.get(cache_key)
+        if cached is not CACHE_MISS:
+            return cached
         
         normalized_input = self.normalize_broker_name(broker_name)
         
-        # Get all possible names to match against
-        all_names = list(self.name_to_canonical.keys())
-        
-        # Find best match using rapidfuzz
-        best_match = process.extractOne(
-            normalized_input,
-            all_names,
-            scorer=fuzz.WRatio,
-            score_cutoff=self.similarity_threshold
-        )
+        # Find best match using rapidfuzz (over blocked candidates once the index is worth it)
+        best_match = self.score_best_match(normalized_input)
         
+        result = None
         if best_match:
-            matched_name, similarity_score, _ = best_match
-            canonical_id = self.name_to_canonical[matched_name]
-            entity = self.broker_entities[canonical_id]
+            matched_name, similarity_score = best_match
+            result = self.build_fuzzy_result(broker_name, matched_name, similarity_score)
+        
+        # Cache the result, including misses
+        self.fuzzy_cache.put(cache_key, result)
+        return result
+    
+    def candidate_blocks(self, query_candidates: List[np.ndarray], max_block_cells: int,
+                         max_overscore: float = 1.5) -> List[List[int]]:
+        """Group queries (by index) into cdist blocks whose candidate unions stay small
+        
+        Queries are ordered by their candidates so similar names share a block.
+        A block grows while scoring its rows against the union costs at most
+        ``max_overscore`` times scoring each row against its own candidates.
+        Queries without candidates are left out.
+        """
+        order = sorted((i for i, ids in enumerate(query_candidates) if len(ids)),
+                       key=lambda i: tuple(query_candidates[i]))
+        blocks: List[List[int]] = []
+        rows: List[int] = []
+        union: Set[int] = set()
+        own_cells = 0
+        for i in order:
+            ids = query_candidates[i]
+            merged = union.union(ids.tolist())
+            cells = (len(rows) + 1) * len(merged)
+            if rows and (cells > max_overscore * (own_cells + len(ids)) or cells > max_block_cells):
+                blocks.append(rows)
+                rows, merged, own_cells = [], set(ids.tolist()), 0
+            rows.append(i)
+            union = merged
+            own_cells += len(ids)
+        if rows:
+            blocks.append(rows)
+        return blocks
+    
+    def find_fuzzy_matches_batch(self, broker_names: List[str], workers: int = -1,
+                                 max_block_cells: int = 4_000_000) -> List[Optional[MatchResult]]:
+        """Fuzzy match many names at once with rapidfuzz.process.cdist
+        
+        Distinct normalized inputs are scored in one multi-threaded call per
+        block of rows (blocks keep the score matrix under ``max_block_cells``
+        floats). Picks the same best match as ``find_fuzzy_match``: highest
+        WRatio, first choice on ties. When blocking is enabled a block is
+        scored against the union of its inputs' candidates (see
+        candidate_blocks) and each row only keeps its own candidates.
+        """
+        choices = self.get_choice_names()
+        results: List[Optional[MatchResult]] = [None] * len(broker_names)
+        if not choices:
+            return results
+        
+        # Score each distinct normalized query once
+        query_rows: Dict[str, List[int]] = {}
+        for i, name in enumerate(broker_names):
+            query_rows.setdefault(self.normalize_broker_name(name), []).append(i)
+        queries = list(query_rows)
+        
+        if self.blocking_enabled():
+            query_candidates = [self.candidate_indices(query) for query in queries]
+            blocks = self.candidate_blocks(query_candidates, max_block_cells)
+        else:
+            query_candidates = None
+            block_size = max(1, max_block_cells // len(choices))
+            blocks = [list(range(start, min(start + block_size, len(queries))))
+                      for start in range(0, len(queries), block_size)]
+        
+        for block in blocks:
+            block_queries = [queries[i] for i in block]
+            block_choices = choices
+            if query_candidates is not None:
+                # Sorted, so columns keep choice order and ties still go to the first choice
+                columns = np.unique(np.concatenate([query_candidates[i] for i in block]))
+                block_choices = [choices[i] for i in columns]
             
-            result = MatchResult(
-                input_name=broker_name,
-                matched_canonical_id=canonical_id,
-                matched_canonical_name=entity.canonical_name,
-                confidence_score=similarity_score,
-                match_type='fuzzy',
-                similarity_score=similarity_score,
-                matched_field='fuzzy_search'
+            scores = process.cdist(
+                block_queries, block_choices,
+                scorer=fuzz.WRatio,
+                score_cutoff=self.similarity_threshold,
+                dtype=np.float32,
+                workers=workers
             )
+            self.batch_cdist_calls += 1
+            
+            if query_candidates is not None:
+                candidate_mask = np.zeros(scores.shape, dtype=bool)
+                for row, i in enumerate(block):
+                    candidate_mask[row, np.searchsorted(columns, query_candidates[i])] = True
+                scores[~candidate_mask] = 0
             
-            # Cache the result
-            self.fuzzy_cache[cache_key] = result
-            return result
+            best = scores.argmax(axis=1)
+            for query, choice_index, row in zip(block_queries, best, scores):
+                similarity_score = float(row[choice_index])
+                # Scores below the cutoff come back as 0
+                if similarity_score < self.similarity_threshold or similarity_score == 0:
+                    continue
+                for i in query_rows[query]:
+                    results[i] = self.build_fuzzy_result(
+                        broker_names[i], block_choices[choice_index], similarity_score
+                    )
         
-        return None
+        return results
     
     def match_broker_name(self, broker_name: str) -> Optional[MatchResult]:
         """Match broker name using exact and fuzzy matching"""
@@ -373,19 +648,54 @@ class CanonicalBrokerMapper:
         logger.warning(f"No match found for broker: {broker_name}")
         return None
     
-    def batch_match_brokers(self, broker_names: List[str]) -> List[Optional[MatchResult]]:
-        """Match multiple broker names in batch"""
+    def batch_match_brokers(self, broker_names: List[str], workers: int = -1) -> List[Optional[MatchResult]]:
+        """Match multiple broker names in batch
+        
+        Exact and cached matches are resolved first; the remaining names go
+        through a single vectorised fuzzy pass (see find_fuzzy_matches_batch).
+        """
         logger.info(f"Batch matching {len(broker_names)} broker names")
         
-        results = []
+        results: List[Optional[MatchResult]] = [None] * len(broker_names)
+        fuzzy_indices = []
+        self.get_choice_names()  # Build choices first; a rebuild clears the cache
         for i, name in enumerate(broker_names):
-            result = self.match_broker_name(name)
-            results.append(result)
+            if not name or not name.strip():
+                continue
+            self.total_matches += 1
+            
+            exact_match = self.find_exact_match(name)
+            if exact_match:
+                self.exact_matches += 1
+                results[i] = exact_match
+                continue
+            
+            cached = self.fuzzy_cache.get(name.lower().strip())
+            if cached is not CACHE_MISS:
+                if cached:
+                    self.fuzzy_matches += 1
+                    results[i] = cached
+                else:
+                    self.no_matches += 1
+                continue
             
-            # Progress logging
-            if (i + 1) % 100 == 0:
-                logger.info(f"Progress: {i + 1}/{len(broker_names)} names processed")
+            fuzzy_indices.append(i)
+        
+        fuzzy_results = self.find_fuzzy_matches_batch(
+            [broker_names[i] for i in fuzzy_indices], workers=workers
+        )
+        for i, result in zip(fuzzy_indices, fuzzy_results):
+            self.fuzzy_cache.put(broker_names[i].lower().strip(), result)
+            if result:
+                self.fuzzy_matches += 1
+                results[i] = result
+            else:
+                self.no_matches += 1
+                logger.debug(f"No match found for broker: {broker_names[i]}")
         
+        matched = sum(1 for result in results if result)
+        logger.info(f"Batch matched {matched}/{len(broker_names)} broker names "
+                    f"({len(fuzzy_indices)} needed fuzzy matching)")
         return results
     
     def analyze_unmatched_names(self, broker_names: List[str]) -> Dict:
@@ -416,6 +726,43 @@ class CanonicalBrokerMapper:
             'total_analyzed': len(broker_names)
         }
     
+    def blocking_recall_report(self, broker_names: List[str]) -> Dict:
+        """Compare blocked candidate matching against brute-force scoring
+        
+        Recall is the share of brute-force fuzzy matches that blocking finds
+        with the same canonical entity.
+        """
+        queries = list(dict.fromkeys(self.normalize_broker_name(name) for name in broker_names if name))
+        
+        start_time = time.time()
+        brute_force = [self.score_best_match(query, use_blocking=False) for query in queries]
+        brute_force_time = time.time() - start_time
+        
+        start_time = time.time()
+        blocked = [self.score_best_match(query, use_blocking=True) for query in queries]
+        blocked_time = time.time() - start_time
+        
+        expected = found = 0
+        for brute_match, blocked_match in zip(brute_force, blocked):
+            if brute_match:
+                expected += 1
+                if blocked_match and (self.name_to_canonical[blocked_match[0]] == 
+                                      self.name_to_canonical[brute_match[0]]):
+                    found += 1
+        
+        candidate_counts = [len(self.candidate_indices(query)) for query in queries]
+        return {
+            'queries': len(queries),
+            'total_choices': len(self.get_choice_names()),
+            'max_candidates': self.max_candidates,
+            'average_candidates': sum(candidate_counts) / max(len(candidate_counts), 1),
+            'brute_force_matches': expected,
+            'blocked_matches_agreeing': found,
+            'recall': found / max(expected, 1) * 100,
+            'brute_force_time': brute_force_time,
+            'blocked_time': blocked_time
+        }
+    
     def export_entities(self, output_file: str):
         """Export broker entities to JSON file"""
         entities_data = []
@@ -441,6 +788,36 @@ class CanonicalBrokerMapper:
         
         logger.info(f"Exported name mapping with {len(self.name_to_canonical)} entries to {output_file}")
     
+    def mapping_fingerprint(self) -> str:
+        """Hash of everything a cached match depends on (names, entities, matching settings)"""
+        payload = json.dumps({
+            'name_to_canonical': self.name_to_canonical,
+            'canonical_names': {cid: entity.canonical_name for cid, entity in self.broker_entities.items()},
+            'similarity_threshold': self.similarity_threshold,
+            'max_candidates': self.max_candidates
+        }, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def export_match_cache(self, output_file: str):
+        """Save the fuzzy match cache for reuse by later runs over the same entities"""
+        self.fuzzy_cache.save(output_file, self.mapping_fingerprint())
+        logger.info(f"Exported fuzzy match cache with {len(self.fuzzy_cache)} entries to {output_file}")
+    
+    def load_match_cache(self, input_file: str) -> bool:
+        """Load a saved fuzzy match cache unless the entities or settings changed since"""
+        self.get_choice_names()  # Build choices first so loading is not undone by a rebuild
+        try:
+            loaded = self.fuzzy_cache.load(input_file, self.mapping_fingerprint())
+        except (OSError, ValueError, TypeError) as e:
+            logger.warning(f"Could not load fuzzy match cache from {input_file}: {e}")
+            return False
+        
+        if loaded:
+            logger.info(f"Loaded fuzzy match cache with {len(self.fuzzy_cache)} entries from {input_file}")
+        else:
+            logger.info(f"Fuzzy match cache {input_file} is stale (entities or settings changed); ignoring it")
+        return loaded
+    
     def get_matching_stats(self) -> Dict:
         """Get matching statistics"""
         return {
@@ -453,6 +830,11 @@ class CanonicalBrokerMapper:
             'total_match_rate': (self.exact_matches + self.fuzzy_matches) / max(self.total_matches, 1) * 100,
             'similarity_threshold': self.similarity_threshold,
             'cache_size': len(self.fuzzy_cache),
+            'cache_hits': self.fuzzy_cache.hits,
+            'cache_misses': self.fuzzy_cache.misses,
+            'blocking_enabled': self.blocking_enabled(),
+            'batch_cdist_calls': self.batch_cdist_calls,
+            'max_candidates': self.max_candidates,
             'total_entities': len(self.broker_entities),
             'total_name_mappings': len(self.name_to_canonical)
         }
@@ -466,6 +848,12 @@ def main():
     parser.add_argument('--similarity-threshold', type=float, default=85.0, help='Fuzzy matching threshold')
     parser.add_argument('--create-defaults', action='store_true', help='Create default broker entities')
     parser.add_argument('--analyze-unmatched', action='store_true', help='Analyze unmatched names')
+    parser.add_argument('--workers', type=int, default=-1, help='Fuzzy matching threads (-1 = all cores)')
+    parser.add_argument('--max-candidates', type=int, default=64, help='Blocked candidates per name (0 = brute force)')
+    parser.add_argument('--match-cache-file', help='Fuzzy match cache file (default: <output-dir>/fuzzy_match_cache.json)')
+    parser.add_argument('--match-cache-size', type=int, default=100_000, help='Maximum cached fuzzy match results')
+    parser.add_argument('--benchmark-normalization', action='store_true', help='Report name normalization throughput')
+    parser.add_argument('--report-blocking-recall', action='store_true', help='Report blocking recall versus brute force')
     
     args = parser.parse_args()
     
@@ -473,33 +861,37 @@ def main():
     Path(args.output_dir).mkdir(parents=True, exist_ok=True)
     
     # Initialize mapper
-    mapper = CanonicalBrokerMapper(similarity_threshold=args.similarity_threshold)
+    mapper = CanonicalBrokerMapper(similarity_threshold=args.similarity_threshold, 
+                                   max_candidates=args.max_candidates, 
+                                   cache_size=args.match_cache_size)
     
     # Load or create broker entities
     if args.entities_file and Path(args.entities_file).exists():
         mapper.load_broker_entities(args.entities_file)
     elif args.create_defaults:
         logger.info("Creating default broker entities")
-        default_entities = mapper.create_default_entities()
-        for entity in default_entities:
-            mapper.broker_entities[entity.canonical_id] = entity
-        
-        # Build name mapping for defaults
-        for entity in default_entities:
-            all_names = [entity.canonical_name, entity.display_name]
-            all_names.extend(entity.alternative_names)
-            all_names.extend(entity.regulatory_names)
-            
-            for name in all_names:
-                if name and name.strip():
-                    mapper.name_to_canonical[name.lower().strip()] = entity.canonical_id
-                    normalized = mapper.normalize_broker_name(name)
-                    if normalized:
-                        mapper.name_to_canonical[normalized] = entity.canonical_id
+        for entity in mapper.create_default_entities():
+            mapper.add_entity(entity, include_variations=False)
     else:
         logger.error("No broker entities provided. Use --entities-file or --create-defaults")
         return
     
+    if args.benchmark_normalization:
+        names = list(mapper.name_to_canonical.keys())
+        names.extend(name for entity in mapper.broker_entities.values() 
+                     for name in [entity.canonical_name, *entity.alternative_names, *entity.regulatory_names])
+        if args.broker_names_file and Path(args.broker_names_file).exists():
+            with open(args.broker_names_file, 'r', encoding='utf-8') as f:
+                names.extend(line.strip() for line in f if line.strip())
+        benchmark = benchmark_normalization(names)
+        logger.info(f"Normalization benchmark: {json.dumps(benchmark, indent=2)}")
+        return
+    
+    # Reuse fuzzy match results from earlier runs over the same entities
+    match_cache_file = Path(args.match_cache_file or Path(args.output_dir) / 'fuzzy_match_cache.json')
+    if match_cache_file.exists():
+        mapper.load_match_cache(str(match_cache_file))
+    
     # Process broker names if provided
     if args.broker_names_file and Path(args.broker_names_file).exists():
         logger.info(f"Loading broker names from {args.broker_names_file}")
@@ -519,7 +911,7 @@ def main():
         
         # Batch match broker names
         start_time = time.time()
-        match_results = mapper.batch_match_brokers(broker_names)
+        match_results = mapper.batch_match_brokers(broker_names, workers=args.workers)
         processing_time = time.time() - start_time
         
         # Save match results
@@ -547,6 +939,17 @@ def main():
                 json.dump(analysis, f, indent=2, ensure_ascii=False)
             
             logger.info(f"Saved unmatched analysis to {analysis_file}")
+        
+        # Report blocking recall if requested
+        if args.report_blocking_recall:
+            recall_report = mapper.blocking_recall_report(broker_names)
+            recall_file = Path(args.output_dir) / f'blocking_recall_{timestamp}.json'
+            
+            with open(recall_file, 'w', encoding='utf-8') as f:
+                json.dump(recall_report, f, indent=2)
+            
+            logger.info(f"Blocking recall: {recall_report['recall']:.1f}% "
+                        f"({recall_report['average_candidates']:.1f} candidates per name)")
     
     # Export entities and mappings
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -556,6 +959,7 @@ def main():
     
     mapping_file = Path(args.output_dir) / f'name_mapping_{timestamp}.json'
     mapper.export_name_mapping(str(mapping_file))
+    mapper.export_match_cache(str(match_cache_file))
     
     # Save statistics
     stats = mapper.get_matching_stats()
@@ -16,8 +16,12 @@ from typing import List, Dict, Tuple, Optional
 from dataclasses import dataclass
 from pathlib import Path
 import argparse
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
+from token_overlap import tail_token_offset
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -29,6 +33,16 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Sentence-ending punctuation followed by whitespace (handles "...", "?!", etc.)
+SENTENCE_BOUNDARY_PATTERN = re.compile(r'([.!?]+)\s+')
+
+# Bump when chunk boundaries change for the same settings (content hashes depend on it)
+CHUNKER_VERSION = 'token-offsets-2'
+
+# 'tokens': last overlap_tokens tokens of the previous chunk
+# 'sentences': last 2 sentences of the previous chunk (legacy, unbounded)
+OVERLAP_MODES = ('tokens', 'sentences')
+
 @dataclass
 class ContentChunk:
     """Represents a content chunk with metadata"""
@@ -44,9 +58,12 @@ class ContentChunk:
 class ContentChunker:
     """Handles content chunking for articles and broker reviews"""
     
-    def __init__(self, target_tokens: int = 300, overlap_tokens: int = 50):
+    def __init__(self, target_tokens: int = 300, overlap_tokens: int = 50, overlap_mode: str = 'tokens'):
+        if overlap_mode not in OVERLAP_MODES:
+            raise ValueError(f"overlap_mode must be one of {OVERLAP_MODES}, got {overlap_mode!r}")
         self.target_tokens = target_tokens
         self.overlap_tokens = overlap_tokens
+        self.overlap_mode = overlap_mode
         self.encoding = tiktoken.get_encoding("cl100k_base")  # GPT-4 encoding
         self.chunks_processed = 0
         self.total_tokens_processed = 0
@@ -76,90 +93,147 @@ class ContentChunker:
         
         return text.strip()
     
+    def sentence_spans(self, text: str) -> List[Tuple[int, int]]:
+        """Character spans of sentences, each ending at its closing punctuation"""
+        spans = []
+        start = 0
+        for match in SENTENCE_BOUNDARY_PATTERN.finditer(text):
+            spans.append((start, match.end(1)))
+            start = match.end()
+        if start < len(text):
+            spans.append((start, len(text)))
+        return [(start, end) for start, end in spans if text[start:end].strip()]
+    
     def split_by_sentences(self, text: str) -> List[str]:
         """Split text into sentences for better chunking boundaries"""
-        # Enhanced sentence splitting that handles financial abbreviations
-        sentence_endings = r'[.!?]+'
-        sentences = re.split(f'({sentence_endings})\s+', text)
-        
-        # Rejoin sentences with their punctuation
-        result = []
-        for i in range(0, len(sentences) - 1, 2):
-            if i + 1 < len(sentences):
-                sentence = sentences[i] + sentences[i + 1]
-                result.append(sentence.strip())
-            else:
-                result.append(sentences[i].strip())
-        
-        return [s for s in result if s]
+        return [text[start:end].strip() for start, end in self.sentence_spans(text)]
     
     def chunk_content(self, content: str, source_type: str, source_id: str, 
                      title: str, metadata: Dict) -> List[ContentChunk]:
-        """Chunk content into target token segments with overlap"""
+        """Chunk content into target token segments with overlap
+        
+        The cleaned document is encoded once. Sentence boundaries are mapped
+        to token offsets, and each chunk (its overlap with the previous chunk
+        included) is one contiguous slice of that token array, so token
+        counts come for free and overlap never exceeds ``overlap_tokens``.
+        """
         cleaned_content = self.clean_text(content)
-        sentences = self.split_by_sentences(cleaned_content)
+        spans = self.sentence_spans(cleaned_content)
+        if not spans:
+            return []
+        
+        tokens = self.encoding.encode(cleaned_content)
+        _, token_starts = self.encoding.decode_with_offsets(tokens)
+        
+        # Tokens starting at or after a sentence's closing punctuation belong to
+        # the next sentence (tiktoken attaches the separating space to the next word)
+        sentence_starts = [0] + [bisect_left(token_starts, end) for _, end in spans[:-1]]
+        sentence_bounds = sentence_starts + [len(tokens)]
+        
+        def char_offset(token_offset: int) -> int:
+            return token_starts[token_offset] if token_offset < len(tokens) else len(cleaned_content)
         
         chunks = []
-        current_chunk = ""
+        
+        def add_chunk(start: int, chunk_start: int, end: int):
+            chunks.append(ContentChunk(
+                content=cleaned_content[char_offset(start):char_offset(end)].strip(),
+                token_count=end - start,
+                chunk_index=len(chunks),
+                source_type=source_type,
+                source_id=source_id,
+                title=title,
+                metadata=metadata,
+                overlap_tokens=chunk_start - start
+            ))
+        
+        chunk_sentences: List[int] = []  # Token offsets of the sentences in the current chunk
         current_tokens = 0
-        chunk_index = 0
-        overlap_content = ""
+        overlap_start: Optional[int] = None
         
-        for sentence in sentences:
-            sentence_tokens = self.count_tokens(sentence)
+        for sentence_start, sentence_end in zip(sentence_bounds, sentence_bounds[1:]):
+            sentence_tokens = sentence_end - sentence_start
+            if sentence_tokens == 0:
+                continue
             
             # If adding this sentence would exceed target, finalize current chunk
-            if current_tokens + sentence_tokens > self.target_tokens and current_chunk:
-                # Create chunk with overlap from previous
-                full_chunk_content = overlap_content + current_chunk
+            if current_tokens + sentence_tokens > self.target_tokens and chunk_sentences:
+                chunk_start = chunk_sentences[0]
+                add_chunk(chunk_start if overlap_start is None else overlap_start, chunk_start, sentence_start)
                 
-                chunk = ContentChunk(
-                    content=full_chunk_content.strip(),
-                    token_count=self.count_tokens(full_chunk_content),
-                    chunk_index=chunk_index,
-                    source_type=source_type,
-                    source_id=source_id,
-                    title=title,
-                    metadata=metadata,
-                    overlap_tokens=self.count_tokens(overlap_content)
-                )
-                chunks.append(chunk)
-                
-                # Prepare overlap for next chunk
-                overlap_sentences = current_chunk.split('. ')[-2:]  # Last 2 sentences
-                overlap_content = '. '.join(overlap_sentences) + '. ' if len(overlap_sentences) > 1 else ''
-                overlap_tokens = self.count_tokens(overlap_content)
+                # Overlap the next chunk with the tail of this one
+                if self.overlap_mode == 'tokens':
+                    overlap_start = tail_token_offset(chunk_start, sentence_start, self.overlap_tokens, token_starts)
+                    if overlap_start == sentence_start:
+                        overlap_start = None
+                else:
+                    overlap_start = chunk_sentences[-2] if len(chunk_sentences) > 1 else None
                 
                 # Start new chunk
-                current_chunk = sentence
+                chunk_sentences = [sentence_start]
                 current_tokens = sentence_tokens
-                chunk_index += 1
             else:
-                current_chunk += " " + sentence if current_chunk else sentence
+                chunk_sentences.append(sentence_start)
                 current_tokens += sentence_tokens
         
         # Handle remaining content
-        if current_chunk:
-            full_chunk_content = overlap_content + current_chunk
-            chunk = ContentChunk(
-                content=full_chunk_content.strip(),
-                token_count=self.count_tokens(full_chunk_content),
-                chunk_index=chunk_index,
-                source_type=source_type,
-                source_id=source_id,
-                title=title,
-                metadata=metadata,
-                overlap_tokens=self.count_tokens(overlap_content)
-            )
-            chunks.append(chunk)
+        if chunk_sentences:
+            chunk_start = chunk_sentences[0]
+            add_chunk(chunk_start if overlap_start is None else overlap_start, chunk_start, len(tokens))
         
         self.chunks_processed += len(chunks)
         self.total_tokens_processed += sum(chunk.token_count for chunk in chunks)
         
         return chunks
     
-    def process_article(self, article_data: Dict) -> List[ContentChunk]:
-        """Process a single article into chunks"""
+    def chunk_documents(self, documents: List[Dict], max_workers: Optional[int] = None, 
+                        task_size: int = 16, executor: Optional[ProcessPoolExecutor] = None
+                        ) -> List[Tuple[List[ContentChunk], Optional[str]]]:
+        """Chunk many documents in parallel across processes
+        
+        Each document is a dict of ``chunk_content`` keyword arguments. Returns
+        one ``(chunks, error)`` pair per document, in input order; a document
+        that fails yields ``([], message)`` without stopping the rest.
+        
+        Documents are sent to the pool ``task_size`` at a time (fewer for small
+        corpora, so every worker gets several tasks). Workers build their own
+        chunker, and tiktoken encoding, once. ``max_workers`` defaults to the
+        CPU count; 1 chunks inline. An existing pool created with
+        ``init_chunk_worker`` can be passed as ``executor``.
+        """
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+        
+        if executor is None and (max_workers <= 1 or len(documents) <= 1):
+            results = []
+            for document in documents:
+                try:
+                    results.append((self.chunk_content(**document), None))
+                except Exception as e:
+                    results.append(([], str(e)))
+            return results
+        
+        task_size = max(1, min(task_size, -(-len(documents) // (max_workers * 4))))
+        tasks = [documents[i:i + task_size] for i in range(0, len(documents), task_size)]
+        
+        if executor is not None:
+            batches = list(executor.map(chunk_documents_in_worker, tasks))
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers, initializer=init_chunk_worker,
+                                     initargs=self.settings()) as pool:
+                batches = list(pool.map(chunk_documents_in_worker, tasks))
+        
+        results = [result for batch in batches for result in batch]
+        
+        # Workers keep their own counters; fold the results into ours
+        for chunks, _ in results:
+            self.chunks_processed += len(chunks)
+            self.total_tokens_processed += sum(chunk.token_count for chunk in chunks)
+        
+        return results
+    
+    def article_document(self, article_data: Dict) -> Dict:
+        """Build ``chunk_content`` arguments for an article"""
         content = article_data.get('content', '')
         excerpt = article_data.get('excerpt', '')
         
@@ -176,16 +250,20 @@ class ContentChunker:
             'reading_time': article_data.get('reading_time', 0)
         }
         
-        return self.chunk_content(
-            content=full_content,
-            source_type='article',
-            source_id=str(article_data.get('id', '')),
-            title=article_data.get('title', ''),
-            metadata=metadata
-        )
+        return {
+            'content': full_content,
+            'source_type': 'article',
+            'source_id': str(article_data.get('id', '')),
+            'title': article_data.get('title', ''),
+            'metadata': metadata
+        }
     
-    def process_broker_review(self, broker_data: Dict) -> List[ContentChunk]:
-        """Process a single broker review into chunks"""
+    def process_article(self, article_data: Dict) -> List[ContentChunk]:
+        """Process a single article into chunks"""
+        return self.chunk_content(**self.article_document(article_data))
+    
+    def broker_review_document(self, broker_data: Dict) -> Dict:
+        """Build ``chunk_content`` arguments for a broker review"""
         # Combine all broker text content
         content_parts = [
             broker_data.get('name', ''),
@@ -213,13 +291,17 @@ class ContentChunker:
             'account_types': broker_data.get('account_types', [])
         }
         
-        return self.chunk_content(
-            content=full_content,
-            source_type='broker_review',
-            source_id=str(broker_data.get('id', '')),
-            title=f"Broker Review: {broker_data.get('name', '')}",
-            metadata=metadata
-        )
+        return {
+            'content': full_content,
+            'source_type': 'broker_review',
+            'source_id': str(broker_data.get('id', '')),
+            'title': f"Broker Review: {broker_data.get('name', '')}",
+            'metadata': metadata
+        }
+    
+    def process_broker_review(self, broker_data: Dict) -> List[ContentChunk]:
+        """Process a single broker review into chunks"""
+        return self.chunk_content(**self.broker_review_document(broker_data))
     
     def save_chunks_to_json(self, chunks: List[ContentChunk], output_file: str):
         """Save chunks to JSON file for further processing"""
@@ -242,6 +324,10 @@ class ContentChunker:
         
         logger.info(f"Saved {len(chunks)} chunks to {output_file}")
     
+    def settings(self) -> Tuple[int, int, str]:
+        """Constructor arguments, e.g. for ``init_chunk_worker``"""
+        return (self.target_tokens, self.overlap_tokens, self.overlap_mode)
+    
     def get_processing_stats(self) -> Dict:
         """Get processing statistics"""
         return {
@@ -249,8 +335,53 @@ class ContentChunker:
             'total_tokens_processed': self.total_tokens_processed,
             'average_tokens_per_chunk': self.total_tokens_processed / max(self.chunks_processed, 1),
             'target_tokens': self.target_tokens,
-            'overlap_tokens': self.overlap_tokens
+            'overlap_tokens': self.overlap_tokens,
+            'overlap_mode': self.overlap_mode
+        }
+
+# Per-process chunker used by process-pool workers (see init_chunk_worker)
+_worker_chunker: Optional[ContentChunker] = None
+
+def init_chunk_worker(target_tokens: int = 300, overlap_tokens: int = 50, overlap_mode: str = 'tokens'):
+    """Process-pool initializer: build the chunker (and its tiktoken encoding) once per worker"""
+    global _worker_chunker
+    _worker_chunker = ContentChunker(target_tokens, overlap_tokens, overlap_mode)
+
+def chunk_documents_in_worker(documents: List[Dict]) -> List[Tuple[List[ContentChunk], Optional[str]]]:
+    """Chunk a batch of documents inside a worker process
+
+    Each document is a dict of ``chunk_content`` keyword arguments. Returns one
+    ``(chunks, error)`` pair per document, in input order, so a bad document does
+    not take the rest of the batch down with it.
+    """
+    if _worker_chunker is None:
+        init_chunk_worker()
+
+    results = []
+    for document in documents:
+        try:
+            results.append((_worker_chunker.chunk_content(**document), None))
+        except Exception as e:
+            results.append(([], str(e)))
+    return results
+
+def compare_overlap_modes(documents: List[Dict], target_tokens: int, overlap_tokens: int,
+                          max_workers: Optional[int] = None) -> Dict:
+    """Chunk counts and embedded tokens for each overlap mode over the same documents"""
+    report = {}
+    for overlap_mode in OVERLAP_MODES:
+        chunker = ContentChunker(target_tokens, overlap_tokens, overlap_mode)
+        results = chunker.chunk_documents(documents, max_workers=max_workers)
+        chunks = [chunk for document_chunks, _ in results for chunk in document_chunks]
+        overlaps = [chunk.overlap_tokens for chunk in chunks if chunk.chunk_index > 0]
+        report[overlap_mode] = {
+            'chunks': len(chunks),
+            'embedded_tokens': sum(chunk.token_count for chunk in chunks),
+            'overlap_tokens_total': sum(overlaps),
+            'overlap_tokens_max': max(overlaps, default=0),
+            'chunks_over_overlap_budget': sum(1 for overlap in overlaps if overlap > overlap_tokens)
         }
+    return report
 
 def main():
     """Main function to run content chunking"""
@@ -260,13 +391,35 @@ def main():
     parser.add_argument('--target-tokens', type=int, default=300, help='Target tokens per chunk')
     parser.add_argument('--overlap-tokens', type=int, default=50, help='Overlap tokens between chunks')
     parser.add_argument('--content-type', choices=['articles', 'brokers', 'both'], default='both')
+    parser.add_argument('--workers', type=int, help='Chunking processes (default: CPU count, 1 = inline)')
+    parser.add_argument('--overlap-mode', choices=OVERLAP_MODES, default='tokens', help='How chunk overlap is cut')
+    parser.add_argument('--compare-overlap', action='store_true', 
+                        help='Report chunk counts and embedded tokens for each overlap mode, then exit')
     
     args = parser.parse_args()
     
     # Create output directory
     Path(args.output_dir).mkdir(parents=True, exist_ok=True)
     
-    chunker = ContentChunker(args.target_tokens, args.overlap_tokens)
+    chunker = ContentChunker(args.target_tokens, args.overlap_tokens, args.overlap_mode)
+    
+    if args.compare_overlap:
+        documents = []
+        articles_file = Path(args.input_dir) / 'articles.json'
+        if args.content_type in ['articles', 'both'] and articles_file.exists():
+            with open(articles_file, 'r', encoding='utf-8') as f:
+                documents.extend(chunker.article_document(article) for article in json.load(f))
+        brokers_file = Path(args.input_dir) / 'brokers.json'
+        if args.content_type in ['brokers', 'both'] and brokers_file.exists():
+            with open(brokers_file, 'r', encoding='utf-8') as f:
+                documents.extend(chunker.broker_review_document(broker) for broker in json.load(f))
+        
+        report = compare_overlap_modes(documents, args.target_tokens, args.overlap_tokens, args.workers)
+        report_file = Path(args.output_dir) / f'overlap_comparison_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json'
+        with open(report_file, 'w') as f:
+            json.dump(report, f, indent=2)
+        logger.info(f"Overlap comparison over {len(documents)} documents: {report}")
+        return
     
     logger.info(f"Starting content chunking with target {args.target_tokens} tokens per chunk")
     
@@ -280,13 +433,14 @@ def main():
             with open(articles_file, 'r', encoding='utf-8') as f:
                 articles = json.load(f)
             
-            for article in articles:
-                try:
-                    chunks = chunker.process_article(article)
-                    all_chunks.extend(chunks)
-                    logger.info(f"Processed article '{article.get('title', 'Unknown')}' into {len(chunks)} chunks")
-                except Exception as e:
-                    logger.error(f"Error processing article {article.get('id', 'unknown')}: {e}")
+            documents = [chunker.article_document(article) for article in articles]
+            results = chunker.chunk_documents(documents, max_workers=args.workers)
+            for article, (chunks, error) in zip(articles, results):
+                if error is not None:
+                    logger.error(f"Error processing article {article.get('id', 'unknown')}: {error}")
+                    continue
+                all_chunks.extend(chunks)
+                logger.info(f"Processed article '{article.get('title', 'Unknown')}' into {len(chunks)} chunks")
     
     # Process broker reviews if requested
     if args.content_type in ['brokers', 'both']:
@@ -296,13 +450,14 @@ def main():
             with open(brokers_file, 'r', encoding='utf-8') as f:
                 brokers = json.load(f)
             
-            for broker in brokers:
-                try:
-                    chunks = chunker.process_broker_review(broker)
-                    all_chunks.extend(chunks)
-                    logger.info(f"Processed broker '{broker.get('name', 'Unknown')}' into {len(chunks)} chunks")
-                except Exception as e:
-                    logger.error(f"Error processing broker {broker.get('id', 'unknown')}: {e}")
+            documents = [chunker.broker_review_document(broker) for broker in brokers]
+            results = chunker.chunk_documents(documents, max_workers=args.workers)
+            for broker, (chunks, error) in zip(brokers, results):
+                if error is not None:
+                    logger.error(f"Error processing broker {broker.get('id', 'unknown')}: {error}")
+                    continue
+                all_chunks.extend(chunks)
+                logger.info(f"Processed broker '{broker.get('name', 'Unknown')}' into {len(chunks)} chunks")
     
     # Save all chunks
     output_file = Path(args.output_dir) / f'content_chunks_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json'
@@ -319,4 +474,3 @@ def main():
 
 if __name__ == '__main__':
     main()
-"},"query_language":"English"}}
\ No newline at end of file
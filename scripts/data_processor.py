@@ -18,7 +18,6 @@ import logging
 # Third-party imports
 import numpy as np
 from supabase import create_client, Client
-from sentence_transformers import SentenceTransformer
 from openai import OpenAI
 from dotenv import load_dotenv
 import tiktoken
@@ -26,6 +25,9 @@ from bs4 import BeautifulSoup
 import requests
 from tqdm import tqdm
 
+from embedding_cache import open_cache_from_env
+from onnx_encoder import backend_model_key, load_sentence_encoder
+
 # Load environment variables
 load_dotenv()
 
@@ -75,11 +77,20 @@ class ArticleData:
 class EmbeddingGenerator:
     """Handles embedding generation using multiple models"""
     
-    def __init__(self):
-        self.sentence_transformer = SentenceTransformer('all-MiniLM-L6-v2')
+    OPENAI_MODEL = 'text-embedding-3-small'
+    SENTENCE_TRANSFORMER_MODEL = 'all-MiniLM-L6-v2'
+    
+    def __init__(self, backend: Optional[str] = None):
+        # EMBEDDING_BACKEND=onnx runs the int8 quantised graph on CPU
+        self.backend = backend or os.getenv('EMBEDDING_BACKEND', 'torch')
+        self.sentence_transformer = load_sentence_encoder(self.SENTENCE_TRANSFORMER_MODEL, self.backend)
+        self.sentence_transformer_key = backend_model_key(self.SENTENCE_TRANSFORMER_MODEL, self.backend)
         self.openai_client = None
         self.encoding = tiktoken.get_encoding("cl100k_base")
         
+        # Persistent vector cache (EMBEDDING_CACHE_PATH, empty to disable)
+        self.cache = open_cache_from_env()
+        
         # Initialize OpenAI if API key is available
         openai_key = os.getenv('OPENAI_API_KEY')
         if openai_key and openai_key != 'your_openai_api_key_here':
@@ -90,22 +101,39 @@ class EmbeddingGenerator:
     
     def generate_embedding(self, text: str, model: str = 'sentence_transformer') -> List[float]:
         """Generate embedding for given text"""
+        use_openai = model == 'openai' and self.openai_client is not None
+        model_name = self.OPENAI_MODEL if use_openai else self.sentence_transformer_key
+        
+        if self.cache is not None:
+            cached = self.cache.get(model_name, text)
+            if cached is not None:
+                return cached.tolist()
+        
         try:
-            if model == 'openai' and self.openai_client:
+            if use_openai:
                 response = self.openai_client.embeddings.create(
                     input=text,
-                    model="text-embedding-3-small"
+                    model=self.OPENAI_MODEL
                 )
-                return response.data[0].embedding
+                embedding = response.data[0].embedding
             else:
                 # Use SentenceTransformer as default/fallback
-                embedding = self.sentence_transformer.encode(text)
-                return embedding.tolist()
+                embedding = self.sentence_transformer.encode(text).tolist()
         except Exception as e:
             logger.error(f"Error generating embedding: {e}")
-            # Fallback to SentenceTransformer
+            # Fallback to SentenceTransformer; not cached under the requested model
             embedding = self.sentence_transformer.encode(text)
             return embedding.tolist()
+        
+        if self.cache is not None:
+            self.cache.put(model_name, text, np.asarray(embedding, dtype=np.float32))
+        return embedding
+    
+    def get_processing_stats(self) -> Dict[str, Any]:
+        """Get embedding cache statistics"""
+        if self.cache is None:
+            return {'backend': self.backend, 'cache_enabled': False, 'cache_hits': 0, 'cache_misses': 0}
+        return {'backend': self.backend, 'cache_enabled': True, **self.cache.get_stats()}
     
     def chunk_text(self, text: str, max_tokens: int = 500, overlap: int = 50) -> List[str]:
         """Split text into chunks for processing"""
@@ -412,6 +440,7 @@ async def main():
         await processor.process_articles(articles)
         await processor.process_documents()
         
+        logger.info(f"Embedding stats: {processor.embedding_generator.get_processing_stats()}")
         logger.info("Data processing completed successfully!")
         
     except Exception as e:
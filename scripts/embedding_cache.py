@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Persistent Embedding Cache for Brokeranalysis Platform
+Stores embedding vectors on disk keyed by (model_name, sha256(text)) so identical
+text (repeated disclaimers, unchanged articles) is only ever embedded once per model.
+
+Vectors are stored as float32 blobs in SQLite with least-recently-used eviction
+once the cache grows past ``max_entries``.
+"""
+
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+def text_hash(text: str) -> str:
+    """SHA-256 of the exact text handed to the embedding model"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+class EmbeddingCache:
+    """Size-bounded, on-disk LRU cache of embedding vectors"""
+
+    # SQLite caps the number of host parameters per statement
+    LOOKUP_CHUNK = 500
+
+    def __init__(self, cache_path: str = './cache/embeddings.sqlite', max_entries: int = 200_000):
+        self.cache_path = Path(cache_path)
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+
+        # Embedding may run on a worker thread, so share one connection behind a lock
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.cache_path), check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model_name TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_access INTEGER NOT NULL,
+                PRIMARY KEY (model_name, text_hash)
+            ) WITHOUT ROWID
+        """)
+        self.conn.execute('CREATE INDEX IF NOT EXISTS embeddings_last_access_idx ON embeddings(last_access)')
+        self.conn.commit()
+
+        self.entries = self.conn.execute('SELECT COUNT(*) FROM embeddings').fetchone()[0]
+
+        # Statistics tracking
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        logger.info(f"Embedding cache at {self.cache_path} ({self.entries} entries, max {max_entries})")
+
+    def get_many(self, model_name: str, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Look up vectors for texts; returns None in the slot of every miss"""
+        hashes = [text_hash(text) for text in texts]
+        found: Dict[str, np.ndarray] = {}
+
+        with self.lock:
+            unique_hashes = list(dict.fromkeys(hashes))
+            for i in range(0, len(unique_hashes), self.LOOKUP_CHUNK):
+                chunk = unique_hashes[i:i + self.LOOKUP_CHUNK]
+                placeholders = ','.join('?' * len(chunk))
+                rows = self.conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings "
+                    f"WHERE model_name = ? AND text_hash IN ({placeholders})",
+                    [model_name, *chunk]
+                ).fetchall()
+                for hash_value, blob in rows:
+                    found[hash_value] = np.frombuffer(blob, dtype=np.float32)
+
+            if found:
+                # Touch hits so eviction removes the least recently used vectors first
+                now = time.time_ns()
+                self.conn.executemany(
+                    'UPDATE embeddings SET last_access = ? WHERE model_name = ? AND text_hash = ?',
+                    [(now, model_name, hash_value) for hash_value in found]
+                )
+                self.conn.commit()
+
+            results = [found.get(hash_value) for hash_value in hashes]
+            hit_count = sum(1 for result in results if result is not None)
+            self.hits += hit_count
+            self.misses += len(results) - hit_count
+
+        return results
+
+    def put_many(self, model_name: str, texts: Sequence[str], embeddings: Sequence[np.ndarray]) -> None:
+        """Store vectors for texts, evicting least recently used entries past max_entries"""
+        if not texts:
+            return
+
+        now = time.time_ns()
+        rows = [
+            (model_name, text_hash(text), np.asarray(embedding, dtype=np.float32).tobytes(), now)
+            for text, embedding in zip(texts, embeddings)
+        ]
+
+        with self.lock:
+            before = self.conn.total_changes
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO embeddings (model_name, text_hash, vector, last_access) '
+                'VALUES (?, ?, ?, ?)',
+                rows
+            )
+            self.entries += self.conn.total_changes - before
+
+            overflow = self.entries - self.max_entries
+            if overflow > 0:
+                # WITHOUT ROWID table, so evict by primary key
+                self.conn.execute(
+                    'DELETE FROM embeddings WHERE (model_name, text_hash) IN ('
+                    'SELECT model_name, text_hash FROM embeddings ORDER BY last_access LIMIT ?)',
+                    (overflow,)
+                )
+                self.entries -= overflow
+                self.evictions += overflow
+            self.conn.commit()
+
+    def get(self, model_name: str, text: str) -> Optional[np.ndarray]:
+        """Look up a single vector"""
+        return self.get_many(model_name, [text])[0]
+
+    def put(self, model_name: str, text: str, embedding: np.ndarray) -> None:
+        """Store a single vector"""
+        self.put_many(model_name, [text], [embedding])
+
+    def get_stats(self) -> Dict:
+        """Get cache statistics"""
+        lookups = self.hits + self.misses
+        return {
+            'cache_path': str(self.cache_path),
+            'cache_entries': self.entries,
+            'cache_max_entries': self.max_entries,
+            'cache_hits': self.hits,
+            'cache_misses': self.misses,
+            'cache_hit_rate': self.hits / max(lookups, 1) * 100,
+            'cache_evictions': self.evictions
+        }
+
+    def close(self) -> None:
+        """Close the underlying SQLite connection"""
+        with self.lock:
+            self.conn.close()
+
+def open_cache_from_env(default_path: Optional[str] = './cache/embeddings.sqlite') -> Optional[EmbeddingCache]:
+    """Open the cache configured by EMBEDDING_CACHE_PATH (set it empty to disable)"""
+    cache_path = os.getenv('EMBEDDING_CACHE_PATH', default_path)
+    if not cache_path:
+        return None
+    max_entries = int(os.getenv('EMBEDDING_CACHE_MAX_ENTRIES', '200000'))
+    return EmbeddingCache(cache_path, max_entries=max_entries)
@@ -11,27 +11,27 @@ import os
 import json
 import logging
 import numpy as np
-from typing import List, Dict, Optional, Tuple
+from typing import List, Dict, Optional, Tuple, Iterable, Iterator
 from dataclasses import dataclass
 from pathlib import Path
 import argparse
 from datetime import datetime
 import time
 import pickle
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 import threading
 
-try:
-    from sentence_transformers import SentenceTransformer
-except ImportError:
-    print("Please install sentence-transformers: pip install sentence-transformers")
-    exit(1)
+from embedding_cache import EmbeddingCache
+from embedding_store import EmbeddingStore
+from onnx_encoder import EMBEDDING_BACKENDS, backend_model_key, load_sentence_encoder
 
+# Only the torch backend needs torch (and sentence-transformers, see load_sentence_encoder)
 try:
     import torch
 except ImportError:
-    print("Please install torch: pip install torch")
-    exit(1)
+    torch = None
 
 # Configure logging
 logging.basicConfig(
@@ -56,31 +56,215 @@ class EmbeddingResult:
     embedding_dimension: int
     created_at: str
 
+def length_bucketed_batches(lengths: List[int], max_batch_tokens: int, 
+                            max_batch_size: int) -> List[List[int]]:
+    """Group text indices into batches of similar token length
+    
+    Indices are sorted longest first and each batch grows while its padded size
+    (members x longest member) stays within max_batch_tokens, so short texts are
+    encoded in large batches and long texts in small ones.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True)
+    batches: List[List[int]] = []
+    
+    for index in order:
+        if batches:
+            batch = batches[-1]
+            padded_length = max(lengths[batch[0]], 1)
+            if len(batch) < max_batch_size and (len(batch) + 1) * padded_length <= max_batch_tokens:
+                batch.append(index)
+                continue
+        batches.append([index])
+    
+    return batches
+
+# Per-process model used by encode pool workers (see init_encode_worker)
+_worker_model = None
+
+def init_encode_worker(model_name: str, backend: str, threads: int):
+    """Process-pool initializer: pin the thread count and load one model copy per worker"""
+    global _worker_model
+    for variable in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS'):
+        os.environ[variable] = str(threads)
+    # Workers already run in parallel; tokenizer threads would only oversubscribe the cores
+    os.environ['TOKENIZERS_PARALLELISM'] = 'false'
+    if torch is not None:
+        torch.set_num_threads(threads)
+    _worker_model = load_sentence_encoder(model_name, backend, device='cpu', num_threads=threads)
+
+def encode_in_worker(texts: List[str]) -> np.ndarray:
+    """Encode one batch on the worker's model"""
+    return _worker_model.encode(texts, convert_to_numpy=True, batch_size=len(texts), 
+                                show_progress_bar=False)
+
+class EncodePool:
+    """Shards encode batches across worker processes, each with its own model copy
+    
+    Batches are submitted through a bounded window and results are yielded in
+    submission order, so callers stream vectors without holding every batch in flight.
+    """
+    
+    def __init__(self, model_name: str, backend: str = 'torch', workers: Optional[int] = None, 
+                 threads_per_worker: Optional[int] = None, max_pending: Optional[int] = None):
+        cpu_count = os.cpu_count() or 1
+        self.workers = workers or cpu_count
+        self.threads_per_worker = threads_per_worker or max(1, cpu_count // self.workers)
+        self.max_pending = max_pending or self.workers * 2
+        
+        # Forking a process whose torch/OpenMP thread pools are live can deadlock, so spawn
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=init_encode_worker,
+            initargs=(model_name, backend, self.threads_per_worker)
+        )
+        
+        logger.info(f"Started encode pool: {self.workers} workers x {self.threads_per_worker} threads")
+    
+    def imap(self, batches: Iterable[List[str]]) -> Iterator[np.ndarray]:
+        """Encode batches on the workers, yielding each batch's vectors in input order"""
+        pending = deque()
+        for texts in batches:
+            pending.append(self.executor.submit(encode_in_worker, texts))
+            if len(pending) >= self.max_pending:
+                yield pending.popleft().result()
+        
+        while pending:
+            yield pending.popleft().result()
+    
+    def close(self):
+        """Stop the workers, dropping batches that have not started"""
+        self.executor.shutdown(wait=True, cancel_futures=True)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
 class EmbeddingGenerator:
     """Handles embedding generation using sentence-transformers"""
     
+    # Upper bound on texts per encode call, however short they are
+    MAX_BUCKET_SIZE = 512
+    
+    # Chunks handed to one encode_bucketed call (and logged as progress) at a time
+    CHUNK_WINDOW_SIZE = 4096
+    
     def __init__(self, model_name: str = 'all-MiniLM-L6-v2', batch_size: int = 32, 
-                 device: Optional[str] = None):
+                 device: Optional[str] = None, cache_path: Optional[str] = None,
+                 cache_max_entries: int = 200_000, max_batch_tokens: Optional[int] = None,
+                 backend: str = 'torch', workers: int = 0, threads_per_worker: Optional[int] = None):
         self.model_name = model_name
         self.batch_size = batch_size
-        self.device = device or ('cuda' if torch.cuda.is_available() else 'cpu')
+        self.backend = backend
+        # The ONNX backend always runs on CPU
+        self.device = 'cpu' if backend == 'onnx' else device or ('cuda' if torch is not None and torch.cuda.is_available() else 'cpu')
         
-        logger.info(f"Initializing embedding model: {model_name} on {self.device}")
+        # Cache key and content hash name; quantised vectors are kept apart from full precision ones
+        self.model_key = backend_model_key(model_name, backend)
+        
+        logger.info(f"Initializing embedding model: {model_name} ({backend}) on {self.device}")
         
         # Load the model
-        self.model = SentenceTransformer(model_name, device=self.device)
+        self.model = load_sentence_encoder(model_name, backend, device=self.device)
         self.embedding_dimension = self.model.get_sentence_embedding_dimension()
+        self.max_seq_length = getattr(self.model, 'max_seq_length', None) or 256
+        
+        # Padded tokens per encode call; the default never exceeds the memory of
+        # batch_size texts at full sequence length
+        self.max_batch_tokens = max_batch_tokens or batch_size * self.max_seq_length
         
         # Statistics tracking
         self.embeddings_generated = 0
         self.total_processing_time = 0.0
         self.failed_embeddings = 0
+        self.tokens_encoded = 0
+        self.padded_tokens = 0
+        self.encode_time = 0.0
         
         # Thread safety
         self.lock = threading.Lock()
         
+        # Worker processes with their own model copies (0 encodes in this process)
+        self.pool = None
+        if workers and workers > 1:
+            if self.device != 'cpu':
+                logger.warning("Encode pool workers run on CPU; the GPU model is left unused")
+            self.pool = EncodePool(model_name, backend, workers=workers, 
+                                   threads_per_worker=threads_per_worker)
+        
+        # Persistent cache keyed by (model_name, sha256(preprocessed text))
+        self.cache = EmbeddingCache(cache_path, max_entries=cache_max_entries) if cache_path else None
+        
         logger.info(f"Model loaded successfully. Embedding dimension: {self.embedding_dimension}")
     
+    def token_lengths(self, texts: List[str]) -> List[int]:
+        """Model token count of each text, capped at the model's sequence length"""
+        tokenizer = getattr(self.model, 'tokenizer', None)
+        if tokenizer is None:
+            lengths = [len(text.split()) for text in texts]
+        else:
+            encoded = tokenizer(texts, add_special_tokens=True, truncation=True, max_length=self.max_seq_length)
+            lengths = [len(ids) for ids in encoded['input_ids']]
+        return [min(length, self.max_seq_length) for length in lengths]
+    
+    def encode_bucketed(self, texts: List[str]) -> np.ndarray:
+        """Encode texts in length-bucketed batches and return rows in input order"""
+        embeddings = np.empty((len(texts), self.embedding_dimension), dtype=np.float32)
+        if not texts:
+            return embeddings
+        
+        lengths = self.token_lengths(texts)
+        start_time = time.time()
+        padded_tokens = 0
+        
+        if self.pool is None:
+            max_batch_size = self.MAX_BUCKET_SIZE
+        else:
+            # Small enough that every worker gets a share of the texts
+            max_batch_size = max(1, min(self.MAX_BUCKET_SIZE, -(-len(texts) // self.pool.workers)))
+        batches = length_bucketed_batches(lengths, self.max_batch_tokens, max_batch_size)
+        
+        if self.pool is None:
+            encoded = (self.model.encode([texts[i] for i in batch], convert_to_numpy=True, 
+                                         batch_size=len(batch), show_progress_bar=False)
+                       for batch in batches)
+        else:
+            encoded = self.pool.imap([texts[i] for i in batch] for batch in batches)
+        
+        for batch, vectors in zip(batches, encoded):
+            embeddings[batch] = vectors
+            padded_tokens += len(batch) * lengths[batch[0]]
+        
+        with self.lock:
+            self.tokens_encoded += sum(lengths)
+            self.padded_tokens += padded_tokens
+            self.encode_time += time.time() - start_time
+        
+        return embeddings
+    
+    def encode_texts(self, processed_texts: List[str]) -> np.ndarray:
+        """Encode preprocessed texts, serving repeats from the embedding cache"""
+        if self.cache is None:
+            return self.encode_bucketed(processed_texts)
+        
+        cached = self.cache.get_many(self.model_key, processed_texts)
+        miss_indices = [i for i, vector in enumerate(cached) if vector is None]
+        
+        embeddings = np.empty((len(processed_texts), self.embedding_dimension), dtype=np.float32)
+        for i, vector in enumerate(cached):
+            if vector is not None:
+                embeddings[i] = vector
+        
+        if miss_indices:
+            miss_texts = [processed_texts[i] for i in miss_indices]
+            computed = self.encode_bucketed(miss_texts)
+            embeddings[miss_indices] = computed
+            self.cache.put_many(self.model_key, miss_texts, computed)
+        
+        return embeddings
+    
     def preprocess_text(self, text: str) -> str:
         """Preprocess text before embedding generation"""
         # Clean and normalize text
@@ -109,7 +293,7 @@ class EmbeddingGenerator:
             processed_text = self.preprocess_text(text)
             
             # Generate embedding
-            embedding = self.model.encode(processed_text, convert_to_numpy=True)
+            embedding = self.encode_texts([processed_text])[0]
             
             processing_time = time.time() - start_time
             
@@ -148,8 +332,7 @@ class EmbeddingGenerator:
             processed_texts = [self.preprocess_text(text) for text in texts]
             
             # Generate embeddings in batch
-            embeddings = self.model.encode(processed_texts, convert_to_numpy=True, 
-                                         batch_size=self.batch_size, show_progress_bar=False)
+            embeddings = self.encode_texts(processed_texts)
             
             processing_time = time.time() - start_time
             
@@ -184,15 +367,31 @@ class EmbeddingGenerator:
             logger.error(f"Failed to generate batch embeddings: {e}")
             return [None] * len(texts)
     
+    def generate_embeddings_batch(self, texts: List[str]) -> np.ndarray:
+        """Generate a raw embedding matrix (one row per text) for a batch of texts"""
+        start_time = time.time()
+
+        processed_texts = [self.preprocess_text(text) for text in texts]
+        embeddings = self.encode_texts(processed_texts)
+
+        with self.lock:
+            self.embeddings_generated += len(texts)
+            self.total_processing_time += time.time() - start_time
+
+        return embeddings
+
     def process_content_chunks(self, chunks_data: List[Dict]) -> List[EmbeddingResult]:
         """Process content chunks and generate embeddings"""
         logger.info(f"Processing {len(chunks_data)} content chunks")
         
-        results = []
+        results: List[Optional[EmbeddingResult]] = []
+        tokens_before = self.tokens_encoded
+        start_time = time.time()
         
-        # Process in batches
-        for i in range(0, len(chunks_data), self.batch_size):
-            batch = chunks_data[i:i + self.batch_size]
+        # encode_bucketed tokenises each window once and batches chunks of similar
+        # length together, so little time is spent on padding
+        for window_start in range(0, len(chunks_data), self.CHUNK_WINDOW_SIZE):
+            batch = chunks_data[window_start:window_start + self.CHUNK_WINDOW_SIZE]
             
             texts = [chunk['content'] for chunk in batch]
             content_ids = [f"{chunk['source_type']}_{chunk['source_id']}_{chunk['chunk_index']}" 
@@ -200,19 +399,19 @@ class EmbeddingGenerator:
             content_types = [chunk['source_type'] for chunk in batch]
             
             batch_results = self.generate_batch_embeddings(texts, content_ids, content_types)
-            
-            # Filter out None results
-            valid_results = [r for r in batch_results if r is not None]
-            results.extend(valid_results)
+            results.extend(batch_results)
             
             # Progress logging
-            progress = min(i + self.batch_size, len(chunks_data))
+            progress = window_start + len(batch)
             logger.info(f"Progress: {progress}/{len(chunks_data)} chunks processed")
-            
-            # Add small delay to prevent overwhelming the system
-            time.sleep(0.1)
         
-        return results
+        elapsed = time.time() - start_time
+        tokens = self.tokens_encoded - tokens_before
+        logger.info(f"Embedded {tokens} tokens in {elapsed:.2f}s "
+                    f"({tokens / max(elapsed, 1e-9):.0f} tokens/sec)")
+        
+        # Filter out None results, keeping input order
+        return [r for r in results if r is not None]
     
     def save_embeddings(self, embeddings: List[EmbeddingResult], output_file: str, 
                        format: str = 'json'):
@@ -223,6 +422,8 @@ class EmbeddingGenerator:
             self._save_embeddings_pickle(embeddings, output_file)
         elif format == 'numpy':
             self._save_embeddings_numpy(embeddings, output_file)
+        elif format == 'store':
+            self._save_embeddings_store(embeddings, output_file)
         else:
             raise ValueError(f"Unsupported format: {format}")
     
@@ -272,20 +473,61 @@ class EmbeddingGenerator:
         
         logger.info(f"Saved {len(embeddings)} embeddings to {output_file} (NumPy format)")
     
+    def _save_embeddings_store(self, embeddings: List[EmbeddingResult], store_dir: str):
+        """Append embeddings to a memory-mapped embedding store directory"""
+        if not embeddings:
+            return
+        
+        store = EmbeddingStore(store_dir)
+        store.append(
+            [emb.content_id for emb in embeddings],
+            np.stack([emb.embedding for emb in embeddings]),
+            [
+                {
+                    'content_type': emb.content_type,
+                    'token_count': emb.token_count,
+                    'model_name': emb.model_name,
+                    'created_at': emb.created_at
+                }
+                for emb in embeddings
+            ]
+        )
+        
+        logger.info(f"Appended {len(embeddings)} embeddings to {store_dir} (store format, {len(store)} rows)")
+    
     def get_processing_stats(self) -> Dict:
         """Get processing statistics"""
         avg_time = self.total_processing_time / max(self.embeddings_generated, 1)
         
-        return {
+        stats = {
             'embeddings_generated': self.embeddings_generated,
             'failed_embeddings': self.failed_embeddings,
             'total_processing_time': self.total_processing_time,
             'average_processing_time': avg_time,
             'model_name': self.model_name,
+            'backend': self.backend,
             'embedding_dimension': self.embedding_dimension,
             'device': self.device,
-            'batch_size': self.batch_size
+            'encode_workers': self.pool.workers if self.pool is not None else 0,
+            'batch_size': self.batch_size,
+            'max_batch_tokens': self.max_batch_tokens,
+            'tokens_encoded': self.tokens_encoded,
+            'tokens_per_second': self.tokens_encoded / max(self.encode_time, 1e-9),
+            'padding_efficiency': self.tokens_encoded / max(self.padded_tokens, 1) * 100,
+            'cache_enabled': self.cache is not None,
+            'cache_hits': 0,
+            'cache_misses': 0
         }
+        if self.cache is not None:
+            stats.update(self.cache.get_stats())
+        
+        return stats
+    
+    def close(self):
+        """Shut down the encode pool, if one was started"""
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
 
 def main():
     """Main function to run embedding generation"""
@@ -294,9 +536,18 @@ def main():
     parser.add_argument('--output-dir', required=True, help='Directory to save embeddings')
     parser.add_argument('--model-name', default='all-MiniLM-L6-v2', help='Sentence transformer model name')
     parser.add_argument('--batch-size', type=int, default=32, help='Batch size for processing')
+    parser.add_argument('--max-batch-tokens', type=int, 
+                        help='Padded tokens per encode call (default: batch size x model sequence length)')
     parser.add_argument('--device', help='Device to use (cuda/cpu)')
-    parser.add_argument('--output-format', choices=['json', 'pickle', 'numpy'], default='json')
+    parser.add_argument('--backend', choices=EMBEDDING_BACKENDS, default='torch', 
+                        help='PyTorch model or int8 quantised ONNX Runtime graph (CPU)')
+    parser.add_argument('--workers', type=int, default=0, help='Encode worker processes (0: encode in-process)')
+    parser.add_argument('--threads-per-worker', type=int, help='Threads per encode worker (default: cores / workers)')
+    parser.add_argument('--output-format', choices=['json', 'pickle', 'numpy', 'store'], default='json',
+                        help='store appends to <output-dir>/embedding_store (memory-mapped .npy + index)')
     parser.add_argument('--max-chunks', type=int, help='Maximum number of chunks to process')
+    parser.add_argument('--cache-path', help='SQLite embedding cache file (disabled when omitted)')
+    parser.add_argument('--cache-max-entries', type=int, default=200_000, help='Maximum cached vectors')
     
     args = parser.parse_args()
     
@@ -317,7 +568,13 @@ def main():
     generator = EmbeddingGenerator(
         model_name=args.model_name,
         batch_size=args.batch_size,
-        device=args.device
+        device=args.device,
+        cache_path=args.cache_path,
+        cache_max_entries=args.cache_max_entries,
+        max_batch_tokens=args.max_batch_tokens,
+        backend=args.backend,
+        workers=args.workers,
+        threads_per_worker=args.threads_per_worker
     )
     
     # Generate embeddings
@@ -332,6 +589,8 @@ def main():
     # Save embeddings
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     output_file = Path(args.output_dir) / f'embeddings_{timestamp}.{args.output_format}'
+    if args.output_format == 'store':
+        output_file = Path(args.output_dir) / 'embedding_store'
     
     generator.save_embeddings(embeddings, str(output_file), args.output_format)
     
@@ -348,8 +607,9 @@ def main():
     logger.info(f"Processing statistics: {stats}")
     
     # Memory cleanup
+    generator.close()
     del generator.model
-    if torch.cuda.is_available():
+    if torch is not None and torch.cuda.is_available():
         torch.cuda.empty_cache()
 
 if __name__ == '__main__':
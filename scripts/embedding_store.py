@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Memory-Mapped Embedding Store for Brokeranalysis Platform
+Keeps embedding vectors as one float32/float16 ``.npy`` matrix plus a compact
+JSONL index mapping each content_id to its row.
+
+The matrix is written with a fixed-size header so appending only writes the new
+rows and rewrites the header's row count in place. Loading memory-maps the file,
+so vectors are never copied or parsed and a subset of rows can be read without
+touching the rest.
+
+Layout of a store directory:
+    vectors.npy   (rows, dimension) matrix in standard NumPy format
+    index.jsonl   one {"content_id": ..., "row": ..., **metadata} line per row
+"""
+
+import ast
+import json
+import logging
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+VECTORS_FILE = 'vectors.npy'
+INDEX_FILE = 'index.jsonl'
+
+NPY_MAGIC = b'\x93NUMPY\x01\x00'
+# Fixed header size (a multiple of 64, as NumPy aligns it); the shape is rewritten in place on append
+NPY_HEADER_SIZE = 128
+STORE_DTYPES = ('float32', 'float16')
+
+def npy_header(dtype: np.dtype, rows: int, dimension: int) -> bytes:
+    """NPY v1.0 header for a C-ordered (rows, dimension) matrix, padded to NPY_HEADER_SIZE"""
+    header = repr({'descr': dtype.str, 'fortran_order': False, 'shape': (rows, dimension)})
+    padding = NPY_HEADER_SIZE - len(NPY_MAGIC) - 2 - len(header) - 1
+    if padding < 0:
+        raise ValueError(f"Shape {(rows, dimension)} does not fit the fixed .npy header")
+    header = (header + ' ' * padding + '\n').encode('latin1')
+    return NPY_MAGIC + len(header).to_bytes(2, 'little') + header
+
+def read_npy_header(path: Path):
+    """Return (dtype, rows, dimension) from a store's .npy header"""
+    with open(path, 'rb') as f:
+        prefix = f.read(len(NPY_MAGIC) + 2)
+        if prefix[:len(NPY_MAGIC)] != NPY_MAGIC:
+            raise ValueError(f"{path} is not a version 1.0 .npy file")
+        header = ast.literal_eval(f.read(int.from_bytes(prefix[-2:], 'little')).decode('latin1'))
+    rows, dimension = header['shape']
+    return np.dtype(header['descr']), rows, dimension
+
+class EmbeddingStore:
+    """Append-only embedding matrix with a content_id -> row index
+
+    An existing store keeps the dtype it was created with.
+    """
+
+    def __init__(self, store_dir: str, dtype: str = 'float32'):
+        if dtype not in STORE_DTYPES:
+            raise ValueError(f"Unsupported store dtype {dtype!r}; expected one of {STORE_DTYPES}")
+
+        self.store_dir = Path(store_dir)
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        self.vectors_path = self.store_dir / VECTORS_FILE
+        self.index_path = self.store_dir / INDEX_FILE
+
+        self.dtype = np.dtype(dtype)
+        self.rows = 0
+        self.dimension: Optional[int] = None
+        # content_id -> row; a re-appended content_id points at its latest row
+        self.rows_by_id: Dict[str, int] = {}
+        # Read-only mapping reused by get(); dropped whenever rows are added
+        self.matrix: Optional[np.ndarray] = None
+
+        if self.vectors_path.exists():
+            self.dtype, self.rows, self.dimension = read_npy_header(self.vectors_path)
+            self._load_index()
+
+    def _load_index(self):
+        """Read the index, dropping rows an interrupted append left on only one side"""
+        entries = 0
+        if self.index_path.exists():
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if not line.endswith('\n') or entries >= self.rows:
+                        break
+                    self.rows_by_id[json.loads(line)['content_id']] = entries
+                    entries += 1
+
+        if entries != self.rows:
+            logger.warning(f"Embedding store {self.store_dir}: truncating to {entries} rows "
+                           f"after an interrupted append")
+            self._truncate(entries)
+
+    def _truncate(self, rows: int):
+        """Cut both files back to their first ``rows`` rows"""
+        self.rows = rows
+        with open(self.vectors_path, 'r+b') as f:
+            f.write(npy_header(self.dtype, rows, self.dimension))
+            f.truncate(NPY_HEADER_SIZE + rows * self.dimension * self.dtype.itemsize)
+
+        if self.index_path.exists():
+            with open(self.index_path, 'r+', encoding='utf-8') as f:
+                offset = 0
+                for _ in range(rows):
+                    offset += len(f.readline().encode('utf-8'))
+                f.truncate(offset)
+
+    def append(self, content_ids: Sequence[str], vectors: np.ndarray,
+               metadata: Optional[Iterable[Dict[str, Any]]] = None) -> range:
+        """Append vectors (one row per content_id) and return their row numbers"""
+        vectors = np.ascontiguousarray(vectors, dtype=self.dtype)
+        if vectors.ndim != 2 or len(vectors) != len(content_ids):
+            raise ValueError(f"Expected {len(content_ids)} vectors, got array of shape {vectors.shape}")
+
+        if self.dimension is None:
+            self.dimension = vectors.shape[1]
+            with open(self.vectors_path, 'wb') as f:
+                f.write(npy_header(self.dtype, 0, self.dimension))
+        elif vectors.shape[1] != self.dimension:
+            raise ValueError(f"Store holds {self.dimension}-dimensional vectors, got {vectors.shape[1]}")
+
+        start = self.rows
+        metadata = metadata or [{} for _ in content_ids]
+
+        # Rows first, then the header's row count, then the index; a crash in between is
+        # detected on open because the index and the header disagree
+        with open(self.vectors_path, 'r+b') as f:
+            f.seek(NPY_HEADER_SIZE + start * self.dimension * self.dtype.itemsize)
+            f.write(vectors.tobytes())
+            f.seek(0)
+            f.write(npy_header(self.dtype, start + len(vectors), self.dimension))
+
+        with open(self.index_path, 'a', encoding='utf-8') as f:
+            for offset, (content_id, fields) in enumerate(zip(content_ids, metadata)):
+                f.write(json.dumps({'content_id': content_id, 'row': start + offset, **fields},
+                                   default=str) + '\n')
+                self.rows_by_id[content_id] = start + offset
+
+        self.rows = start + len(vectors)
+        self.matrix = None
+        return range(start, self.rows)
+
+    def load(self, mode: str = 'r') -> np.ndarray:
+        """Memory-map the whole matrix without reading it ('r' read-only, 'r+' writable)"""
+        if self.dimension is None:
+            return np.empty((0, 0), dtype=self.dtype)
+        if mode != 'r':
+            return np.load(self.vectors_path, mmap_mode=mode)
+        if self.matrix is None:
+            self.matrix = np.load(self.vectors_path, mmap_mode='r')
+        return self.matrix
+
+    def get(self, content_id: str) -> Optional[np.ndarray]:
+        """Vector for a content_id (a view into the mapped file), or None"""
+        row = self.rows_by_id.get(content_id)
+        return None if row is None else self.load()[row]
+
+    def get_many(self, content_ids: Sequence[str]) -> np.ndarray:
+        """Copy the rows for content_ids into a new array; raises KeyError for unknown ids"""
+        return self.load()[[self.rows_by_id[content_id] for content_id in content_ids]]
+
+    def read_index(self) -> List[Dict[str, Any]]:
+        """All index entries, in row order"""
+        with open(self.index_path, 'r', encoding='utf-8') as f:
+            return [json.loads(line) for line in f]
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def __contains__(self, content_id: str) -> bool:
+        return content_id in self.rows_by_id
+
+    def get_stats(self) -> Dict:
+        """Get store statistics"""
+        return {
+            'store_dir': str(self.store_dir),
+            'rows': self.rows,
+            'unique_content_ids': len(self.rows_by_id),
+            'dimension': self.dimension,
+            'dtype': self.dtype.name,
+            'vectors_bytes': self.vectors_path.stat().st_size if self.vectors_path.exists() else 0,
+            'index_bytes': self.index_path.stat().st_size if self.index_path.exists() else 0
+        }
@@ -0,0 +1,454 @@
+#!/usr/bin/env python3
+"""
+Single-Parse HTML Extraction Engine for Brokeranalysis Platform
+Parses a mirrored page once and runs every registered extractor (metadata, OG
+tags, body, authors, broker details, dates) over the same tree, producing one
+record per page instead of one BeautifulSoup parse per dataset script.
+
+Extractors receive a Page, which memoises the lookups they share (meta tags by
+name/property, the <title>, select_one results), and never modify the tree:
+text is read without script/style strings rather than by decomposing them, so
+extractors can run in any order. The dataset scripts (enhanced_parser,
+parse_broker_data, scan_missing_articles, migrate_news_content, migrate_authors)
+build their records from page_record(), the full engine record for a file. With
+a parse cache that record is stored once per page under one parser name, so a
+page is parsed once however many of the scripts read it.
+
+Broker fields come from the compiled rulebook in broker_extraction_rules. This
+module only depends on bs4 (and parse_cache, broker_extraction_rules), so it can
+be imported without the database clients the migration scripts create at import
+time.
+"""
+
+import os
+import re
+import json
+import time
+import logging
+import argparse
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from bs4 import BeautifulSoup, CData, NavigableString
+
+import broker_extraction_rules
+from broker_extraction_rules import BROKER_RULES
+from parse_cache import ParseCache, parse_with_cache, source_version
+
+logger = logging.getLogger(__name__)
+
+# String types get_text() should return; script/style contents are other subclasses
+TEXT_TYPES = (NavigableString, CData)
+
+# Main content containers, most specific first
+CONTENT_SELECTORS = [
+    'article', '.article-content', '.content', '.main-content',
+    '.post-content', '.entry-content', 'main', '.article-body'
+]
+# Characters of <body> text used when no content container matches
+BODY_FALLBACK_CHARS = 2000
+
+# Article containers searched by scan_missing_articles, in its order
+ARTICLE_SELECTORS = [
+    'article', '.article-content', '.post-content',
+    '.entry-content', '.content', 'main'
+]
+
+LIST_BULLET_PATTERN = re.compile(r'[•\-\*]')
+
+TEXT_DATE_PATTERNS = [re.compile(pattern, re.IGNORECASE) for pattern in (
+    r'(\d{1,2}[/-]\d{1,2}[/-]202[45])',
+    r'(202[45][/-]\d{1,2}[/-]\d{1,2})',
+    r'(\d{1,2}\s+(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\s+202[45])'
+)]
+PATH_DATE_PATTERN = re.compile(r'[/\\](\d{4})[/\\](\d{2})[/\\]')
+
+AUTHOR_SECTION_CLASS = re.compile(r'author|profile|contributor|writer', re.I)
+AUTHOR_META_NAME = re.compile(r'author', re.I)
+BYLINE_CLASS = re.compile(r'byline|author|writer', re.I)
+AUTHOR_NAME_CLASS = re.compile(r'name|title', re.I)
+AUTHOR_BIO_CLASS = re.compile(r'bio|description|about', re.I)
+SOCIAL_HREF = re.compile(r'twitter|linkedin|facebook', re.I)
+MAILTO_HREF = re.compile(r'mailto:', re.I)
+BYLINE_PREFIX = re.compile(r'^(by|author:)\s*', re.I)
+EXPERTISE_KEYWORDS = ['forex', 'trading', 'analyst', 'market', 'currency', 'commodities', 'stocks', 'economics', 'finance']
+
+def element_text(element, strip: bool = False) -> str:
+    """get_text() of an element without its script/style contents; the tree is not modified"""
+    return element.get_text(strip=strip, types=TEXT_TYPES)
+
+class Page:
+    """One parsed page plus the lookups extractors share"""
+
+    def __init__(self, soup: BeautifulSoup, file_path: str = ''):
+        self.soup = soup
+        self.file_path = str(file_path)
+        self._selected: Dict[str, Any] = {}
+        self._meta_by_name: Optional[Dict[str, Any]] = None
+        self._meta_by_property: Optional[Dict[str, Any]] = None
+        self._title_tag = False
+        self._content_text: Dict[Tuple[str, ...], str] = {}
+
+    @classmethod
+    def parse(cls, html: str, file_path: str = '', html_parser: str = 'html.parser') -> 'Page':
+        """Parse HTML into a Page"""
+        return cls(BeautifulSoup(html, html_parser), file_path)
+
+    def _index_meta(self):
+        self._meta_by_name, self._meta_by_property = {}, {}
+        for tag in self.soup.find_all('meta'):
+            if tag.get('name') is not None:
+                self._meta_by_name.setdefault(tag['name'], tag)
+            if tag.get('property') is not None:
+                self._meta_by_property.setdefault(tag['property'], tag)
+
+    def meta_tag(self, name: str):
+        """First <meta name=...> tag, like soup.find('meta', {'name': name})"""
+        if self._meta_by_name is None:
+            self._index_meta()
+        return self._meta_by_name.get(name)
+
+    def property_tag(self, prop: str):
+        """First <meta property=...> tag, like soup.find('meta', {'property': prop})"""
+        if self._meta_by_property is None:
+            self._index_meta()
+        return self._meta_by_property.get(prop)
+
+    def meta_properties(self, prefix: str) -> Dict[str, Any]:
+        """First <meta property=...> tag for each property starting with prefix"""
+        if self._meta_by_property is None:
+            self._index_meta()
+        return {prop: tag for prop, tag in self._meta_by_property.items() if prop.startswith(prefix)}
+
+    @property
+    def title_tag(self):
+        """The first <title> tag, or None"""
+        if self._title_tag is False:
+            self._title_tag = self.soup.find('title')
+        return self._title_tag
+
+    def title_text(self) -> str:
+        """Stripped <title> text, or ''"""
+        return self.title_tag.get_text().strip() if self.title_tag else ''
+
+    def meta_content(self, name: str) -> str:
+        """Stripped content of <meta name=...>, or ''"""
+        tag = self.meta_tag(name)
+        return tag.get('content', '').strip() if tag else ''
+
+    def property_content(self, prop: str) -> str:
+        """Stripped content of <meta property=...>, or ''"""
+        tag = self.property_tag(prop)
+        return tag.get('content', '').strip() if tag else ''
+
+    def canonical_url(self) -> str:
+        """Stripped href of <link rel="canonical">, or ''"""
+        tag = self.soup.find('link', {'rel': 'canonical'})
+        return tag.get('href', '').strip() if tag else ''
+
+    def select_one(self, selector: str):
+        """soup.select_one(selector), evaluated once per page"""
+        if selector not in self._selected:
+            self._selected[selector] = self.soup.select_one(selector)
+        return self._selected[selector]
+
+    def first_match(self, selectors: Sequence[str]) -> Tuple[Optional[str], Any]:
+        """(selector, element) for the first selector matching anything, else (None, None)"""
+        for selector in selectors:
+            element = self.select_one(selector)
+            if element:
+                return selector, element
+        return None, None
+
+    def content_text(self, selectors: Sequence[str] = CONTENT_SELECTORS) -> str:
+        """Stripped-string text of the first content container, else the start of <body>"""
+        key = tuple(selectors)
+        if key not in self._content_text:
+            _, element = self.first_match(key)
+            if element:
+                text = element_text(element, strip=True)
+            else:
+                body = self.soup.find('body')
+                text = element_text(body, strip=True)[:BODY_FALLBACK_CHARS] if body else ''
+            self._content_text[key] = text
+        return self._content_text[key]
+
+def content_text(page: Page, selectors: Sequence[str] = CONTENT_SELECTORS) -> str:
+    return page.content_text(selectors)
+
+def first_group(patterns: Sequence[re.Pattern], text: str) -> str:
+    """First capture group of the first pattern that matches text, else ''"""
+    for pattern in patterns:
+        match = pattern.search(text)
+        if match:
+            return match.group(1)
+    return ''
+
+def broker_details_from_text(text_content: str) -> Dict[str, Any]:
+    """Rating, minimum deposit, leverage, regulation and pros/cons found in review text"""
+    scan = BROKER_RULES.scan(text_content)
+    min_deposit = scan.first('minimum_deposit')
+
+    pros = []
+    pros_section = scan.first_match('pros')
+    if pros_section:
+        pros = [p.strip() for p in LIST_BULLET_PATTERN.split(pros_section.group(1)) if p.strip()]
+
+    cons = []
+    cons_section = scan.first_match('cons')
+    if cons_section:
+        cons = [c.strip() for c in LIST_BULLET_PATTERN.split(cons_section.group(1)) if c.strip()]
+
+    return {
+        'rating': scan.first('rating'),
+        'minimum_deposit': f"${min_deposit}" if min_deposit else '',
+        'leverage': scan.first('leverage'),
+        'regulation': scan.first('regulation'),
+        'pros': pros[:5],  # Limit to 5 items
+        'cons': cons[:5]   # Limit to 5 items
+    }
+
+def new_author(name: Optional[str] = None) -> Dict[str, Any]:
+    """Empty author record in the shape the authors table expects"""
+    author = {'name': name} if name is not None else {}
+    author.update({
+        'bio': '',
+        'avatar_url': '',
+        'email': '',
+        'expertise': [],
+        'social_links': {},
+        'is_active': True
+    })
+    return author
+
+def author_from_section(section) -> Optional[Dict[str, Any]]:
+    """Author details from an author/profile block, or None when it has no name"""
+    try:
+        author_data = new_author()
+
+        name_elem = section.find(['h1', 'h2', 'h3', 'h4', 'span'], class_=AUTHOR_NAME_CLASS)
+        if name_elem:
+            author_data['name'] = name_elem.get_text(strip=True)
+
+        bio_elem = section.find(['p', 'div'], class_=AUTHOR_BIO_CLASS)
+        if bio_elem:
+            author_data['bio'] = bio_elem.get_text(strip=True)
+
+        img_elem = section.find('img')
+        if img_elem:
+            author_data['avatar_url'] = img_elem.get('src', '')
+
+        social_data = {}
+        for link in section.find_all('a', href=SOCIAL_HREF):
+            href = link.get('href', '')
+            if 'twitter' in href:
+                social_data['twitter'] = href
+            elif 'linkedin' in href:
+                social_data['linkedin'] = href
+            elif 'facebook' in href:
+                social_data['facebook'] = href
+        author_data['social_links'] = social_data
+
+        email_elem = section.find('a', href=MAILTO_HREF)
+        if email_elem:
+            author_data['email'] = email_elem.get('href', '').replace('mailto:', '')
+
+        # Expertise from common forex/trading keywords in the bio
+        bio_text = author_data['bio'].lower()
+        author_data['expertise'] = [keyword.title() for keyword in EXPERTISE_KEYWORDS if keyword in bio_text]
+
+        return author_data if author_data.get('name') else None
+
+    except Exception as e:
+        logger.error(f"Error extracting author from section: {e}")
+        return None
+
+def extract_authors(page: Page) -> List[Dict[str, Any]]:
+    """Authors from profile sections, <meta name="author"> tags and bylines, in that order"""
+    soup = page.soup
+    authors = []
+
+    for section in soup.find_all(['div', 'section', 'article'], class_=AUTHOR_SECTION_CLASS):
+        author_data = author_from_section(section)
+        if author_data:
+            authors.append(author_data)
+
+    for meta in soup.find_all('meta', attrs={'name': AUTHOR_META_NAME}):
+        content = meta.get('content', '')
+        if content and content.strip():
+            authors.append(new_author(content.strip()))
+
+    for byline in soup.find_all(['span', 'div', 'p'], class_=BYLINE_CLASS):
+        text = byline.get_text(strip=True)
+        if text and ('by ' in text.lower() or 'author:' in text.lower()):
+            name = BYLINE_PREFIX.sub('', text).strip()
+            if name:
+                authors.append(new_author(name))
+
+    return authors
+
+def text_date(text: str) -> str:
+    """First 2024/2025 date written in text, as found, else ''"""
+    return first_group(TEXT_DATE_PATTERNS, text)
+
+# Registered extractors: record key -> function(page) -> value
+EXTRACTORS: Dict[str, Callable[[Page], Any]] = {}
+
+def register_extractor(name: str):
+    """Decorator adding a function to EXTRACTORS under ``name``"""
+    def decorator(func: Callable[[Page], Any]):
+        EXTRACTORS[name] = func
+        return func
+    return decorator
+
+@register_extractor('metadata')
+def extract_metadata(page: Page) -> Dict[str, str]:
+    """Title, description, keywords and canonical URL"""
+    return {
+        'title': page.title_text(),
+        'meta_title': page.meta_content('title'),
+        'description': page.meta_content('description'),
+        'keywords': page.meta_content('keywords'),
+        'canonical_url': page.canonical_url()
+    }
+
+@register_extractor('og')
+def extract_og(page: Page) -> Dict[str, str]:
+    """Open Graph properties, keyed without the og: prefix"""
+    return {
+        prop[len('og:'):]: tag.get('content', '').strip()
+        for prop, tag in page.meta_properties('og:').items()
+        if tag.get('content')
+    }
+
+@register_extractor('body')
+def extract_body(page: Page) -> Dict[str, Any]:
+    """Whitespace-normalised text of the main content container"""
+    selector, element = page.first_match(CONTENT_SELECTORS)
+    if element is None:
+        element = page.soup.find('body')
+    text = ' '.join(element_text(element).split()) if element is not None else ''
+    return {'selector': selector, 'text': text}
+
+@register_extractor('content_text')
+def extract_content_text(page: Page) -> str:
+    return page.content_text()
+
+@register_extractor('article_text')
+def extract_article_text(page: Page) -> str:
+    """Stripped text of the first article container, or ''"""
+    _, element = page.first_match(ARTICLE_SELECTORS)
+    return element_text(element).strip() if element else ''
+
+@register_extractor('authors')
+def extract_author_records(page: Page) -> List[Dict[str, Any]]:
+    return extract_authors(page)
+
+@register_extractor('broker_details')
+def extract_broker_details(page: Page) -> Dict[str, Any]:
+    return broker_details_from_text(page.content_text())
+
+@register_extractor('dates')
+def extract_dates(page: Page) -> Dict[str, str]:
+    """Dates from the mirror path (year/month directories), meta tags and page text"""
+    path_match = PATH_DATE_PATTERN.search(page.file_path)
+    return {
+        'path_year_month': '-'.join(path_match.groups()) if path_match else '',
+        'published_time': page.property_content('article:published_time'),
+        'modified_time': page.property_content('article:modified_time'),
+        'text_date': text_date(f"{page.title_text()} {page.meta_content('description')} {page.content_text()}")
+    }
+
+class HtmlExtractionEngine:
+    """Parses each page once and runs the selected extractors over it"""
+
+    def __init__(self, extractors: Optional[Sequence[str]] = None, html_parser: str = 'html.parser'):
+        names = list(extractors) if extractors else list(EXTRACTORS)
+        unknown = [name for name in names if name not in EXTRACTORS]
+        if unknown:
+            raise ValueError(f"Unknown extractors {unknown}; expected some of {list(EXTRACTORS)}")
+
+        self.extractors = {name: EXTRACTORS[name] for name in names}
+        self.html_parser = html_parser
+
+    def extract_page(self, page: Page) -> Dict[str, Any]:
+        """One record with every extractor's output; a failing extractor gives None"""
+        record = {'file_path': page.file_path}
+        for name, extractor in self.extractors.items():
+            try:
+                record[name] = extractor(page)
+            except Exception as e:
+                logger.error(f"Extractor {name} failed on {page.file_path}: {e}")
+                record[name] = None
+        return record
+
+    def extract_html(self, html: str, file_path: str = '') -> Dict[str, Any]:
+        """Record for an HTML string"""
+        return self.extract_page(Page.parse(html, file_path, self.html_parser))
+
+    def extract_file(self, file_path) -> Dict[str, Any]:
+        """Record for an HTML file"""
+        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+            return self.extract_html(f.read(), str(file_path))
+
+# Every extractor, so records stored for one script serve all the others
+PAGE_ENGINE = HtmlExtractionEngine()
+PAGE_RECORD_VERSION = source_version(__file__, broker_extraction_rules.__file__, salt=','.join(EXTRACTORS))
+
+def page_record(file_path, parse_cache: Optional[ParseCache] = None) -> Dict[str, Any]:
+    """Full engine record for an HTML file, shared by the dataset scripts through parse_cache"""
+    return parse_with_cache(parse_cache, 'html_extraction', PAGE_RECORD_VERSION, file_path, PAGE_ENGINE.extract_file)
+
+def extract_directory(directory: str, output_file: str, extractors: Optional[Sequence[str]] = None,
+                      cache_path: Optional[str] = None) -> Dict:
+    """Write one JSON Lines record per HTML file under directory"""
+    engine = HtmlExtractionEngine(extractors)
+    cache = ParseCache(cache_path) if cache_path else None
+    version = source_version(__file__, broker_extraction_rules.__file__, salt=','.join(engine.extractors))
+    # Full records share page_record()'s entries; a subset gets its own so neither purges the other
+    parser = 'html_extraction'
+    if list(engine.extractors) != list(EXTRACTORS):
+        parser += ':' + ','.join(engine.extractors)
+
+    pages = 0
+    start_time = time.time()
+    try:
+        with open(output_file, 'w', encoding='utf-8') as output:
+            for file_path in Path(directory).rglob('*.html'):
+                record = parse_with_cache(cache, parser, version, file_path, engine.extract_file)
+                output.write(json.dumps(record, ensure_ascii=False) + '\n')
+                pages += 1
+    finally:
+        if cache:
+            cache.close()
+
+    elapsed = time.time() - start_time
+    return {
+        'pages': pages,
+        'extractors': list(engine.extractors),
+        'output_file': output_file,
+        'elapsed_seconds': elapsed,
+        'pages_per_second': pages / max(elapsed, 1e-9),
+        **(cache.get_stats() if cache else {}),
+        **({'broker_rules': BROKER_RULES.get_stats()} if 'broker_details' in engine.extractors else {})
+    }
+
+def main():
+    """Extract one record per page from a mirrored directory"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description='Single-parse HTML extraction over a mirrored directory')
+    parser.add_argument('directory', help='Directory searched recursively for .html files')
+    parser.add_argument('--output', default='extracted_pages.jsonl', help='JSON Lines output file')
+    parser.add_argument('--extractors', nargs='+', choices=list(EXTRACTORS), help='Extractors to run (default: all)')
+    parser.add_argument('--parse-cache', help='SQLite parse cache; unchanged pages are not re-parsed')
+
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.directory):
+        parser.error(f"Not a directory: {args.directory}")
+
+    print(json.dumps(extract_directory(args.directory, args.output, args.extractors, args.parse_cache), indent=2))
+
+if __name__ == '__main__':
+    main()
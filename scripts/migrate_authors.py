@@ -11,8 +11,9 @@ import json
 import re
 from datetime import datetime, timezone
 from pathlib import Path
-from bs4 import BeautifulSoup
 from supabase import create_client, Client
+from html_extraction import Page, author_from_section, extract_authors, page_record
+from parse_cache import open_parse_cache_from_env
 import logging
 
 # Configure logging
@@ -69,130 +70,29 @@ def extract_author_info_from_html(html_content, file_path):
     Extract author information from HTML content
     """
     try:
-        soup = BeautifulSoup(html_content, 'html.parser')
-        authors = []
-        
-        # Look for author sections, profiles, or contributor information
-        author_sections = soup.find_all(['div', 'section', 'article'], 
-                                      class_=re.compile(r'author|profile|contributor|writer', re.I))
-        
-        # Also look for meta tags with author information
-        meta_authors = soup.find_all('meta', attrs={'name': re.compile(r'author', re.I)})
-        
-        # Extract from author sections
-        for section in author_sections:
-            author_data = extract_author_from_section(section, file_path)
-            if author_data:
-                authors.append(author_data)
-        
-        # Extract from meta tags
-        for meta in meta_authors:
-            content = meta.get('content', '')
-            if content and content.strip():
-                author_data = {
-                    'name': content.strip(),
-                    'bio': '',
-                    'avatar_url': '',
-                    'email': '',
-                    'expertise': [],
-                    'social_links': {},
-                    'is_active': True
-                }
-                authors.append(author_data)
-        
-        # Look for bylines in articles
-        bylines = soup.find_all(['span', 'div', 'p'], 
-                               class_=re.compile(r'byline|author|writer', re.I))
-        
-        for byline in bylines:
-            text = byline.get_text(strip=True)
-            if text and ('by ' in text.lower() or 'author:' in text.lower()):
-                # Extract author name from byline
-                name = re.sub(r'^(by|author:)\s*', '', text, flags=re.I).strip()
-                if name:
-                    author_data = {
-                        'name': name,
-                        'bio': '',
-                        'avatar_url': '',
-                        'email': '',
-                        'expertise': [],
-                        'social_links': {},
-                        'is_active': True
-                    }
-                    authors.append(author_data)
-        
-        return authors
+        return extract_authors(Page.parse(html_content, file_path))
         
     except Exception as e:
         logger.error(f"Error extracting author info from {file_path}: {e}")
         return []
 
-def extract_author_from_section(section, file_path):
+def extract_author_info_from_file(file_path, parse_cache=None):
     """
-    Extract detailed author information from a section
+    Extract author information from an HTML file, via the page record shared
+    with the other dataset scripts
     """
     try:
-        author_data = {
-            'bio': '',
-            'avatar_url': '',
-            'email': '',
-            'expertise': [],
-            'social_links': {},
-            'is_active': True
-        }
-        
-        # Extract name
-        name_elem = section.find(['h1', 'h2', 'h3', 'h4', 'span'], 
-                                class_=re.compile(r'name|title', re.I))
-        if name_elem:
-            author_data['name'] = name_elem.get_text(strip=True)
-        
-        # Extract bio/description
-        bio_elem = section.find(['p', 'div'], 
-                               class_=re.compile(r'bio|description|about', re.I))
-        if bio_elem:
-            author_data['bio'] = bio_elem.get_text(strip=True)
-        
-        # Extract image
-        img_elem = section.find('img')
-        if img_elem:
-            author_data['avatar_url'] = img_elem.get('src', '')
-        
-        # Extract social links
-        social_links = section.find_all('a', href=re.compile(r'twitter|linkedin|facebook', re.I))
-        social_data = {}
-        if social_links:
-            for link in social_links:
-                href = link.get('href', '')
-                if 'twitter' in href:
-                    social_data['twitter'] = href
-                elif 'linkedin' in href:
-                    social_data['linkedin'] = href
-                elif 'facebook' in href:
-                    social_data['facebook'] = href
-        author_data['social_links'] = social_data
-        
-        # Extract email if present
-        email_elem = section.find('a', href=re.compile(r'mailto:', re.I))
-        if email_elem:
-            author_data['email'] = email_elem.get('href', '').replace('mailto:', '')
-        
-        # Extract expertise from bio or description
-        expertise = []
-        if author_data.get('bio'):
-            bio_text = author_data['bio'].lower()
-            # Look for common forex/trading expertise keywords
-            expertise_keywords = ['forex', 'trading', 'analyst', 'market', 'currency', 'commodities', 'stocks', 'economics', 'finance']
-            for keyword in expertise_keywords:
-                if keyword in bio_text:
-                    expertise.append(keyword.title())
-        author_data['expertise'] = expertise
-        
-        return author_data if author_data.get('name') else None
+        return page_record(file_path, parse_cache)['authors'] or []
         
     except Exception as e:
-        logger.error(f"Error extracting author from section: {e}")
-        return None
+        logger.error(f"Error extracting author info from {file_path}: {e}")
+        return []
+
+def extract_author_from_section(section, file_path):
+    """
+    Extract detailed author information from a section
+    """
+    return author_from_section(section)
 
 def update_brand_references(author_data):
     """
@@ -288,7 +188,7 @@ def import_author_to_supabase(author_data):
         
         return False
 
-def process_author_files():
+def process_author_files(parse_cache=None):
     """
     Process relevant HTML files to extract author information
     """
@@ -330,11 +230,8 @@ def process_author_files():
         try:
             logger.info(f"Processing: {html_file}")
             
-            with open(html_file, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
-            
             # Extract author information
-            authors = extract_author_info_from_html(content, str(html_file))
+            authors = extract_author_info_from_file(html_file, parse_cache)
             
             for author_data in authors:
                 if not author_data.get('name'):
@@ -362,8 +259,9 @@ def main():
     """
     logger.info("Starting author migration for BrokerAnalysis (2024+ content only)")
     
+    parse_cache = open_parse_cache_from_env()
     try:
-        total, successful = process_author_files()
+        total, successful = process_author_files(parse_cache)
         
         print(f"\n=== Author Migration Summary ===")
         print(f"Total authors found: {total}")
@@ -377,6 +275,9 @@ def main():
     except Exception as e:
         logger.error(f"Migration failed: {e}")
         sys.exit(1)
+    finally:
+        if parse_cache:
+            parse_cache.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -6,25 +6,75 @@ Handles base64 encoded content, JavaScript obfuscation, and mixed HTML structure
 
 import os
 import re
+import time
 import base64
+import binascii
+import codecs
 import json
 import html
+import argparse
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional, Set, Tuple
 from bs4 import BeautifulSoup
 from urllib.parse import unquote
+from html_extraction import element_text
+from parse_cache import ParseCache, source_version
 import logging
 from datetime import datetime
 
+# Prefer the C-based lxml tree builder; html.parser is pure Python and several times slower
+try:
+    import lxml  # noqa: F401
+    FAST_HTML_PARSER = 'lxml'
+except ImportError:
+    FAST_HTML_PARSER = 'html.parser'
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+@dataclass
+class EncodedBlocks:
+    """Text decoded from a page's base64 blocks in one scan (see scan_encoded_blocks)"""
+    large_blocks: List[str] = field(default_factory=list)
+    data_uri_text: List[str] = field(default_factory=list)
+    data_uri_samples: List[Dict] = field(default_factory=list)
+
 class ObfuscatedContentParser:
     """Parser for handling obfuscated HTML content from scraped DailyForex files"""
     
-    def __init__(self, base_directory: str):
+    # Bytes searched before the rest of the file in the 2024+ check; dates and metadata sit in the head
+    HEAD_BYTES = 64 * 1024
+    
+    # data: URI payloads and bare base64 runs of 200+ characters, found in one pass over the
+    # raw bytes. A bare run must start after a non-base64 byte, so positions inside a short
+    # run fail at once instead of re-matching the rest of the run.
+    ENCODED_BLOCK_PATTERN = re.compile(
+        rb'data:[^;]+;base64,(?P<data_uri>[A-Za-z0-9+/=]+)'
+        rb'|(?<![A-Za-z0-9+/=])(?P<run>[A-Za-z0-9+/=]{200,})'
+    )
+    LARGE_BLOCK_KEYWORDS = re.compile(
+        r'forex|broker|trading|market|analysis|investment|currency|financial', re.IGNORECASE
+    )
+    DATA_URI_KEYWORDS = re.compile(r'forex|broker|trading|market|analysis', re.IGNORECASE)
+    # Base64 characters decoded to tell text from binary (inline images, fonts); a multiple of 4
+    SNIFF_CHARS = 4096
+    # Decoded bytes kept per block; longer blocks are cut to this size
+    MAX_DECODED_BYTES = 1024 * 1024
+    MAX_DATA_URI_SAMPLES = 10
+    
+    def __init__(self, base_directory: str, fast_path: bool = True,
+                 parse_cache: Optional[ParseCache] = None):
         self.base_directory = Path(base_directory)
+        # fast_path: head-first date check, lxml, and no re-serialising/re-parsing of the soup
+        self.fast_path = fast_path
+        self.html_parser = FAST_HTML_PARSER if fast_path else 'html.parser'
+        # Directory scans serve unchanged files from the cache; the two paths cache separately
+        self.parse_cache = parse_cache
+        self.cache_name = 'obfuscated_content_parser' if fast_path else 'obfuscated_content_parser.legacy'
+        self.parser_version = source_version(__file__, salt=self.html_parser)
         self.content_patterns = {
             'base64_image': re.compile(r'data:image/[^;]+;base64,([A-Za-z0-9+/=]+)'),
             'base64_content': re.compile(r'data:[^;]+;base64,([A-Za-z0-9+/=]+)'),
@@ -32,6 +82,7 @@ class ObfuscatedContentParser:
             'javascript_vars': re.compile(r'var\s+(\w+)\s*=\s*["\']([^"\']*)["\'\;]'),
             'date_patterns': re.compile(r'(\d{4})[-/](\d{1,2})[-/](\d{1,2})'),
             'year_filter': re.compile(r'202[4-9]|20[3-9]\d'),  # 2024 and later
+            'year_filter_bytes': re.compile(rb'202[4-9]|20[3-9]\d'),
         }
         
     def is_2024_plus_content(self, content: str, file_path: str = "") -> bool:
@@ -55,6 +106,41 @@ class ObfuscatedContentParser:
                 
         return False
     
+    def read_2024_plus_file(self, file_path: str) -> Optional[str]:
+        """Read a file if it is 2024+ content (see is_2024_plus_content), else return None"""
+        if not self.fast_path:
+            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+                html_content = f.read()
+            return html_content if self.is_2024_plus_content(html_content, file_path) else None
+        
+        data = self.read_2024_plus_bytes(file_path)
+        return None if data is None else self.decode_html_bytes(data)
+    
+    def read_2024_plus_bytes(self, file_path: str) -> Optional[bytes]:
+        """Raw bytes of a 2024+ file, else None (the fast path of read_2024_plus_file)
+        
+        Checks the modification time before reading and stops at the first year match
+        in the head of the file; the rest of the file is only searched when the head
+        has no match.
+        """
+        recent_file = datetime.fromtimestamp(os.path.getmtime(file_path)).year >= 2024
+        year_filter = self.content_patterns['year_filter_bytes']
+        
+        with open(file_path, 'rb') as f:
+            data = f.read()
+        
+        # Any 2024+ date also matches year_filter, so the date pattern scan is not needed.
+        # The last 3 head bytes are searched again in case a year straddles the boundary.
+        if (recent_file or year_filter.search(data, 0, self.HEAD_BYTES) or
+                year_filter.search(data, max(self.HEAD_BYTES - 3, 0))):
+            return data
+        return None
+    
+    @staticmethod
+    def decode_html_bytes(data: bytes) -> str:
+        """Decode file bytes the way text-mode open() with errors='ignore' reads them"""
+        return data.decode('utf-8', errors='ignore').replace('\r\n', '\n').replace('\r', '\n')
+    
     def decode_base64_content(self, encoded_string: str) -> Optional[str]:
         """Attempt to decode base64 encoded content"""
         try:
@@ -79,6 +165,75 @@ class ObfuscatedContentParser:
             logger.debug(f"Failed to decode base64: {e}")
             return None
     
+    def decode_text_block(self, block: memoryview) -> Tuple[Optional[str], bool]:
+        """Decode a base64 block as UTF-8 text, keeping at most MAX_DECODED_BYTES
+        
+        Returns (text, strict), where strict is False if undecodable bytes were dropped
+        from the text. Only the first SNIFF_CHARS are decoded when those are not UTF-8;
+        such blocks are binary and give (None, False), as do malformed ones.
+        """
+        end = min(len(block), self.MAX_DECODED_BYTES // 3 * 4)
+        split = min(end, self.SNIFF_CHARS)
+        complete = end == len(block)
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        
+        try:
+            head = binascii.a2b_base64(pad_base64(block[:split]))
+            try:
+                text = decoder.decode(head, final=complete and split == end)
+            except UnicodeDecodeError:
+                return None, False
+            
+            if split == end:
+                return text, True
+            rest = binascii.a2b_base64(pad_base64(block[split:end]))
+        except binascii.Error as e:
+            logger.debug(f"Failed to decode base64: {e}")
+            return None, False
+        
+        try:
+            # A cut block may end inside a character, which final=False leaves out
+            return text + decoder.decode(rest, final=complete), True
+        except UnicodeDecodeError:
+            return (head + rest).decode('utf-8', errors='ignore'), False
+    
+    def scan_encoded_blocks(self, data: bytes) -> EncodedBlocks:
+        """Find and decode every base64 block in a page's raw bytes in a single pass
+        
+        Gives the results of extract_large_encoded_blocks, the data: URI filter in
+        extract_article_content and parse_html_file's base64_content samples, decoding
+        each block once instead of once per consumer. Binary blocks are skipped by all three.
+        """
+        blocks = EncodedBlocks()
+        view = memoryview(data)
+        data_uris = 0
+        
+        for match in self.ENCODED_BLOCK_PATTERN.finditer(view):
+            is_data_uri = match.lastgroup == 'data_uri'
+            start, end = match.span(match.lastgroup)
+            data_uris += is_data_uri
+            
+            text, strict = self.decode_text_block(view[start:end])
+            if not text:
+                continue
+            
+            # Data URI payloads of 200+ characters are also runs for the large block check
+            if end - start >= 200 and len(text) > 500 and self.LARGE_BLOCK_KEYWORDS.search(text):
+                blocks.large_blocks.append(text)
+            
+            if not (is_data_uri and strict):
+                continue
+            if len(text) > 100 and not text.lstrip().startswith('<svg') and self.DATA_URI_KEYWORDS.search(text):
+                blocks.data_uri_text.append(text)
+            if data_uris <= self.MAX_DATA_URI_SAMPLES:
+                blocks.data_uri_samples.append({
+                    'original_length': end - start,
+                    'decoded_content': text[:1000],  # Limit length
+                    'is_text': True
+                })
+        
+        return blocks
+    
     def extract_javascript_variables(self, content: str) -> Dict[str, str]:
         """Extract JavaScript variables and their values"""
         variables = {}
@@ -98,25 +253,28 @@ class ObfuscatedContentParser:
         """Clean and extract meaningful text from HTML"""
         try:
             soup = BeautifulSoup(html_content, 'html.parser')
-            
             # Remove script and style elements
             for script in soup(["script", "style", "meta", "link"]):
                 script.decompose()
-            
-            # Get text content
-            text = soup.get_text()
-            
-            # Clean up whitespace
-            lines = (line.strip() for line in text.splitlines())
-            chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-            text = ' '.join(chunk for chunk in chunks if chunk)
-            
-            return text
+            return self.clean_element_text(soup)
             
         except Exception as e:
             logger.error(f"Error cleaning HTML: {e}")
             return html_content
     
+    def clean_element_text(self, element) -> str:
+        """Extract meaningful text from a parsed element, without its script/style contents
+        
+        The tree is not modified, so metadata can still be read from the same soup
+        afterwards (meta/link tags hold no text either way).
+        """
+        text = element_text(element)
+        
+        # Clean up whitespace
+        lines = (line.strip() for line in text.splitlines())
+        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+        return ' '.join(chunk for chunk in chunks if chunk)
+    
     def extract_article_metadata(self, soup: BeautifulSoup) -> Dict[str, str]:
         """Extract article metadata from HTML"""
         metadata = {}
@@ -169,35 +327,37 @@ class ObfuscatedContentParser:
                         decoded_blocks.append(decoded)
             except:
                 pass
-                
-            # Try URL decoding
-            try:
-                decoded = unquote(match)
-                if len(decoded) > 500 and decoded != match:
-                    if any(word in decoded.lower() for word in ['forex', 'broker', 'trading', 'market', 'analysis']):
-                        decoded_blocks.append(decoded)
-            except:
-                pass
         
         return decoded_blocks
     
-    def extract_article_content(self, soup: BeautifulSoup) -> Dict[str, str]:
-        """Extract main article content from obfuscated HTML"""
-        content = {}
-        html_content = str(soup)
+    def extract_article_content(self, soup: BeautifulSoup, html_content: Optional[str] = None,
+                                encoded_blocks: Optional[EncodedBlocks] = None) -> Dict[str, str]:
+        """Extract main article content from obfuscated HTML
         
-        # Try to extract from large encoded blocks first
-        large_blocks = self.extract_large_encoded_blocks(html_content)
+        Pass the raw ``html_content`` the soup was parsed from to skip re-serialising it,
+        or the page's ``encoded_blocks`` to skip scanning it for base64 content.
+        """
+        content = {}
         
-        # Try to extract from decoded base64 content
-        base64_text_content = []
-        base64_matches = self.content_patterns['base64_content'].findall(html_content)
-        for match in base64_matches:
-            decoded = self.decode_base64_content(match)
-            if decoded and len(decoded) > 100 and not decoded.strip().startswith('<svg'):
-                # Check if it contains meaningful text (not just encoded images)
-                if any(word in decoded.lower() for word in ['forex', 'broker', 'trading', 'market', 'analysis']):
-                    base64_text_content.append(decoded)
+        if encoded_blocks is not None:
+            large_blocks = encoded_blocks.large_blocks
+            base64_text_content = encoded_blocks.data_uri_text
+        else:
+            if html_content is None:
+                html_content = str(soup)
+            
+            # Try to extract from large encoded blocks first
+            large_blocks = self.extract_large_encoded_blocks(html_content)
+            
+            # Try to extract from decoded base64 content
+            base64_text_content = []
+            base64_matches = self.content_patterns['base64_content'].findall(html_content)
+            for match in base64_matches:
+                decoded = self.decode_base64_content(match)
+                if decoded and len(decoded) > 100 and not decoded.strip().startswith('<svg'):
+                    # Check if it contains meaningful text (not just encoded images)
+                    if any(word in decoded.lower() for word in ['forex', 'broker', 'trading', 'market', 'analysis']):
+                        base64_text_content.append(decoded)
         
         # Look for text in script tags that might contain content
         script_content = []
@@ -244,7 +404,10 @@ class ObfuscatedContentParser:
         all_content = []
         
         if article_element:
-            extracted = self.clean_html_content(str(article_element))
+            if self.fast_path:
+                extracted = self.clean_element_text(article_element)
+            else:
+                extracted = self.clean_html_content(str(article_element))
             if len(extracted) > 50:  # Only add if substantial
                 all_content.append(extracted)
         
@@ -261,7 +424,10 @@ class ObfuscatedContentParser:
             # Fallback: extract all text from body, excluding scripts/styles
             body = soup.find('body')
             if body:
-                fallback_content = self.clean_html_content(str(body))
+                if self.fast_path:
+                    fallback_content = self.clean_element_text(body)
+                else:
+                    fallback_content = self.clean_html_content(str(body))
                 if len(fallback_content) > 50:
                     all_content.append(fallback_content)
         
@@ -288,29 +454,52 @@ class ObfuscatedContentParser:
     def parse_html_file(self, file_path: str) -> Dict[str, any]:
         """Parse a single HTML file and extract content"""
         try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                html_content = f.read()
-            
-            # Check if content is from 2024+
-            if not self.is_2024_plus_content(html_content, file_path):
-                logger.info(f"Skipping {file_path} - not 2024+ content")
-                return None
-            
-            soup = BeautifulSoup(html_content, 'html.parser')
-            
-            result = {
-                'file_path': file_path,
-                'file_size': os.path.getsize(file_path),
-                'metadata': self.extract_article_metadata(soup),
-                'content': self.extract_article_content(soup),
-                'javascript_vars': self.extract_javascript_variables(html_content),
-                'base64_content': [],
-                'processing_timestamp': datetime.now().isoformat()
-            }
+            return self.extract_file_record(file_path)
             
-            # Extract and decode base64 content
+        except Exception as e:
+            logger.error(f"Error parsing {file_path}: {e}")
+            return None
+    
+    def extract_file_record(self, file_path: str) -> Optional[Dict]:
+        """parse_html_file without the error handling: None only for files that are not 2024+
+        
+        Parse errors propagate, so the parse cache never stores them and the file is
+        retried on the next run.
+        """
+        # Read the file only if content is from 2024+
+        if self.fast_path:
+            data = self.read_2024_plus_bytes(file_path)
+            html_content = None if data is None else self.decode_html_bytes(data)
+        else:
+            html_content = self.read_2024_plus_file(file_path)
+        if html_content is None:
+            logger.info(f"Skipping {file_path} - not 2024+ content")
+            return None
+        
+        soup = BeautifulSoup(html_content, self.html_parser)
+        
+        if self.fast_path:
+            encoded_blocks = self.scan_encoded_blocks(data)
+            content = self.extract_article_content(soup, encoded_blocks=encoded_blocks)
+        else:
+            content = self.extract_article_content(soup)
+        
+        result = {
+            'file_path': file_path,
+            'file_size': os.path.getsize(file_path),
+            'metadata': self.extract_article_metadata(soup),
+            'content': content,
+            'javascript_vars': self.extract_javascript_variables(html_content),
+            'base64_content': [],
+            'processing_timestamp': datetime.now().isoformat()
+        }
+        
+        # Extract and decode base64 content
+        if self.fast_path:
+            result['base64_content'] = encoded_blocks.data_uri_samples
+        else:
             base64_matches = self.content_patterns['base64_content'].findall(html_content)
-            for match in base64_matches[:10]:  # Limit to first 10 matches
+            for match in base64_matches[:self.MAX_DATA_URI_SAMPLES]:
                 decoded = self.decode_base64_content(match)
                 if decoded and not decoded.startswith('[BINARY_DATA:'):
                     result['base64_content'].append({
@@ -318,15 +507,11 @@ class ObfuscatedContentParser:
                         'decoded_content': decoded[:1000],  # Limit length
                         'is_text': True
                     })
-            
-            # Update brand references
-            result = self.update_brand_references(result)
-            
-            return result
-            
-        except Exception as e:
-            logger.error(f"Error parsing {file_path}: {e}")
-            return None
+        
+        # Update brand references
+        result = self.update_brand_references(result)
+        
+        return result
     
     def update_brand_references(self, content_data: Dict) -> Dict:
         """Update DailyForex references to BrokerAnalysis"""
@@ -370,13 +555,141 @@ class ObfuscatedContentParser:
         
         for file_path in html_files:
             logger.info(f"Processing: {file_path}")
-            result = self.parse_html_file(str(file_path))
+            if self.parse_cache is None:
+                result = self.parse_html_file(str(file_path))
+            else:
+                try:
+                    result = self.parse_cache.get_or_parse(self.cache_name, self.parser_version,
+                                                           str(file_path), self.extract_file_record)
+                except Exception as e:
+                    logger.error(f"Error parsing {file_path}: {e}")
+                    result = None
             if result:
                 results.append(result)
         
         logger.info(f"Successfully processed {len(results)} files")
         return results
     
+    def completed_output_files(self, output_file: str) -> Set[str]:
+        """file_path of every complete record already in a JSON Lines output
+        
+        A partial last line left by an interrupted run is cut off, so appended
+        records start on a fresh line.
+        """
+        completed = set()
+        if not os.path.exists(output_file):
+            return completed
+        
+        complete_bytes = 0
+        with open(output_file, 'r+b') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                completed.add(json.loads(line)['file_path'])
+                complete_bytes += len(line)
+            f.truncate(complete_bytes)
+        return completed
+    
+    def process_directory_parallel(self, directory_path: str = None, 
+                                   output_file: str = "parsed_content.jsonl",
+                                   max_workers: Optional[int] = None,
+                                   progress_every: int = 500, append: bool = False) -> Dict:
+        """Parse all HTML files across a process pool, streaming results to JSON Lines
+        
+        Files are discovered lazily and at most a few tasks per worker are in flight,
+        so memory stays flat however large the mirror is. Each parsed file is
+        written to ``output_file`` as soon as its worker finishes. With a parse
+        cache, unchanged files are looked up here and never sent to a worker.
+        
+        ``output_file`` is overwritten unless ``append`` is set, which resumes an
+        earlier run: files that already have a record in it are not parsed again.
+        """
+        if directory_path is None:
+            directory_path = self.base_directory
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+        max_pending = max_workers * 4
+        
+        completed = self.completed_output_files(output_file) if append else set()
+        
+        stats = {'files': 0, 'parsed': 0, 'skipped': 0, 'bytes': 0, 'cached': 0, 'resumed': 0}
+        start_time = time.time()
+        cache = self.parse_cache
+        cache_states = {}
+        future_paths = {}
+        
+        def record(result):
+            stats['files'] += 1
+            if result is None:
+                # Not 2024+ content, or a parse error (logged by finish)
+                stats['skipped'] += 1
+            else:
+                stats['parsed'] += 1
+                stats['bytes'] += result['file_size']
+                output.write(json.dumps(result, ensure_ascii=False) + '\n')
+            
+            if stats['files'] % progress_every == 0:
+                elapsed = time.time() - start_time
+                logger.info(f"Progress: {stats['files']} files ({stats['parsed']} parsed), "
+                            f"{stats['files'] / elapsed:.1f} files/s")
+        
+        with open(output_file, 'a' if append else 'w', encoding='utf-8') as output, \
+                ProcessPoolExecutor(max_workers=max_workers, initializer=init_parse_worker,
+                                    initargs=(str(self.base_directory), self.fast_path)) as pool:
+            def finish(future):
+                file_path = future_paths.pop(future)
+                state = cache_states.pop(future, None)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # Failures are not cached, so the file is parsed again next run
+                    logger.error(f"Error parsing {file_path}: {e}")
+                    record(None)
+                    return
+                if cache is not None:
+                    cache.store(self.cache_name, self.parser_version, state, result)
+                record(result)
+            
+            pending = set()
+            for file_path in Path(directory_path).rglob('*.html'):
+                if str(file_path) in completed:
+                    stats['resumed'] += 1
+                    continue
+                
+                if cache is not None:
+                    hit, result, state = cache.lookup(self.cache_name, self.parser_version,
+                                                      str(file_path))
+                    if hit:
+                        stats['cached'] += 1
+                        record(result)
+                        continue
+                
+                future = pool.submit(parse_file_in_worker, str(file_path))
+                future_paths[future] = file_path
+                if cache is not None:
+                    cache_states[future] = state
+                pending.add(future)
+                if len(pending) >= max_pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        finish(future)
+            
+            for future in wait(pending).done:
+                finish(future)
+        
+        elapsed = time.time() - start_time
+        summary = {
+            **stats,
+            'workers': max_workers,
+            'output_file': output_file,
+            'elapsed_seconds': elapsed,
+            'files_per_second': stats['files'] / max(elapsed, 1e-9),
+            'mb_per_second': stats['bytes'] / 1e6 / max(elapsed, 1e-9)
+        }
+        logger.info(f"Parsed {stats['parsed']} of {stats['files']} files in {elapsed:.1f}s "
+                    f"({summary['files_per_second']:.1f} files/s, {max_workers} workers)")
+        return summary
+    
     def save_results(self, results: List[Dict], output_file: str = "parsed_content.json"):
         """Save parsing results to JSON file"""
         try:
@@ -386,17 +699,100 @@ class ObfuscatedContentParser:
         except Exception as e:
             logger.error(f"Error saving results: {e}")
 
+def pad_base64(chunk: memoryview):
+    """Base64 chunk with any missing '=' padding added (copied only when padding is needed)"""
+    missing_padding = len(chunk) % 4
+    return chunk if not missing_padding else chunk.tobytes() + b'=' * (4 - missing_padding)
+
+# Per-process parser used by process-pool workers (see init_parse_worker)
+_worker_parser: Optional[ObfuscatedContentParser] = None
+
+def init_parse_worker(base_directory: str, fast_path: bool = True):
+    """Process-pool initializer: build the parser (and its compiled patterns) once per worker"""
+    global _worker_parser
+    _worker_parser = ObfuscatedContentParser(base_directory, fast_path=fast_path)
+
+def parse_file_in_worker(file_path: str) -> Optional[Dict]:
+    """Parse one file on the worker's parser (errors are raised to the caller's future)"""
+    return _worker_parser.extract_file_record(file_path)
+
+def benchmark_parsing(directory_path: str, max_files: Optional[int] = None) -> Dict:
+    """Files per second for the original and fast parse paths over a sample directory
+    
+    Also counts files whose extracted metadata or body differs between the two paths.
+    """
+    files = sorted(str(path) for path in Path(directory_path).rglob('*.html'))[:max_files]
+    report = {'files': len(files), 'fast_html_parser': FAST_HTML_PARSER}
+    outputs = {}
+    
+    # Per-file skip messages would dominate the timing
+    previous_level = logger.level
+    logger.setLevel(logging.WARNING)
+    try:
+        for label, fast_path in (('before', False), ('after', True)):
+            parser = ObfuscatedContentParser(directory_path, fast_path=fast_path)
+            start_time = time.time()
+            outputs[label] = [parser.parse_html_file(file_path) for file_path in files]
+            elapsed = time.time() - start_time
+            report[f'{label}_seconds'] = elapsed
+            report[f'{label}_files_per_second'] = len(files) / max(elapsed, 1e-9)
+    finally:
+        logger.setLevel(previous_level)
+    
+    def summary(result):
+        if result is None:
+            return None
+        return result['metadata'], ' '.join(result['content']['body'].split())
+    
+    report['speedup'] = report['before_seconds'] / max(report['after_seconds'], 1e-9)
+    report['differing_files'] = sum(
+        1 for before, after in zip(outputs['before'], outputs['after']) if summary(before) != summary(after)
+    )
+    return report
+
 def main():
     """Main function for testing the parser"""
-    import sys
-    
     base_dir = "C:\\Users\\LENOVO\\Desktop\\BrokeranalysisDaily\\daily forex"
-    parser = ObfuscatedContentParser(base_dir)
+    
+    arg_parser = argparse.ArgumentParser(description='Parse obfuscated DailyForex HTML files')
+    arg_parser.add_argument('files', nargs='*', help='HTML files to parse (default: sample files)')
+    arg_parser.add_argument('--directory', help='Parse every HTML file under this directory in parallel')
+    arg_parser.add_argument('--output', default='parsed_content.jsonl', help='JSON Lines output for --directory')
+    arg_parser.add_argument('--append', action='store_true', 
+                            help='Resume into an existing --output, skipping files it already holds (default: overwrite it)')
+    arg_parser.add_argument('--workers', type=int, help='Parser processes (default: CPU count)')
+    arg_parser.add_argument('--no-fast-path', action='store_true', help='Use the original full-read, html.parser path')
+    arg_parser.add_argument('--benchmark', metavar='DIR', help='Compare files/s of the original and fast paths on DIR')
+    arg_parser.add_argument('--max-files', type=int, help='Files to use for --benchmark')
+    arg_parser.add_argument('--parse-cache', help='SQLite parse cache for --directory; unchanged files are not re-parsed')
+    args = arg_parser.parse_args()
+    
+    if args.benchmark:
+        print(json.dumps(benchmark_parsing(args.benchmark, args.max_files), indent=2))
+        return
+    
+    parse_cache = ParseCache(args.parse_cache) if args.parse_cache and args.directory else None
+    parser = ObfuscatedContentParser(base_dir, fast_path=not args.no_fast_path, parse_cache=parse_cache)
+    
+    if args.directory:
+        try:
+            summary = parser.process_directory_parallel(args.directory, args.output, max_workers=args.workers,
+                                                        append=args.append)
+        finally:
+            if parse_cache:
+                parse_cache.close()
+        print(f"\nProcessed {summary['files']} files in {summary['elapsed_seconds']:.1f}s "
+              f"with {summary['workers']} workers:")
+        print(f"  Parsed: {summary['parsed']}  Skipped: {summary['skipped']}  From cache: {summary['cached']}  "
+              f"Already in output: {summary['resumed']}")
+        print(f"  Throughput: {summary['files_per_second']:.1f} files/s, {summary['mb_per_second']:.2f} MB/s")
+        print(f"  Output: {summary['output_file']}")
+        return
     
     # Check if command line arguments are provided
-    if len(sys.argv) > 1:
+    if args.files:
         # Use command line arguments as file paths
-        sample_files = sys.argv[1:]
+        sample_files = args.files
     else:
         # Use default sample files
         sample_files = [
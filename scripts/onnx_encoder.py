@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Quantised ONNX Runtime Encoder for Brokeranalysis Platform
+Runs a sentence-transformers model (all-MiniLM-L6-v2 by default) through an
+exported, int8 dynamically quantised ONNX graph on CPU.
+
+OnnxSentenceEncoder implements the part of the SentenceTransformer API the
+embedding scripts use (encode, get_sentence_embedding_dimension, tokenizer,
+max_seq_length), so it can be selected with backend='onnx'. The graph is exported
+and quantised on first use and reused from ONNX_MODEL_DIR afterwards.
+"""
+
+import os
+import json
+import time
+import logging
+import argparse
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_BACKENDS = ('torch', 'onnx')
+DEFAULT_ONNX_DIR = './models/onnx'
+
+FP32_MODEL_FILE = 'model.onnx'
+QUANTIZED_MODEL_FILE = 'model.int8.onnx'
+ENCODER_CONFIG_FILE = 'encoder_config.json'
+
+PARITY_SAMPLE_TEXTS = [
+    "Brokeranalysis compares regulated forex brokers by spreads, fees and platforms.",
+    "The minimum deposit is $100 and accounts support MetaTrader 4 and MetaTrader 5.",
+    "Leverage of up to 1:30 is available to retail clients under ESMA rules.",
+    "Withdrawals are processed within one business day to bank cards and e-wallets.",
+    "The EUR/USD pair rallied after the central bank left interest rates unchanged.",
+    "Negative balance protection keeps client losses limited to the funds deposited.",
+]
+
+def backend_model_key(model_name: str, backend: str) -> str:
+    """Model name used in cache keys and content hashes for a backend
+
+    Quantised vectors differ slightly from full precision ones, so they are never
+    served from, or stored under, the PyTorch model's name.
+    """
+    return model_name if backend == 'torch' else f"{model_name}#onnx-int8"
+
+def onnx_model_dir(model_name: str, model_dir: Optional[str] = None) -> Path:
+    """Directory holding the exported graph, tokenizer and pooling config for a model"""
+    root = Path(model_dir or os.getenv('ONNX_MODEL_DIR', DEFAULT_ONNX_DIR))
+    return root / model_name.replace('/', '__')
+
+def export_onnx_model(model_name: str, output_dir: Path, quantize: bool = True,
+                      opset_version: int = 14) -> Path:
+    """Export a sentence-transformers model to ONNX, optionally int8 quantised
+
+    Only the transformer runs in the graph; pooling and normalisation settings
+    are read from the sentence-transformers pipeline and applied in numpy.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    fp32_path = output_dir / FP32_MODEL_FILE
+
+    logger.info(f"Exporting {model_name} to ONNX in {output_dir}")
+    model = SentenceTransformer(model_name, device='cpu')
+    transformer, pooling = model[0], model[1]
+
+    transformer.tokenizer.save_pretrained(str(output_dir))
+
+    if pooling.pooling_mode_cls_token:
+        pooling_mode = 'cls'
+    elif pooling.pooling_mode_max_tokens:
+        pooling_mode = 'max'
+    else:
+        pooling_mode = 'mean'
+
+    config = {
+        'model_name': model_name,
+        'pooling': pooling_mode,
+        'normalize': any(type(module).__name__ == 'Normalize' for module in model),
+        'max_seq_length': model.max_seq_length,
+        'dimension': model.get_sentence_embedding_dimension()
+    }
+    with open(output_dir / ENCODER_CONFIG_FILE, 'w') as f:
+        json.dump(config, f, indent=2)
+
+    sample = transformer.tokenizer(PARITY_SAMPLE_TEXTS[:2], padding=True, return_tensors='pt')
+    input_names = [name for name in ('input_ids', 'attention_mask', 'token_type_ids') if name in sample]
+    dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in input_names}
+    dynamic_axes['last_hidden_state'] = {0: 'batch', 1: 'sequence'}
+
+    auto_model = transformer.auto_model.eval()
+    with torch.no_grad():
+        torch.onnx.export(
+            auto_model,
+            tuple(sample[name] for name in input_names),
+            str(fp32_path),
+            input_names=input_names,
+            output_names=['last_hidden_state'],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset_version,
+            do_constant_folding=True
+        )
+
+    if not quantize:
+        return fp32_path
+
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantized_path = output_dir / QUANTIZED_MODEL_FILE
+    quantize_dynamic(str(fp32_path), str(quantized_path), weight_type=QuantType.QInt8)
+
+    logger.info(f"Quantised model written to {quantized_path} "
+                f"({fp32_path.stat().st_size / 1e6:.1f}MB -> {quantized_path.stat().st_size / 1e6:.1f}MB)")
+    return quantized_path
+
+class OnnxSentenceEncoder:
+    """Sentence encoder backed by an ONNX Runtime CPU session"""
+
+    def __init__(self, model_name: str = 'all-MiniLM-L6-v2', model_dir: Optional[str] = None,
+                 quantized: bool = True, num_threads: Optional[int] = None):
+        try:
+            import onnxruntime as ort
+            from transformers import AutoTokenizer
+        except ImportError:
+            raise ImportError("The onnx backend needs onnxruntime and transformers: "
+                              "pip install onnxruntime onnx transformers")
+
+        self.model_name = model_name
+        self.model_dir = onnx_model_dir(model_name, model_dir)
+        self.model_path = self.model_dir / (QUANTIZED_MODEL_FILE if quantized else FP32_MODEL_FILE)
+
+        if not self.model_path.exists():
+            export_onnx_model(model_name, self.model_dir, quantize=quantized)
+
+        with open(self.model_dir / ENCODER_CONFIG_FILE) as f:
+            self.config = json.load(f)
+        self.max_seq_length = self.config['max_seq_length']
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+
+        self.session = ort.InferenceSession(str(self.model_path), options,
+                                            providers=['CPUExecutionProvider'])
+        self.input_names = [graph_input.name for graph_input in self.session.get_inputs()]
+        self.tokenizer = AutoTokenizer.from_pretrained(str(self.model_dir))
+
+        logger.info(f"Loaded ONNX encoder {self.model_path}")
+
+    def get_sentence_embedding_dimension(self) -> int:
+        """Embedding dimension of the exported model"""
+        return self.config['dimension']
+
+    def encode_batch(self, texts: List[str]) -> np.ndarray:
+        """Run one padded batch through the graph and pool token states"""
+        features = self.tokenizer(texts, padding=True, truncation=True,
+                                  max_length=self.max_seq_length, return_tensors='np')
+        attention_mask = features['attention_mask']
+
+        feeds = {}
+        for name in self.input_names:
+            values = features[name] if name in features else np.zeros_like(attention_mask)
+            feeds[name] = values.astype(np.int64)
+
+        token_states = self.session.run(['last_hidden_state'], feeds)[0]
+        mask = attention_mask[..., None].astype(np.float32)
+
+        if self.config['pooling'] == 'cls':
+            embeddings = token_states[:, 0]
+        elif self.config['pooling'] == 'max':
+            embeddings = np.where(mask > 0, token_states, -1e9).max(axis=1)
+        else:
+            embeddings = (token_states * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+        return embeddings.astype(np.float32)
+
+    def encode(self, sentences: Union[str, Sequence[str]], batch_size: int = 32,
+               show_progress_bar: bool = False, convert_to_numpy: bool = True,
+               normalize_embeddings: bool = False, **kwargs) -> np.ndarray:
+        """Encode texts like SentenceTransformer.encode, returning a numpy array"""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+
+        embeddings = np.empty((len(texts), self.get_sentence_embedding_dimension()), dtype=np.float32)
+
+        # Longest first, so each batch pads to similar lengths
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            embeddings[batch] = self.encode_batch([texts[i] for i in batch])
+
+        if self.config['normalize'] or normalize_embeddings:
+            embeddings /= np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+
+        return embeddings[0] if single else embeddings
+
+def load_sentence_encoder(model_name: str, backend: str = 'torch', device: Optional[str] = None,
+                          model_dir: Optional[str] = None, num_threads: Optional[int] = None):
+    """Load a SentenceTransformer or its quantised ONNX equivalent"""
+    if backend == 'onnx':
+        return OnnxSentenceEncoder(model_name, model_dir=model_dir, num_threads=num_threads)
+    if backend != 'torch':
+        raise ValueError(f"Unknown embedding backend {backend!r}; expected one of {EMBEDDING_BACKENDS}")
+
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        raise ImportError("The torch backend needs sentence-transformers: pip install sentence-transformers")
+    return SentenceTransformer(model_name, device=device)
+
+def parity_check(model_name: str = 'all-MiniLM-L6-v2', texts: Optional[List[str]] = None,
+                 model_dir: Optional[str] = None, quantized: bool = True,
+                 batch_size: int = 32) -> Dict:
+    """Compare ONNX vectors against the PyTorch model's by cosine similarity"""
+    from sentence_transformers import SentenceTransformer
+
+    texts = texts or PARITY_SAMPLE_TEXTS
+    torch_model = SentenceTransformer(model_name, device='cpu')
+    onnx_model = OnnxSentenceEncoder(model_name, model_dir=model_dir, quantized=quantized)
+
+    start_time = time.time()
+    reference = torch_model.encode(texts, batch_size=batch_size, convert_to_numpy=True)
+    torch_seconds = time.time() - start_time
+
+    start_time = time.time()
+    candidate = onnx_model.encode(texts, batch_size=batch_size)
+    onnx_seconds = time.time() - start_time
+
+    reference = reference / np.clip(np.linalg.norm(reference, axis=1, keepdims=True), 1e-12, None)
+    candidate = candidate / np.clip(np.linalg.norm(candidate, axis=1, keepdims=True), 1e-12, None)
+    cosine = (reference * candidate).sum(axis=1)
+
+    return {
+        'model_name': model_name,
+        'onnx_model': str(onnx_model.model_path),
+        'quantized': quantized,
+        'texts': len(texts),
+        'mean_cosine': float(cosine.mean()),
+        'min_cosine': float(cosine.min()),
+        'torch_seconds': torch_seconds,
+        'onnx_seconds': onnx_seconds,
+        'speedup': torch_seconds / max(onnx_seconds, 1e-9)
+    }
+
+def main():
+    """Export the ONNX model and report parity with the PyTorch model"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description='Export and check the quantised ONNX embedding model')
+    parser.add_argument('--model-name', default='all-MiniLM-L6-v2', help='Sentence transformer model name')
+    parser.add_argument('--model-dir', help=f'Directory for exported models (default: ONNX_MODEL_DIR or {DEFAULT_ONNX_DIR})')
+    parser.add_argument('--no-quantize', action='store_true', help='Use the full precision ONNX graph')
+    parser.add_argument('--input-file', help='JSON file of content chunks to use as parity texts')
+    parser.add_argument('--sample-size', type=int, default=500, help='Chunks to sample from --input-file')
+    parser.add_argument('--min-cosine', type=float, default=0.98, help='Fail when any vector falls below this')
+
+    args = parser.parse_args()
+
+    texts = None
+    if args.input_file:
+        with open(args.input_file, 'r', encoding='utf-8') as f:
+            texts = [chunk['content'] for chunk in json.load(f)[:args.sample_size]]
+
+    report = parity_check(args.model_name, texts, model_dir=args.model_dir, quantized=not args.no_quantize)
+    print(json.dumps(report, indent=2))
+
+    if report['min_cosine'] < args.min_cosine:
+        logger.error(f"ONNX parity below {args.min_cosine}: min cosine {report['min_cosine']:.4f}")
+        raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
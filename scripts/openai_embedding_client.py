@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Batched OpenAI Embedding Client for Brokeranalysis Platform
+Sends many inputs per embeddings request and keeps a bounded number of requests
+in flight, instead of one request (and one round trip) per chunk.
+
+- Inputs are packed into requests by count and by token total.
+- An asyncio.Semaphore caps concurrent requests.
+- A tokens-per-minute budget holds requests back before the API has to reject them.
+- 429 and transient server/connection errors are retried with exponential
+  backoff, honouring the Retry-After headers when the API sends them.
+
+OPENAI_BASE_URL points the client at a compatible endpoint, e.g. the mock server
+started with ``python openai_embedding_client.py --mock-server``.
+"""
+
+import os
+import json
+import time
+import random
+import asyncio
+import hashlib
+import logging
+import argparse
+import threading
+from email.utils import parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence
+
+import tiktoken
+
+logger = logging.getLogger(__name__)
+
+# API limits for text-embedding-3-*: 2048 inputs and 300k tokens per request, 8191 tokens per input
+MAX_INPUT_TOKENS = 8191
+
+class TokenBudget:
+    """Tokens-per-minute budget refilled continuously, shared by concurrent requests"""
+
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = tokens_per_minute
+        self.available = float(tokens_per_minute)
+        self.rate = tokens_per_minute / 60.0
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self, tokens: int):
+        """Wait until ``tokens`` fit in the budget, then spend them"""
+        # A request larger than the whole budget would otherwise wait forever
+        tokens = min(tokens, self.capacity)
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.available >= tokens:
+                    self.available -= tokens
+                    return
+                await asyncio.sleep((tokens - self.available) / self.rate)
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Delay requested by a rate-limit response's retry-after-ms / Retry-After header"""
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+
+    if headers.get('retry-after-ms'):
+        try:
+            return float(headers['retry-after-ms']) / 1000
+        except ValueError:
+            pass
+
+    retry_after = headers.get('retry-after')
+    if not retry_after:
+        return None
+    try:
+        return float(retry_after)
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+class OpenAIEmbeddingClient:
+    """Concurrent, batched client for the OpenAI embeddings endpoint"""
+
+    def __init__(self, model: str = 'text-embedding-3-small', api_key: Optional[str] = None,
+                 base_url: Optional[str] = None, max_inputs_per_request: int = 512,
+                 max_tokens_per_request: int = 100_000, max_concurrency: int = 4,
+                 tokens_per_minute: Optional[int] = None, max_retries: int = 6,
+                 initial_backoff: float = 1.0, max_backoff: float = 60.0):
+        try:
+            import openai
+        except ImportError:
+            raise ImportError("Please install openai>=1.0: pip install openai")
+
+        self.openai = openai
+        # Retries are handled here, where they can share the semaphore and token budget
+        self.client = openai.AsyncOpenAI(
+            api_key=api_key or os.getenv('OPENAI_API_KEY'),
+            base_url=base_url or os.getenv('OPENAI_BASE_URL') or None,
+            max_retries=0
+        )
+        self.model = model
+        self.max_inputs_per_request = max_inputs_per_request
+        self.max_tokens_per_request = max_tokens_per_request
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+
+        self.encoding = tiktoken.get_encoding("cl100k_base")
+        self.budget = TokenBudget(tokens_per_minute) if tokens_per_minute else None
+        # Created lazily so it binds to the running event loop
+        self.semaphore: Optional[asyncio.Semaphore] = None
+
+        # Statistics tracking
+        self.requests = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.inputs_embedded = 0
+        self.tokens_embedded = 0
+
+    def prepare_input(self, text: str):
+        """Text cut to the per-input token limit, with its token count"""
+        tokens = self.encoding.encode(text)
+        if len(tokens) <= MAX_INPUT_TOKENS:
+            return text, len(tokens)
+        return self.encoding.decode(tokens[:MAX_INPUT_TOKENS]), MAX_INPUT_TOKENS
+
+    def plan_requests(self, token_counts: Sequence[int]) -> List[range]:
+        """Split input positions into consecutive request ranges within the count/token limits"""
+        requests = []
+        start = tokens = 0
+        for i, count in enumerate(token_counts):
+            if i > start and (i - start >= self.max_inputs_per_request or
+                              tokens + count > self.max_tokens_per_request):
+                requests.append(range(start, i))
+                start, tokens = i, 0
+            tokens += count
+        if start < len(token_counts):
+            requests.append(range(start, len(token_counts)))
+        return requests
+
+    def backoff_seconds(self, attempt: int) -> float:
+        """Exponential backoff with jitter"""
+        return min(self.max_backoff, self.initial_backoff * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+    async def request_embeddings(self, inputs: List[str], tokens: int) -> List[List[float]]:
+        """Send one embeddings request, retrying rate limits and transient failures"""
+        transient = (self.openai.APIConnectionError, self.openai.APITimeoutError,
+                     self.openai.InternalServerError)
+
+        async with self.semaphore:
+            for attempt in range(self.max_retries + 1):
+                if self.budget is not None:
+                    await self.budget.acquire(tokens)
+                try:
+                    self.requests += 1
+                    response = await self.client.embeddings.create(model=self.model, input=inputs)
+                    self.inputs_embedded += len(inputs)
+                    self.tokens_embedded += tokens
+                    return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+                except self.openai.RateLimitError as e:
+                    if attempt == self.max_retries:
+                        raise
+                    self.rate_limited += 1
+                    retry_after = retry_after_seconds(e)
+                    # Jitter on top of Retry-After so throttled requests do not all return at once
+                    delay = (self.backoff_seconds(attempt) if retry_after is None
+                             else retry_after + random.uniform(0, self.initial_backoff))
+                    logger.warning(f"Embeddings request rate limited, retrying in {delay:.1f}s")
+                except transient as e:
+                    if attempt == self.max_retries:
+                        raise
+                    delay = self.backoff_seconds(attempt)
+                    logger.warning(f"Embeddings request failed ({e}), retrying in {delay:.1f}s")
+                self.retries += 1
+                await asyncio.sleep(delay)
+
+    async def embed_texts(self, texts: Sequence[str]) -> List[List[float]]:
+        """Embed texts, returning one vector per text in input order"""
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        inputs, token_counts = zip(*(self.prepare_input(text) for text in texts)) if texts else ((), ())
+        requests = self.plan_requests(token_counts)
+
+        batches = await asyncio.gather(*(
+            self.request_embeddings([inputs[i] for i in positions], sum(token_counts[i] for i in positions))
+            for positions in requests
+        ))
+        return [embedding for batch in batches for embedding in batch]
+
+    def get_stats(self) -> Dict:
+        """Get client statistics"""
+        return {
+            'model': self.model,
+            'requests': self.requests,
+            'retries': self.retries,
+            'rate_limited': self.rate_limited,
+            'inputs_embedded': self.inputs_embedded,
+            'tokens_embedded': self.tokens_embedded,
+            'max_concurrency': self.max_concurrency
+        }
+
+    async def close(self):
+        """Close the underlying HTTP client"""
+        await self.client.close()
+
+def mock_embedding(value, dimensions: int = 1536) -> List[float]:
+    """Deterministic vector the mock server returns for one input"""
+    seed = int.from_bytes(hashlib.sha256(json.dumps(value).encode()).digest()[:4], 'little')
+    generator = random.Random(seed)
+    return [generator.uniform(-1, 1) for _ in range(dimensions)]
+
+def mock_embeddings_server(port: int = 8089, dimensions: int = 1536, rate_limit_every: int = 0,
+                           latency: float = 0.05) -> ThreadingHTTPServer:
+    """Bind a deterministic /v1/embeddings endpoint for local testing (port 0: any free port)
+
+    Every ``rate_limit_every``-th request is answered with a 429 and Retry-After: 1.
+    The caller runs serve_forever() and shutdown().
+    """
+    request_count = 0
+    count_lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            nonlocal request_count
+            with count_lock:
+                request_count += 1
+                rate_limited = bool(rate_limit_every and request_count % rate_limit_every == 0)
+            body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            time.sleep(latency)
+
+            if rate_limited:
+                self.send_response(429)
+                self.send_header('Retry-After', '1')
+                self.send_header('Content-Type', 'application/json')
+                self.end_headers()
+                self.wfile.write(json.dumps({'error': {'message': 'Rate limit reached',
+                                                       'type': 'rate_limit_error'}}).encode())
+                return
+
+            inputs = body['input'] if isinstance(body['input'], list) else [body['input']]
+            data = [{'object': 'embedding', 'index': index, 'embedding': mock_embedding(value, dimensions)}
+                    for index, value in enumerate(inputs)]
+
+            payload = json.dumps({
+                'object': 'list', 'data': data, 'model': body.get('model'),
+                'usage': {'prompt_tokens': 0, 'total_tokens': 0}
+            }).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+    return ThreadingHTTPServer(('127.0.0.1', port), Handler)
+
+def serve_mock_embeddings(port: int = 8089, dimensions: int = 1536, rate_limit_every: int = 0,
+                          latency: float = 0.05):
+    """Serve mock_embeddings_server until interrupted"""
+    server = mock_embeddings_server(port, dimensions, rate_limit_every, latency)
+    logger.info(f"Mock embeddings server on http://127.0.0.1:{server.server_address[1]}/v1")
+    server.serve_forever()
+
+async def benchmark(texts: List[str], **client_options) -> Dict:
+    """Embed texts once and report throughput"""
+    client = OpenAIEmbeddingClient(**client_options)
+    start_time = time.time()
+    try:
+        embeddings = await client.embed_texts(texts)
+    finally:
+        await client.close()
+    elapsed = time.time() - start_time
+
+    return {
+        **client.get_stats(),
+        'texts': len(embeddings),
+        'seconds': elapsed,
+        'texts_per_second': len(embeddings) / max(elapsed, 1e-9)
+    }
+
+def main():
+    """Run the mock server, or embed a chunks file against OPENAI_BASE_URL"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description='Batched OpenAI embedding client')
+    parser.add_argument('--mock-server', action='store_true', help='Serve a local mock embeddings endpoint')
+    parser.add_argument('--port', type=int, default=8089, help='Mock server port')
+    parser.add_argument('--rate-limit-every', type=int, default=0, help='Mock server: answer every Nth request with 429')
+    parser.add_argument('--input-file', help='JSON file of content chunks to embed')
+    parser.add_argument('--base-url', help='API base URL (default: OPENAI_BASE_URL)')
+    parser.add_argument('--concurrency', type=int, default=4, help='Requests in flight')
+    parser.add_argument('--batch-inputs', type=int, default=512, help='Inputs per request')
+    parser.add_argument('--tokens-per-minute', type=int, help='Token budget per minute')
+
+    args = parser.parse_args()
+
+    if args.mock_server:
+        serve_mock_embeddings(args.port, rate_limit_every=args.rate_limit_every)
+        return
+
+    if not args.input_file:
+        parser.error('--input-file is required unless --mock-server is given')
+
+    with open(args.input_file, 'r', encoding='utf-8') as f:
+        texts = [chunk['content'] for chunk in json.load(f)]
+
+    report = asyncio.run(benchmark(
+        texts,
+        base_url=args.base_url,
+        max_concurrency=args.concurrency,
+        max_inputs_per_request=args.batch_inputs,
+        tokens_per_minute=args.tokens_per_minute
+    ))
+    print(json.dumps(report, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Incremental Parse Cache for Brokeranalysis Platform
+Stores the record each HTML parser extracted from a file, so a re-synced mirror
+only re-parses the pages that actually changed.
+
+Entries are keyed by (parser, path) and remember the file's size, mtime and
+SHA-256 plus the parser version they were produced by:
+
+- same version, size and mtime: served without reading the file
+- size or mtime changed but same SHA-256 (a re-sync rewrote an unchanged page):
+  served, and the new size/mtime recorded
+- anything else, or a different parser version: parsed again and replaced
+
+A parser's version is a hash of its source (see source_version), so editing the
+parser invalidates its entries; they are deleted the first time the new version
+is used.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+def file_sha256(file_path: str) -> str:
+    """SHA-256 of a file's bytes"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def source_version(*source_files: str, salt: str = '') -> str:
+    """Parser version derived from its source files (pass ``__file__``)
+
+    ``salt`` distinguishes modes of one parser that produce different records.
+    """
+    digest = hashlib.sha256(salt.encode('utf-8'))
+    for source_file in source_files:
+        digest.update(Path(source_file).read_bytes())
+    return digest.hexdigest()[:16]
+
+@dataclass
+class FileState:
+    """Identity of a file's contents at lookup time"""
+    path: str
+    size: int
+    mtime_ns: int
+    sha256: Optional[str] = None
+
+class ParseCache:
+    """On-disk cache of parsed records keyed by parser, path and file contents
+
+    Records must be JSON serialisable. ``None`` (a file the parser deliberately
+    skipped) is cached like any other record until the file or parser changes.
+    Parse errors must be raised rather than returned: get_or_parse only stores
+    records that parsed, so a failed file is parsed again on the next lookup.
+    """
+
+    # Writes are committed in batches; close() commits the rest
+    COMMIT_EVERY = 200
+
+    def __init__(self, cache_path: str = './cache/parse_cache.sqlite'):
+        self.cache_path = Path(cache_path)
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Directory scans may record results from a pool's callback thread
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.cache_path), check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS parsed_files (
+                parser TEXT NOT NULL,
+                path TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                sha256 TEXT NOT NULL,
+                version TEXT NOT NULL,
+                record TEXT NOT NULL,
+                parsed_at REAL NOT NULL,
+                PRIMARY KEY (parser, path)
+            ) WITHOUT ROWID
+        """)
+        self.conn.commit()
+
+        self.uncommitted = 0
+        # (parser, version) pairs whose older entries have already been purged
+        self.current_versions = set()
+
+        # Statistics tracking
+        self.hits = 0
+        self.rehashed_hits = 0
+        self.misses = 0
+        self.invalidated = 0
+
+        entries = self.conn.execute('SELECT COUNT(*) FROM parsed_files').fetchone()[0]
+        logger.info(f"Parse cache at {self.cache_path} ({entries} entries)")
+
+    def _commit(self, writes: int = 1):
+        self.uncommitted += writes
+        if self.uncommitted >= self.COMMIT_EVERY:
+            self.conn.commit()
+            self.uncommitted = 0
+
+    def purge_stale(self, parser: str, version: str) -> int:
+        """Delete a parser's entries produced by any other version"""
+        with self.lock:
+            deleted = self.conn.execute(
+                'DELETE FROM parsed_files WHERE parser = ? AND version != ?', (parser, version)
+            ).rowcount
+            self.conn.commit()
+            self.current_versions.add((parser, version))
+            self.invalidated += deleted
+
+        if deleted:
+            logger.info(f"Parse cache: dropped {deleted} {parser} entries from older parser versions")
+        return deleted
+
+    def lookup(self, parser: str, version: str, file_path: str) -> Tuple[bool, Any, FileState]:
+        """Return (hit, record, state); pass state to store() after parsing a miss
+
+        The file is only hashed when its size or mtime differ from the cached entry.
+        """
+        if (parser, version) not in self.current_versions:
+            self.purge_stale(parser, version)
+
+        path = os.path.abspath(file_path)
+        stat = os.stat(path)
+        state = FileState(path, stat.st_size, stat.st_mtime_ns)
+
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT size, mtime_ns, sha256, record FROM parsed_files '
+                'WHERE parser = ? AND path = ? AND version = ?',
+                (parser, path, version)
+            ).fetchone()
+
+        if row is not None and (row[0], row[1]) == (state.size, state.mtime_ns):
+            self.hits += 1
+            return True, json.loads(row[3]), state
+
+        state.sha256 = file_sha256(path)
+        if row is not None and row[2] == state.sha256:
+            with self.lock:
+                self.conn.execute(
+                    'UPDATE parsed_files SET size = ?, mtime_ns = ? WHERE parser = ? AND path = ?',
+                    (state.size, state.mtime_ns, parser, path)
+                )
+                self._commit()
+            self.rehashed_hits += 1
+            return True, json.loads(row[3]), state
+
+        self.misses += 1
+        return False, None, state
+
+    def store(self, parser: str, version: str, state: FileState, record: Any) -> None:
+        """Cache the record parsed from the file described by ``state``"""
+        if state.sha256 is None:
+            state.sha256 = file_sha256(state.path)
+
+        with self.lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO parsed_files '
+                '(parser, path, size, mtime_ns, sha256, version, record, parsed_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (parser, state.path, state.size, state.mtime_ns, state.sha256, version,
+                 json.dumps(record, ensure_ascii=False, default=str), time.time())
+            )
+            self._commit()
+
+    def get_or_parse(self, parser: str, version: str, file_path: str,
+                     parse: Callable[[str], Any]) -> Any:
+        """Cached record for file_path, calling ``parse(file_path)`` on a miss
+
+        An exception from ``parse`` propagates and nothing is stored.
+        """
+        hit, record, state = self.lookup(parser, version, file_path)
+        if hit:
+            return record
+        record = parse(file_path)
+        self.store(parser, version, state, record)
+        return record
+
+    def get_stats(self) -> Dict:
+        """Get cache statistics"""
+        lookups = self.hits + self.rehashed_hits + self.misses
+        return {
+            'cache_path': str(self.cache_path),
+            'cache_hits': self.hits,
+            'cache_rehashed_hits': self.rehashed_hits,
+            'cache_misses': self.misses,
+            'cache_hit_rate': (self.hits + self.rehashed_hits) / max(lookups, 1) * 100,
+            'cache_invalidated': self.invalidated
+        }
+
+    def close(self) -> None:
+        """Commit pending writes and close the SQLite connection"""
+        with self.lock:
+            self.conn.commit()
+            self.conn.close()
+
+def parse_with_cache(cache: Optional[ParseCache], parser: str, version: str, file_path,
+                     parse: Callable[[Any], Any]) -> Any:
+    """``parse(file_path)`` through the cache, or directly when cache is None"""
+    if cache is None:
+        return parse(file_path)
+    return cache.get_or_parse(parser, version, str(file_path), lambda _: parse(file_path))
+
+def open_parse_cache_from_env(default_path: Optional[str] = './cache/parse_cache.sqlite') -> Optional[ParseCache]:
+    """Open the cache configured by PARSE_CACHE_PATH (set it empty to disable)"""
+    cache_path = os.getenv('PARSE_CACHE_PATH', default_path)
+    if not cache_path:
+        return None
+    return ParseCache(cache_path)
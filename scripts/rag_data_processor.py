@@ -21,14 +21,19 @@ from dataclasses import dataclass
 # Add the project root to the Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import numpy as np
 import openai
 from supabase import create_client, Client
-from sentence_transformers import SentenceTransformer
 import tiktoken
 from bs4 import BeautifulSoup
 import requests
 from urllib.parse import urljoin, urlparse
 
+from embedding_cache import open_cache_from_env
+from openai_embedding_client import OpenAIEmbeddingClient
+from onnx_encoder import backend_model_key, load_sentence_encoder
+from token_overlap import overlap_text
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -67,15 +72,25 @@ class RAGDataProcessor:
         
         self.supabase: Client = create_client(self.supabase_url, self.supabase_key)
         
-        # Initialize OpenAI for embeddings
+        # Initialize OpenAI for embeddings: batched requests, bounded concurrency, 429 backoff
         openai.api_key = os.getenv('OPENAI_API_KEY')
         if not openai.api_key:
             raise ValueError("Missing OpenAI API key")
-        
-        # Initialize sentence transformer as fallback
+        tokens_per_minute = os.getenv('OPENAI_TOKENS_PER_MINUTE')
+        self.embedding_client = OpenAIEmbeddingClient(
+            model="text-embedding-3-small",
+            api_key=openai.api_key,
+            base_url=os.getenv('OPENAI_BASE_URL'),
+            max_concurrency=int(os.getenv('OPENAI_MAX_CONCURRENCY', '4')),
+            tokens_per_minute=int(tokens_per_minute) if tokens_per_minute else None
+        )
+        
+        # Initialize sentence transformer as fallback (EMBEDDING_BACKEND=onnx for the quantised CPU graph)
+        self.embedding_backend = os.getenv('EMBEDDING_BACKEND', 'torch')
+        self.sentence_model_key = backend_model_key('all-MiniLM-L6-v2', self.embedding_backend)
         try:
-            self.sentence_model = SentenceTransformer('all-MiniLM-L6-v2')
-            logger.info("Loaded sentence-transformers model")
+            self.sentence_model = load_sentence_encoder('all-MiniLM-L6-v2', self.embedding_backend)
+            logger.info(f"Loaded sentence-transformers model ({self.embedding_backend} backend)")
         except Exception as e:
             logger.warning(f"Failed to load sentence-transformers: {e}")
             self.sentence_model = None
@@ -83,10 +98,14 @@ class RAGDataProcessor:
         # Initialize tokenizer for chunk size calculation
         self.tokenizer = tiktoken.get_encoding("cl100k_base")
         
+        # Persistent vector cache (EMBEDDING_CACHE_PATH, empty to disable)
+        self.embedding_cache = open_cache_from_env()
+        
         # Configuration
         self.max_chunk_tokens = 300
         self.overlap_tokens = 50
-        self.batch_size = 100
+        self.batch_size = 100  # Rows per bulk insert
+        self.embedding_flush_size = 1000  # Chunks embedded together (many requests in flight)
     
     def count_tokens(self, text: str) -> int:
         """Count tokens in text using tiktoken."""
@@ -158,50 +177,83 @@ class RAGDataProcessor:
         return chunks
     
     def get_overlap_text(self, text: str, max_overlap_tokens: int) -> str:
-        """Get the last part of text for overlap, up to max_overlap_tokens."""
-        words = text.split()
-        overlap_text = ""
+        """Get the last part of text for overlap: exactly its last max_overlap_tokens tokens."""
+        return overlap_text(self.tokenizer, text, max_overlap_tokens).strip()
+    
+    async def generate_embeddings(self, texts: List[str], use_openai: bool = True) -> List[List[float]]:
+        """Generate embeddings for texts using OpenAI (batched) or sentence-transformers."""
+        embeddings: List[Optional[List[float]]] = [None] * len(texts)
+        
+        # Return zero vectors for empty text
+        pending = []
+        for i, text in enumerate(texts):
+            if text.strip():
+                pending.append(i)
+            else:
+                embeddings[i] = [0.0] * 1536
         
-        for i in range(len(words) - 1, -1, -1):
-            candidate = " ".join(words[i:])
-            if self.count_tokens(candidate) <= max_overlap_tokens:
-                overlap_text = candidate
-                break
+        model_name = "text-embedding-3-small" if use_openai else self.sentence_model_key
+        if self.embedding_cache is not None and pending:
+            cached = self.embedding_cache.get_many(model_name, [texts[i] for i in pending])
+            for i, vector in zip(pending, cached):
+                if vector is not None:
+                    embeddings[i] = self.fit_dimensions(vector) if not use_openai else vector.tolist()
+            pending = [i for i, vector in zip(pending, cached) if vector is None]
         
-        return overlap_text
-    
-    async def generate_embedding(self, text: str, use_openai: bool = True) -> List[float]:
-        """Generate embedding for text using OpenAI or sentence-transformers."""
-        if not text.strip():
-            return [0.0] * 1536  # Return zero vector for empty text
+        if not pending:
+            return embeddings
         
+        pending_texts = [texts[i] for i in pending]
         try:
             if use_openai:
                 # Use OpenAI text-embedding-3-small
-                response = await openai.Embedding.acreate(
-                    model="text-embedding-3-small",
-                    input=text
-                )
-                return response['data'][0]['embedding']
+                computed = await self.embedding_client.embed_texts(pending_texts)
+                if self.embedding_cache is not None:
+                    self.embedding_cache.put_many(model_name, pending_texts,
+                                                  [np.asarray(vector, dtype=np.float32) for vector in computed])
+                for i, vector in zip(pending, computed):
+                    embeddings[i] = vector
             else:
                 # Fallback to sentence-transformers
                 if self.sentence_model:
-                    embedding = self.sentence_model.encode(text)
-                    # Pad or truncate to 1536 dimensions to match OpenAI
-                    if len(embedding) < 1536:
-                        embedding = list(embedding) + [0.0] * (1536 - len(embedding))
-                    elif len(embedding) > 1536:
-                        embedding = embedding[:1536]
-                    return embedding.tolist()
+                    computed = self.sentence_model.encode(pending_texts, convert_to_numpy=True)
+                    # Cache the model's native vectors; padding is applied on the way out
+                    if self.embedding_cache is not None:
+                        self.embedding_cache.put_many(model_name, pending_texts, computed)
+                    for i, vector in zip(pending, computed):
+                        embeddings[i] = self.fit_dimensions(vector)
                 else:
                     raise Exception("No embedding model available")
         except Exception as e:
-            logger.error(f"Error generating embedding: {e}")
+            logger.error(f"Error generating embeddings: {e}")
             if use_openai and self.sentence_model:
                 # Fallback to sentence-transformers
-                return await self.generate_embedding(text, use_openai=False)
+                fallback = await self.generate_embeddings(pending_texts, use_openai=False)
+                for i, vector in zip(pending, fallback):
+                    embeddings[i] = vector
             else:
-                return [0.0] * 1536
+                for i in pending:
+                    embeddings[i] = [0.0] * 1536
+        
+        return embeddings
+    
+    async def generate_embedding(self, text: str, use_openai: bool = True) -> List[float]:
+        """Generate embedding for text using OpenAI or sentence-transformers."""
+        return (await self.generate_embeddings([text], use_openai))[0]
+    
+    def fit_dimensions(self, embedding: np.ndarray, dimensions: int = 1536) -> List[float]:
+        """Pad or truncate a sentence-transformers vector to match OpenAI's dimensions."""
+        embedding = np.asarray(embedding, dtype=np.float32)[:dimensions]
+        if len(embedding) < dimensions:
+            embedding = np.pad(embedding, (0, dimensions - len(embedding)))
+        return embedding.tolist()
+    
+    def get_processing_stats(self) -> Dict[str, Any]:
+        """Get embedding client and cache statistics."""
+        stats = {'backend': self.embedding_backend, 'openai': self.embedding_client.get_stats()}
+        if self.embedding_cache is None:
+            return {**stats, 'cache_enabled': False, 'cache_hits': 0, 'cache_misses': 0}
+        return {**stats, 'cache_enabled': True, **self.embedding_cache.get_stats()}
     
     async def process_articles(self) -> int:
         """Process articles from the database and create document chunks."""
@@ -215,6 +267,8 @@ class RAGDataProcessor:
             logger.info(f"Found {len(articles)} articles to process")
             
             processed_count = 0
+            pending_chunks: List[DocumentChunk] = []
+            pending_articles = 0
             
             for article in articles:
                 try:
@@ -247,16 +301,22 @@ class RAGDataProcessor:
                             }
                         )
                         
-                        await self.store_document_chunk(chunk)
+                        pending_chunks.append(chunk)
                     
-                    processed_count += 1
+                    pending_articles += 1
                     
-                    if processed_count % 10 == 0:
-                        logger.info(f"Processed {processed_count} articles")
-                        
                 except Exception as e:
                     logger.error(f"Error processing article {article.get('id')}: {e}")
                     continue
+                
+                # Embed and insert many articles' chunks together
+                if len(pending_chunks) >= self.embedding_flush_size:
+                    processed_count += await self.flush_article_chunks(pending_chunks, pending_articles)
+                    pending_chunks, pending_articles = [], 0
+                    logger.info(f"Processed {processed_count} articles")
+            
+            if pending_chunks:
+                processed_count += await self.flush_article_chunks(pending_chunks, pending_articles)
             
             logger.info(f"Completed processing {processed_count} articles")
             return processed_count
@@ -265,6 +325,36 @@ class RAGDataProcessor:
             logger.error(f"Error fetching articles: {e}")
             return 0
     
+    async def flush_article_chunks(self, chunks: List[DocumentChunk], article_count: int) -> int:
+        """Store buffered article chunks; returns the number of articles stored.
+        
+        The buffer is embedded and inserted together. If a bulk insert fails, the
+        rows not yet inserted are retried one article at a time, so a bad row only
+        loses its own article rather than the whole buffer.
+        """
+        try:
+            rows = await self.embed_document_rows(chunks)
+        except Exception as e:
+            logger.error(f"Error embedding chunks for {article_count} articles: {e}")
+            return 0
+        
+        inserted = await self.insert_document_rows(rows)
+        if inserted == len(rows):
+            return article_count
+        
+        remaining: Dict[Any, List[Dict[str, Any]]] = {}
+        for chunk, row in zip(chunks[inserted:], rows[inserted:]):
+            remaining.setdefault(chunk.parent_document_id, []).append(row)
+        
+        logger.warning(f"Bulk insert failed after {inserted}/{len(rows)} rows; "
+                       f"retrying {len(remaining)} articles individually")
+        failed = 0
+        for article_id, article_rows in remaining.items():
+            if await self.insert_document_rows(article_rows) < len(article_rows):
+                logger.error(f"Error storing chunks for article {article_id}")
+                failed += 1
+        return article_count - failed
+    
     async def process_brokers(self) -> int:
         """Process broker data and create embeddings."""
         logger.info("Processing brokers...")
@@ -278,22 +368,26 @@ class RAGDataProcessor:
             
             processed_count = 0
             
+            # Create comprehensive broker descriptions for embedding
+            described = []
             for broker in brokers:
+                broker_text = self.create_broker_description(broker)
+                if not broker_text:
+                    logger.warning(f"Skipping broker {broker['id']} - no content")
+                    continue
+                described.append((broker, broker_text))
+            
+            # Generate all embeddings in batched requests
+            embeddings = await self.generate_embeddings([broker_text for _, broker_text in described])
+            
+            for (broker, _), embedding in zip(described, embeddings):
                 try:
-                    # Create comprehensive broker description for embedding
-                    broker_text = self.create_broker_description(broker)
-                    
-                    if not broker_text:
-                        logger.warning(f"Skipping broker {broker['id']} - no content")
-                        continue
-                    
-                    # Generate embedding
-                    embedding = await self.generate_embedding(broker_text)
-                    
                     # Update broker with embedding
-                    self.supabase.table('brokers').update({
-                        'embedding': embedding
-                    }).eq('id', broker['id']).execute()
+                    await asyncio.to_thread(
+                        self.supabase.table('brokers').update({
+                            'embedding': embedding
+                        }).eq('id', broker['id']).execute
+                    )
                     
                     processed_count += 1
                     
@@ -377,30 +471,50 @@ class RAGDataProcessor:
         
         return ". ".join(parts)
     
+    def document_row(self, chunk: DocumentChunk, embedding: List[float]) -> Dict[str, Any]:
+        """Row for the documents table."""
+        return {
+            'title': chunk.title,
+            'content': chunk.content,
+            'url': chunk.url,
+            'category': chunk.category,
+            'author': chunk.author,
+            'broker_id': chunk.broker_id,
+            'source_type': chunk.source_type,
+            'chunk_index': chunk.chunk_index,
+            'parent_document_id': chunk.parent_document_id,
+            'embedding': embedding,
+            'metadata': chunk.metadata
+        }
+    
+    async def embed_document_rows(self, chunks: List[DocumentChunk]) -> List[Dict[str, Any]]:
+        """Embed document chunks in batched requests and build their rows."""
+        embeddings = await self.generate_embeddings([chunk.content for chunk in chunks])
+        return [self.document_row(chunk, embedding) for chunk, embedding in zip(chunks, embeddings)]
+    
+    async def insert_document_rows(self, rows: List[Dict[str, Any]]) -> int:
+        """Insert rows, batch_size per request; returns how many were inserted before a failure."""
+        for i in range(0, len(rows), self.batch_size):
+            try:
+                # The client is synchronous
+                await asyncio.to_thread(
+                    self.supabase.table('documents').insert(rows[i:i + self.batch_size]).execute
+                )
+            except Exception as e:
+                logger.error(f"Error inserting document rows {i}-{min(i + self.batch_size, len(rows))}: {e}")
+                return i
+        return len(rows)
+    
+    async def store_document_chunks(self, chunks: List[DocumentChunk]):
+        """Embed document chunks in batched requests and bulk-insert them."""
+        rows = await self.embed_document_rows(chunks)
+        inserted = await self.insert_document_rows(rows)
+        if inserted < len(rows):
+            raise RuntimeError(f"Stored {inserted} of {len(rows)} document chunks")
+    
     async def store_document_chunk(self, chunk: DocumentChunk):
         """Store a document chunk with its embedding in the database."""
-        try:
-            # Generate embedding for the chunk
-            embedding = await self.generate_embedding(chunk.content)
-            
-            # Insert into documents table
-            self.supabase.table('documents').insert({
-                'title': chunk.title,
-                'content': chunk.content,
-                'url': chunk.url,
-                'category': chunk.category,
-                'author': chunk.author,
-                'broker_id': chunk.broker_id,
-                'source_type': chunk.source_type,
-                'chunk_index': chunk.chunk_index,
-                'parent_document_id': chunk.parent_document_id,
-                'embedding': embedding,
-                'metadata': chunk.metadata
-            }).execute()
-            
-        except Exception as e:
-            logger.error(f"Error storing document chunk: {e}")
-            raise
+        await self.store_document_chunks([chunk])
     
     async def create_canonical_broker_mappings(self):
         """Create canonical broker name mappings."""
@@ -461,7 +575,8 @@ class RAGDataProcessor:
             return {
                 'articles_processed': articles_processed,
                 'brokers_processed': brokers_processed,
-                'duration_seconds': duration.total_seconds()
+                'duration_seconds': duration.total_seconds(),
+                'embedding_cache': self.get_processing_stats()
             }
             
         except Exception as e:
@@ -472,7 +587,10 @@ async def main():
     """Main function to run the RAG data processor."""
     try:
         processor = RAGDataProcessor()
-        result = await processor.run_full_pipeline()
+        try:
+            result = await processor.run_full_pipeline()
+        finally:
+            await processor.embedding_client.close()
         print(f"Processing completed: {result}")
     except Exception as e:
         logger.error(f"Failed to run RAG processor: {e}")
@@ -1,48 +1,28 @@
 import os
 import json
-from bs4 import BeautifulSoup
 import re
 from datetime import datetime
+from html_extraction import page_record, text_date
+from parse_cache import open_parse_cache_from_env
 
-def extract_article_from_html(file_path):
+def extract_article_from_html(file_path, parse_cache=None):
     """Extract article content from HTML file"""
     try:
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            content = f.read()
-        
-        soup = BeautifulSoup(content, 'html.parser')
+        # Page record shared with the other dataset scripts
+        record = page_record(file_path, parse_cache)
         
         # Extract title
-        title_tag = soup.find('title')
-        title = title_tag.get_text().strip() if title_tag else ''
+        title = record['metadata']['title']
         
         # Skip if it's a page listing or broker review
         if any(skip_word in title.lower() for skip_word in ['page ', 'review', 'broker']):
             return None
             
         # Extract meta description
-        desc_tag = soup.find('meta', {'name': 'description'})
-        description = desc_tag.get('content', '').strip() if desc_tag else ''
-        
-        # Look for article content in common containers
-        article_content = ''
-        content_selectors = [
-            'article',
-            '.article-content',
-            '.post-content', 
-            '.entry-content',
-            '.content',
-            'main'
-        ]
+        description = record['metadata']['description']
         
-        for selector in content_selectors:
-            content_elem = soup.select_one(selector)
-            if content_elem:
-                # Remove script and style elements
-                for script in content_elem(["script", "style"]):
-                    script.decompose()
-                article_content = content_elem.get_text().strip()
-                break
+        # Text of the first common article container (script/style text excluded)
+        article_content = record['article_text']
         
         # Check if this looks like an article (has substantial content)
         if len(article_content) < 200 or not title:
@@ -54,18 +34,7 @@ def extract_article_from_html(file_path):
             return None
             
         # Extract date if possible
-        date_patterns = [
-            r'(\d{1,2}[/-]\d{1,2}[/-]202[45])',
-            r'(202[45][/-]\d{1,2}[/-]\d{1,2})',
-            r'(\d{1,2}\s+(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\s+202[45])'
-        ]
-        
-        published_date = ''
-        for pattern in date_patterns:
-            match = re.search(pattern, full_text, re.IGNORECASE)
-            if match:
-                published_date = match.group(1)
-                break
+        published_date = text_date(full_text)
         
         return {
             'title': title.replace(' | DailyForex', '').replace(' | Broker Analysis', ''),
@@ -82,8 +51,11 @@ def extract_article_from_html(file_path):
         print(f"Error processing {file_path}: {e}")
         return None
 
-def scan_for_missing_articles():
-    """Scan HTML files for articles that might have been missed"""
+def scan_for_missing_articles(parse_cache=None):
+    """Scan HTML files for articles that might have been missed
+    
+    Files unchanged since the last run are served from ``parse_cache`` when one is given.
+    """
     base_dir = r"C:\Users\LENOVO\Desktop\BrokeranalysisDaily\daily forex\www.dailyforex.com"
     
     # Load existing migrated articles to avoid duplicates
@@ -109,7 +81,7 @@ def scan_for_missing_articles():
                 if processed_count % 100 == 0:
                     print(f"Processed {processed_count} files, found {len(new_articles)} new articles")
                 
-                article = extract_article_from_html(file_path)
+                article = extract_article_from_html(file_path, parse_cache)
                 if article:
                     # Check if this is a duplicate
                     if article['title'].lower() not in existing_articles:
@@ -135,4 +107,10 @@ def scan_for_missing_articles():
     return new_articles
 
 if __name__ == "__main__":
-    scan_for_missing_articles()
\ No newline at end of file
+    parse_cache = open_parse_cache_from_env()
+    try:
+        scan_for_missing_articles(parse_cache)
+    finally:
+        if parse_cache:
+            print(f"Parse cache: {parse_cache.get_stats()}")
+            parse_cache.close()
\ No newline at end of file
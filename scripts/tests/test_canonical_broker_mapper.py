@@ -0,0 +1,65 @@
+import json
+from dataclasses import asdict
+
+import pytest
+
+from canonical_broker_mapper import CanonicalBrokerMapper
+
+QUERIES = [
+    'IC Markets Ltd', 'ICMarkets Global', 'Pepperstone Group Limited', 'Peperstone',
+    'Interactive Brokers LLC', 'Interactve Brokers', 'OANDA Corp', 'Oanda Europe',
+    'XM Group', 'XM.com Trading', 'Completely Unknown Broker', 'Pepperstone Group Limited'
+]
+
+def default_mapper(tmp_path, **kwargs) -> CanonicalBrokerMapper:
+    """Mapper loaded from an entities file holding the default brokers"""
+    mapper = CanonicalBrokerMapper(**kwargs)
+    entities_file = tmp_path / 'entities.json'
+    entities_file.write_text(json.dumps([asdict(entity) for entity in mapper.create_default_entities()]))
+    mapper.load_broker_entities(str(entities_file))
+    return mapper
+
+def summary(results):
+    return [(result.matched_canonical_id, result.matched_canonical_name, round(result.similarity_score, 3))
+            if result else None for result in results]
+
+@pytest.mark.parametrize('max_candidates', [64, 0])
+def test_batch_path_scores_with_cdist(tmp_path, max_candidates):
+    mapper = default_mapper(tmp_path, max_candidates=max_candidates)
+    # The default brokers alone give more names than max_candidates
+    assert mapper.blocking_enabled() == (max_candidates > 0)
+
+    batch = mapper.find_fuzzy_matches_batch(QUERIES, workers=2)
+
+    distinct_queries = len({mapper.normalize_broker_name(name) for name in QUERIES})
+    assert 1 <= mapper.batch_cdist_calls < distinct_queries
+    assert summary(batch) == summary([mapper.find_fuzzy_match(name) for name in QUERIES])
+    assert any(batch) and batch[QUERIES.index('Completely Unknown Broker')] is None
+
+def test_candidate_blocks_bound_wasted_scoring(tmp_path):
+    mapper = default_mapper(tmp_path)
+    queries = list(dict.fromkeys(mapper.normalize_broker_name(name) for name in QUERIES * 20))
+    query_candidates = [mapper.candidate_indices(query) for query in queries]
+
+    blocks = mapper.candidate_blocks(query_candidates, max_block_cells=4_000_000, max_overscore=1.5)
+
+    assert sorted(i for block in blocks for i in block) == [i for i, ids in enumerate(query_candidates) if len(ids)]
+    for block in blocks:
+        union = set().union(*(query_candidates[i].tolist() for i in block))
+        own_cells = sum(len(query_candidates[i]) for i in block)
+        assert len(block) == 1 or len(block) * len(union) <= 1.5 * own_cells
+
+def test_repointed_names_invalidate_cached_matches(tmp_path):
+    mapper = default_mapper(tmp_path)
+    assert mapper.find_fuzzy_match('Peperstone').matched_canonical_id == 'pepperstone'
+
+    # Re-pointing keeps the name count, so only the mapping version reveals the change
+    name_count = len(mapper.name_to_canonical)
+    for name, canonical_id in list(mapper.name_to_canonical.items()):
+        if canonical_id == 'pepperstone':
+            mapper.add_name(name, 'ic_markets')
+    assert len(mapper.name_to_canonical) == name_count
+
+    assert mapper.find_fuzzy_match('Peperstone').matched_canonical_id == 'ic_markets'
+    assert mapper.find_fuzzy_matches_batch(['Peperstone'], workers=1)[0].matched_canonical_id == 'ic_markets'
+    assert mapper.match_broker_name('Peperstone').matched_canonical_name == 'IC Markets'
@@ -0,0 +1,97 @@
+import random
+import re
+
+import pytest
+
+pytest.importorskip('tiktoken')
+
+import content_chunker
+from content_chunker import ContentChunker, compare_overlap_modes
+
+class WordEncoding:
+    """Stand-in for a tiktoken encoding: one token per word or punctuation mark
+
+    Like tiktoken, the whitespace before a word belongs to the word's token.
+    """
+    TOKEN_PATTERN = re.compile(r'\s*\w+|\s*[^\w\s]|\s+')
+
+    def __init__(self):
+        self.vocab = {}
+        self.pieces = []
+
+    def encode(self, text):
+        tokens = []
+        for piece in self.TOKEN_PATTERN.findall(text):
+            if piece not in self.vocab:
+                self.vocab[piece] = len(self.pieces)
+                self.pieces.append(piece)
+            tokens.append(self.vocab[piece])
+        return tokens
+
+    def decode_with_offsets(self, tokens):
+        starts = []
+        offset = 0
+        for token in tokens:
+            starts.append(offset)
+            offset += len(self.pieces[token])
+        return ''.join(self.pieces[token] for token in tokens), starts
+
+@pytest.fixture(autouse=True)
+def word_encoding(monkeypatch):
+    monkeypatch.setattr(content_chunker.tiktoken, 'get_encoding', lambda name: WordEncoding())
+
+def make_document(seed: int, sentences: int = 80) -> dict:
+    rng = random.Random(seed)
+    words = ['broker', 'spread', 'leverage', 'deposit', 'platform', 'regulated', 'account', 'fees']
+    text = ' '.join(
+        ' '.join(rng.choice(words) for _ in range(rng.randint(5, 70))).capitalize() + rng.choice('.!?')
+        for _ in range(sentences)
+    )
+    return {'content': text, 'source_type': 'article', 'source_id': str(seed), 'title': 'Test', 'metadata': {}}
+
+def test_token_overlap_stays_within_budget():
+    chunker = ContentChunker(target_tokens=300, overlap_tokens=50)
+    for seed in range(5):
+        chunks = chunker.chunk_content(**make_document(seed))
+        assert len(chunks) > 1
+        assert chunks[0].overlap_tokens == 0
+        for previous, chunk in zip(chunks, chunks[1:]):
+            assert 0 < chunk.overlap_tokens <= 50
+            # The chunk starts with the last overlap_tokens tokens of the previous one
+            tail = chunker.encoding.encode(previous.content)[-chunk.overlap_tokens:]
+            tail_text, _ = chunker.encoding.decode_with_offsets(tail)
+            assert chunk.content.startswith(tail_text.strip())
+        for chunk in chunks:
+            assert chunk.token_count == chunker.count_tokens(chunk.content)
+
+def test_token_overlap_embeds_fewer_tokens_than_sentence_overlap():
+    documents = [make_document(seed) for seed in range(10)]
+
+    report = compare_overlap_modes(documents, target_tokens=300, overlap_tokens=50, max_workers=1)
+
+    tokens, sentences = report['tokens'], report['sentences']
+    assert tokens['overlap_tokens_max'] <= 50
+    assert tokens['chunks_over_overlap_budget'] == 0
+    assert sentences['chunks_over_overlap_budget'] > 0
+    # Chunk boundaries do not depend on the overlap, only what each chunk repeats
+    assert tokens['chunks'] <= sentences['chunks']
+    assert tokens['embedded_tokens'] < sentences['embedded_tokens']
+    assert tokens['overlap_tokens_total'] < sentences['overlap_tokens_total']
+
+@pytest.mark.parametrize('overlap_mode', ['tokens', 'sentences'])
+def test_empty_content_gives_no_chunks(overlap_mode):
+    chunker = ContentChunker(overlap_mode=overlap_mode)
+    assert chunker.chunk_content('', 'article', '1', 'Empty', {}) == []
+    assert chunker.chunk_content('   \n ', 'article', '1', 'Blank', {}) == []
+
+@pytest.mark.parametrize('overlap_mode', ['tokens', 'sentences'])
+def test_content_without_punctuation_is_one_chunk(overlap_mode):
+    chunker = ContentChunker(target_tokens=20, overlap_tokens=5, overlap_mode=overlap_mode)
+    content = ' '.join(['spread'] * 100)
+
+    chunks = chunker.chunk_content(content, 'article', '1', 'No punctuation', {})
+
+    assert len(chunks) == 1
+    assert chunks[0].content == content
+    assert chunks[0].token_count == 100
+    assert chunks[0].overlap_tokens == 0
@@ -0,0 +1,61 @@
+import asyncio
+import threading
+
+import pytest
+
+pytest.importorskip('openai')
+
+import openai_embedding_client
+from openai_embedding_client import OpenAIEmbeddingClient, mock_embedding, mock_embeddings_server
+
+DIMENSIONS = 8
+
+
+class ByteEncoding:
+    """One token per UTF-8 byte, standing in for cl100k_base without a download"""
+
+    def encode(self, text):
+        return list(text.encode('utf-8'))
+
+    def decode(self, tokens):
+        return bytes(tokens).decode('utf-8', errors='ignore')
+
+
+@pytest.fixture(autouse=True)
+def offline_encoding(monkeypatch):
+    monkeypatch.setattr(openai_embedding_client.tiktoken, 'get_encoding', lambda name: ByteEncoding())
+
+
+@pytest.fixture
+def rate_limited_server():
+    """Mock server on a free port answering every third request with a 429"""
+    server = mock_embeddings_server(0, dimensions=DIMENSIONS, rate_limit_every=3, latency=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1"
+    server.shutdown()
+    server.server_close()
+
+
+def test_embed_texts_keeps_order_and_retries_rate_limits(rate_limited_server):
+    texts = [f"chunk {i} " * (i % 7 + 1) for i in range(40)]
+    client = OpenAIEmbeddingClient(api_key='test', base_url=rate_limited_server,
+                                   max_inputs_per_request=4, max_concurrency=4, initial_backoff=0.01)
+
+    async def embed():
+        try:
+            return await client.embed_texts(texts)
+        finally:
+            await client.close()
+
+    embeddings = asyncio.run(embed())
+
+    assert len(embeddings) == len(texts)
+    for text, embedding in zip(texts, embeddings):
+        assert embedding == pytest.approx(mock_embedding(text, DIMENSIONS))
+
+    # Ten requests of four inputs; every 429 was retried rather than dropped
+    assert client.rate_limited >= 1
+    assert client.retries == client.rate_limited
+    assert client.requests == 10 + client.rate_limited
+    assert client.inputs_embedded == len(texts)
@@ -0,0 +1,41 @@
+import pytest
+
+from parse_cache import ParseCache
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ParseCache(str(tmp_path / 'parse_cache.sqlite'))
+    yield cache
+    cache.close()
+
+@pytest.fixture
+def page(tmp_path):
+    path = tmp_path / 'page.html'
+    path.write_text('<html><body>2024</body></html>')
+    return str(path)
+
+def test_failed_parse_is_retried(cache, page):
+    calls = []
+
+    def parse(file_path):
+        calls.append(file_path)
+        if len(calls) == 1:
+            raise OSError('transient read error')
+        return {'file_path': file_path}
+
+    with pytest.raises(OSError):
+        cache.get_or_parse('parser', 'v1', page, parse)
+    assert cache.get_or_parse('parser', 'v1', page, parse) == {'file_path': page}
+    assert cache.get_or_parse('parser', 'v1', page, parse) == {'file_path': page}
+    assert len(calls) == 2
+
+def test_skipped_file_is_cached(cache, page):
+    calls = []
+
+    def parse(file_path):
+        calls.append(file_path)
+        return None
+
+    assert cache.get_or_parse('parser', 'v1', page, parse) is None
+    assert cache.lookup('parser', 'v1', page)[:2] == (True, None)
+    assert len(calls) == 1
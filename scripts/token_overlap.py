@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Token-accurate chunk overlap helpers for Brokeranalysis Platform
+Shared by ContentChunker and RAGDataProcessor so overlap between consecutive
+chunks is cut from the token array and never exceeds the overlap budget.
+"""
+
+from typing import List, Optional
+
+def tail_token_offset(start: int, end: int, max_tokens: int, 
+                      token_starts: Optional[List[int]] = None) -> int:
+    """Offset of the first of the last ``max_tokens`` tokens in ``tokens[start:end]``
+
+    With ``token_starts`` (character offsets from ``decode_with_offsets``) the
+    offset moves forward past tokens that begin inside a multi-byte character,
+    so the text cut there is never longer than ``max_tokens`` tokens.
+    """
+    offset = max(start, end - max(max_tokens, 0))
+    if token_starts is not None:
+        # A token starting mid-character shares its character offset with the previous token
+        while start < offset < end and token_starts[offset] == token_starts[offset - 1]:
+            offset += 1
+    return offset
+
+def overlap_text(encoding, text: str, max_tokens: int) -> str:
+    """Suffix of text spanning its last ``max_tokens`` tokens
+
+    Encodes once and cuts the text at the token's character offset, so it is
+    linear in the text length and never splits a UTF-8 character.
+    """
+    if max_tokens <= 0 or not text:
+        return ""
+
+    tokens = encoding.encode(text)
+    if len(tokens) <= max_tokens:
+        return text
+
+    _, token_starts = encoding.decode_with_offsets(tokens)
+    start = tail_token_offset(0, len(tokens), max_tokens, token_starts)
+    return text[token_starts[start]:] if start < len(tokens) else ""
@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+In-Process Vector Search for Brokeranalysis Platform
+Cosine-similarity search over embeddings written by EmbeddingGenerator or
+BatchProcessor, without a database round trip. Scores match the Postgres
+search_documents functions (1 - cosine distance).
+
+Exact search scores query blocks with one matrix multiplication each and keeps
+the top k with argpartition. An HNSW index (hnswlib, optional) trades a little
+recall for much faster queries on large collections. Both support filtering on
+source_type and category.
+"""
+
+import json
+import time
+import logging
+import argparse
+from pathlib import Path
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from embedding_store import EmbeddingStore
+
+logger = logging.getLogger(__name__)
+
+FILTER_FIELDS = ('source_type', 'category')
+
+@dataclass
+class SearchHit:
+    """A single search result"""
+    content_id: str
+    score: float
+    row: int
+    metadata: Dict[str, Any]
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """Unit-length float32 rows; already normalised input is returned without copying"""
+    vectors = np.asarray(vectors)
+    norms = np.linalg.norm(vectors, axis=1)
+    if vectors.dtype == np.float32 and np.allclose(norms, 1.0, atol=1e-3):
+        return vectors
+    return (vectors / np.clip(norms, 1e-12, None)[:, None]).astype(np.float32)
+
+class VectorIndex:
+    """Exact and approximate nearest-neighbour search over an embedding matrix"""
+
+    # Scores computed per matrix multiplication (query block x rows), ~64MB of float32
+    BLOCK_CELLS = 1 << 24
+    # Filtered sub-matrices kept for repeated filtered searches
+    MAX_CACHED_SUBSETS = 8
+
+    def __init__(self, vectors: np.ndarray, content_ids: Sequence[str],
+                 metadata: Optional[Sequence[Dict[str, Any]]] = None):
+        if len(vectors) != len(content_ids):
+            raise ValueError(f"{len(vectors)} vectors for {len(content_ids)} content ids")
+
+        self.vectors = normalize_rows(vectors)
+        self.content_ids = list(content_ids)
+        self.metadata = list(metadata) if metadata is not None else [{} for _ in content_ids]
+
+        # Filter fields as integer codes, so filters become vectorised comparisons
+        self.field_codes: Dict[str, np.ndarray] = {}
+        self.field_values: Dict[str, Dict[Any, int]] = {}
+        for field in FILTER_FIELDS:
+            values: Dict[Any, int] = {}
+            codes = np.fromiter(
+                (values.setdefault(self.field_value(entry, field), len(values)) for entry in self.metadata),
+                dtype=np.int32, count=len(self.metadata)
+            )
+            self.field_codes[field] = codes
+            self.field_values[field] = values
+
+        self.subsets: Dict[Tuple, Tuple[np.ndarray, np.ndarray]] = {}
+        self.hnsw = None
+
+    @staticmethod
+    def field_value(entry: Dict[str, Any], field: str) -> Any:
+        """Filter field of a metadata entry (EmbeddingGenerator stores source_type as content_type)"""
+        if field == 'source_type':
+            return entry.get('source_type', entry.get('content_type'))
+        return entry.get(field)
+
+    @classmethod
+    def from_store(cls, store_dir: str) -> 'VectorIndex':
+        """Index an EmbeddingStore without copying its vectors when they are already unit length
+
+        Rows superseded by a later append of the same content_id are left out.
+        """
+        store = EmbeddingStore(store_dir)
+        entries = store.read_index()
+        vectors = store.load()
+
+        latest = sorted(store.rows_by_id.values())
+        if len(latest) < len(entries):
+            vectors = vectors[latest]
+            entries = [entries[row] for row in latest]
+
+        return cls(vectors, [entry['content_id'] for entry in entries], entries)
+
+    @classmethod
+    def from_file(cls, path: str) -> 'VectorIndex':
+        """Index EmbeddingGenerator output: a store directory, a .npz or a .json file"""
+        path = Path(path)
+        if path.is_dir():
+            return cls.from_store(str(path))
+
+        if path.suffix == '.npz':
+            data = np.load(path, allow_pickle=True)
+            meta = data['metadata'].item()
+            metadata = [{'content_type': content_type} for content_type in meta['content_types']]
+            return cls(data['embeddings'], meta['content_ids'], metadata)
+
+        if path.suffix == '.json':
+            with open(path, 'r', encoding='utf-8') as f:
+                records = json.load(f)
+            vectors = np.array([record.pop('embedding') for record in records], dtype=np.float32)
+            return cls(vectors, [record['content_id'] for record in records], records)
+
+        raise ValueError(f"Unsupported embeddings file {path} (expected a store directory, .npz or .json)")
+
+    def __len__(self) -> int:
+        return len(self.content_ids)
+
+    def filter_rows(self, source_type: Optional[Any] = None,
+                    category: Optional[Any] = None) -> Optional[np.ndarray]:
+        """Row numbers matching the filters (a value or a list of values per field), or None for all"""
+        mask = None
+        for field, wanted in (('source_type', source_type), ('category', category)):
+            if wanted is None:
+                continue
+            wanted = [wanted] if isinstance(wanted, str) or not isinstance(wanted, (list, tuple, set)) else wanted
+            codes = [self.field_values[field][value] for value in wanted if value in self.field_values[field]]
+            field_mask = np.isin(self.field_codes[field], codes)
+            mask = field_mask if mask is None else mask & field_mask
+        return None if mask is None else np.flatnonzero(mask)
+
+    def candidate_matrix(self, source_type: Optional[Any],
+                         category: Optional[Any]) -> Tuple[Optional[np.ndarray], np.ndarray]:
+        """(rows, matrix) to score for a filter; rows is None when unfiltered"""
+        rows = self.filter_rows(source_type, category)
+        if rows is None:
+            return None, self.vectors
+
+        key = (repr(source_type), repr(category))
+        if key not in self.subsets:
+            if len(self.subsets) >= self.MAX_CACHED_SUBSETS:
+                self.subsets.pop(next(iter(self.subsets)))
+            self.subsets[key] = (rows, np.ascontiguousarray(self.vectors[rows]))
+        return self.subsets[key]
+
+    def search(self, queries: np.ndarray, k: int = 10, threshold: Optional[float] = None,
+               source_type: Optional[Any] = None, category: Optional[Any] = None,
+               exact: bool = True) -> List[List[SearchHit]]:
+        """Top-k most similar rows for each query (a vector or a matrix of vectors)
+
+        ``threshold`` keeps only hits scoring above it, like match_threshold in SQL.
+        ``exact=False`` uses the HNSW index built by build_hnsw.
+        """
+        queries = normalize_rows(np.atleast_2d(np.asarray(queries, dtype=np.float32)))
+
+        if not exact:
+            if self.hnsw is None:
+                raise RuntimeError("Call build_hnsw() before searching with exact=False")
+            rows, scores = self.search_hnsw(queries, k, source_type, category)
+        else:
+            rows, scores = self.search_exact(queries, k, source_type, category)
+
+        results = []
+        for query_rows, query_scores in zip(rows, scores):
+            hits = []
+            for row, score in zip(query_rows, query_scores):
+                if row < 0 or (threshold is not None and score <= threshold):
+                    continue
+                hits.append(SearchHit(self.content_ids[row], float(score), int(row), self.metadata[row]))
+            results.append(hits)
+        return results
+
+    def search_exact(self, queries: np.ndarray, k: int, source_type: Optional[Any] = None,
+                     category: Optional[Any] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Exact top-k by blocked matmul; returns (rows, scores), padded with row -1"""
+        rows, matrix = self.candidate_matrix(source_type, category)
+        k_found = min(k, len(matrix))
+
+        top_rows = np.full((len(queries), k), -1, dtype=np.int64)
+        top_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        if k_found == 0:
+            return top_rows, top_scores
+
+        block = max(1, self.BLOCK_CELLS // len(matrix))
+        for start in range(0, len(queries), block):
+            scores = queries[start:start + block] @ matrix.T
+
+            if k_found < len(matrix):
+                best = np.argpartition(scores, -k_found, axis=1)[:, -k_found:]
+            else:
+                best = np.broadcast_to(np.arange(len(matrix)), scores.shape)
+            best_scores = np.take_along_axis(scores, best, axis=1)
+            order = np.argsort(-best_scores, axis=1)
+
+            best = np.take_along_axis(best, order, axis=1)
+            top_rows[start:start + block, :k_found] = best if rows is None else rows[best]
+            top_scores[start:start + block, :k_found] = np.take_along_axis(best_scores, order, axis=1)
+
+        return top_rows, top_scores
+
+    def build_hnsw(self, m: int = 16, ef_construction: int = 200, ef: int = 64,
+                   num_threads: int = -1) -> None:
+        """Build an HNSW index over all rows (needs hnswlib)"""
+        try:
+            import hnswlib
+        except ImportError:
+            raise ImportError("Please install hnswlib for approximate search: pip install hnswlib")
+
+        start_time = time.time()
+        index = hnswlib.Index(space='ip', dim=self.vectors.shape[1])
+        index.init_index(max_elements=max(len(self), 1), ef_construction=ef_construction, M=m)
+        index.add_items(self.vectors, np.arange(len(self)), num_threads=num_threads)
+        index.set_ef(ef)
+        self.hnsw = index
+
+        logger.info(f"Built HNSW index over {len(self)} vectors in {time.time() - start_time:.2f}s")
+
+    def search_hnsw(self, queries: np.ndarray, k: int, source_type: Optional[Any] = None,
+                    category: Optional[Any] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Approximate top-k from the HNSW graph; returns (rows, scores), padded with row -1
+
+        Filtered searches over-fetch from the graph and keep matching rows. Queries
+        left with fewer than k matches (rare filter values) fall back to exact search.
+        """
+        rows = self.filter_rows(source_type, category)
+        if rows is not None and len(rows) == 0:
+            return self.search_exact(queries, k, source_type, category)
+
+        fetch = k if rows is None else k * max(4, -(-len(self) // len(rows)))
+        fetch = min(fetch, len(self))
+
+        # ef must be at least the number of neighbours requested
+        ef = self.hnsw.ef
+        self.hnsw.set_ef(max(ef, fetch))
+        try:
+            labels, distances = self.hnsw.knn_query(queries, k=fetch)
+        finally:
+            self.hnsw.set_ef(ef)
+        scores = 1.0 - distances
+
+        if rows is None:
+            return labels.astype(np.int64), scores.astype(np.float32)
+
+        allowed = np.zeros(len(self), dtype=bool)
+        allowed[rows] = True
+
+        top_rows = np.full((len(queries), k), -1, dtype=np.int64)
+        top_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        short = []
+        for i, (query_labels, query_scores) in enumerate(zip(labels, scores)):
+            keep = allowed[query_labels]
+            found = query_labels[keep][:k]
+            top_rows[i, :len(found)] = found
+            top_scores[i, :len(found)] = query_scores[keep][:k]
+            if len(found) < min(k, len(rows)):
+                short.append(i)
+
+        if short:
+            exact_rows, exact_scores = self.search_exact(queries[short], k, source_type, category)
+            top_rows[short], top_scores[short] = exact_rows, exact_scores
+
+        return top_rows, top_scores
+
+    def similar_to(self, content_id: str, k: int = 10, **filters) -> List[SearchHit]:
+        """Nearest neighbours of an indexed item, excluding the item itself"""
+        row = self.content_ids.index(content_id)
+        hits = self.search(self.vectors[row], k + 1, **filters)[0]
+        return [hit for hit in hits if hit.row != row][:k]
+
+def benchmark(index: VectorIndex, query_count: int = 1000, k: int = 10, use_hnsw: bool = False,
+              **filters) -> Dict:
+    """Queries per second for exact (and HNSW) search, using indexed vectors as queries"""
+    rng = np.random.default_rng(0)
+    queries = np.asarray(index.vectors[rng.integers(0, len(index), size=query_count)])
+
+    start_time = time.time()
+    exact_rows, _ = index.search_exact(queries, k, **filters)
+    exact_seconds = time.time() - start_time
+
+    report = {
+        'vectors': len(index),
+        'dimension': int(index.vectors.shape[1]),
+        'queries': query_count,
+        'k': k,
+        'filters': {field: value for field, value in filters.items() if value is not None},
+        'exact_qps': query_count / max(exact_seconds, 1e-9)
+    }
+
+    if use_hnsw:
+        if index.hnsw is None:
+            index.build_hnsw()
+        start_time = time.time()
+        hnsw_rows, _ = index.search_hnsw(queries, k, **filters)
+        hnsw_seconds = time.time() - start_time
+
+        recall = np.mean([
+            len(set(approx[approx >= 0]) & set(truth[truth >= 0])) / max((truth >= 0).sum(), 1)
+            for approx, truth in zip(hnsw_rows, exact_rows)
+        ])
+        report.update({'hnsw_qps': query_count / max(hnsw_seconds, 1e-9), 'hnsw_recall': float(recall)})
+
+    return report
+
+def main():
+    """Query or benchmark an embeddings file"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description='In-process vector search over generated embeddings')
+    parser.add_argument('--embeddings', required=True, help='Embedding store directory, .npz or .json file')
+    parser.add_argument('--similar-to', help='Print the nearest neighbours of this content_id')
+    parser.add_argument('--k', type=int, default=10, help='Results per query')
+    parser.add_argument('--threshold', type=float, help='Minimum similarity')
+    parser.add_argument('--source-type', help='Only return this source type')
+    parser.add_argument('--category', help='Only return this category')
+    parser.add_argument('--hnsw', action='store_true', help='Use an HNSW index (needs hnswlib)')
+    parser.add_argument('--benchmark', type=int, metavar='QUERIES', help='Measure queries per second')
+
+    args = parser.parse_args()
+
+    index = VectorIndex.from_file(args.embeddings)
+    logger.info(f"Loaded {len(index)} vectors from {args.embeddings}")
+    filters = {'source_type': args.source_type, 'category': args.category}
+
+    if args.benchmark:
+        print(json.dumps(benchmark(index, args.benchmark, args.k, args.hnsw, **filters), indent=2))
+        return
+
+    if args.similar_to:
+        if args.hnsw:
+            index.build_hnsw()
+        hits = index.similar_to(args.similar_to, args.k, threshold=args.threshold,
+                                exact=not args.hnsw, **filters)
+        for hit in hits:
+            print(f"{hit.score:.4f}  {hit.content_id}")
+        return
+
+    parser.error('Nothing to do: pass --similar-to or --benchmark')
+
+if __name__ == '__main__':
+    main()